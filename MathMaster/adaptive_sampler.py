@@ -0,0 +1,194 @@
+"""
+AdaptiveSampler - Curvature-driven sampling of functions for MathMaster graphs
+
+Instead of a fixed linspace, a coarse grid is refined level by level where
+the curve bends or becomes undefined. Every level evaluates all new points
+in one vectorized call, the total number of evaluations is capped, and
+jumps that survive refinement are treated as asymptotes and broken with NaN
+so matplotlib does not draw a vertical line through them.
+
+A function may also return one row per curve (a 2-D array, e.g. from a
+CompiledGroup); the curves then share one grid that is refined wherever
+any of them needs it.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+
+SampledCurve = namedtuple("SampledCurve", ["x", "y", "evaluations", "breaks", "ylim"])
+
+
+def robust_scale(y, x=None):
+    """Return (low, high) covering the bulk of the finite values in y
+
+    When x is given each sample is weighted by the width it covers, so dense
+    refinement around a pole does not stretch the range.
+    """
+    finite = np.isfinite(y)
+    if not finite.any():
+        return 0.0, 1.0
+    values = y[finite]
+    if x is None:
+        low, high = np.percentile(values, [2, 98])
+    else:
+        widths = np.gradient(x)[finite]
+        order = np.argsort(values)
+        cumulative = np.cumsum(widths[order])
+        cumulative /= cumulative[-1]
+        low, high = values[order][np.searchsorted(cumulative, [0.02, 0.98])
+                                  .clip(0, values.size - 1)]
+    if high - low <= 0:
+        low, high = values.min(), values.max()
+    if high - low <= 0:
+        pad = max(abs(low), 1.0) * 0.5
+        return float(low - pad), float(high + pad)
+    return float(low), float(high)
+
+
+def _scales(y, x):
+    """robust_scale of a curve, or (k, 1) arrays of them for k stacked curves
+
+    Stacked curves are handled in one pass: non-finite values sort last
+    with zero width, so they do not move the weighted percentiles.
+    """
+    if y.ndim == 1:
+        return robust_scale(y, x)
+    finite = np.isfinite(y)
+    rows = np.arange(y.shape[0])
+    order = (np.argsort(np.where(finite, y, np.inf), axis=1), rows[:, None])[::-1]
+    values = y[order]
+    cumulative = np.where(finite, np.gradient(x), 0.0)[order].cumsum(axis=1)
+    with np.errstate(all="ignore"):
+        cumulative /= cumulative[:, -1:]
+    last = np.maximum(finite.sum(axis=1) - 1, 0)
+    low = values[rows, np.minimum((cumulative < 0.02).sum(axis=1), last)]
+    high = values[rows, np.minimum((cumulative < 0.98).sum(axis=1), last)]
+    # Flat or undefined curves take the careful path
+    for row in np.nonzero(~(high - low > 0))[0]:
+        low[row], high[row] = robust_scale(y[row], x)
+    return low[:, None], high[:, None]
+
+
+def _refinement_priority(x, y, low, high, min_width):
+    """Score every interval; a positive score means it should be split
+
+    For stacked curves the score of an interval is the worst over all rows.
+    """
+    priority = np.zeros(y.shape[:-1] + (x.size - 1,))
+    finite = np.isfinite(y)
+    scale = high - low
+    # Detail far outside the visible range cannot be seen, so clip it away
+    y = np.clip(y, low - scale, high + scale)
+
+    # Distance of each interior point from the chord of its neighbours
+    x0, x1, x2 = x[:-2], x[1:-1], x[2:]
+    y0, y1, y2 = y[..., :-2], y[..., 1:-1], y[..., 2:]
+    with np.errstate(all="ignore"):
+        chord = y0 + (y2 - y0) * (x1 - x0) / (x2 - x0)
+        error = np.abs(y1 - chord) / scale
+    error[~(finite[..., :-2] & finite[..., 1:-1] & finite[..., 2:])] = 0.0
+    np.maximum(priority[..., :-1], error, out=priority[..., :-1])
+    np.maximum(priority[..., 1:], error, out=priority[..., 1:])
+
+    # Intervals where the function becomes undefined are always refined
+    priority[finite[..., :-1] != finite[..., 1:]] = np.inf
+
+    if priority.ndim == 2:
+        priority = priority.max(axis=0)
+    priority[np.diff(x) <= min_width] = 0.0
+    return priority
+
+
+def _find_breaks(y, scale, jump_ratio, min_jump):
+    """Indices of intervals that cross an asymptote or a jump
+
+    An interval is broken when its endpoints lie on opposite sides of a pole
+    (opposite signs, both beyond the visible range) or when its jump dwarfs
+    both neighbouring intervals, as at a step.
+    """
+    with np.errstate(invalid="ignore"):
+        dy = np.abs(np.diff(y))
+        pole = (np.sign(y[:-1]) * np.sign(y[1:]) < 0) & \
+               (np.minimum(np.abs(y[:-1]), np.abs(y[1:])) > scale)
+    dy = np.where(np.isfinite(dy), dy, 0.0)
+    neighbours = np.zeros_like(dy)
+    neighbours[1:] = dy[:-1]
+    neighbours[:-1] = np.maximum(neighbours[:-1], dy[1:])
+    step = (dy > min_jump * scale) & (dy > jump_ratio * neighbours)
+    return np.nonzero(pole | step)[0]
+
+
+def _breaks_and_ylim(x, y, jump_ratio):
+    """Asymptote intervals of one curve and the y range to clip its view to"""
+    low, high = robust_scale(y, x)
+    breaks = _find_breaks(y, high - low, jump_ratio, min_jump=0.05)
+    # Clip the view when poles would otherwise flatten the rest of the curve
+    ylim = None
+    finite = y[np.isfinite(y)]
+    if breaks.size or (finite.size and np.ptp(finite) > 20 * (high - low)):
+        pad = (high - low) * 0.1
+        ylim = (low - pad, high + pad)
+    return breaks, ylim
+
+
+def adaptive_sample(function, start, end, initial_points=65, max_evaluations=4000,
+                    tolerance=2e-3, max_depth=16, jump_ratio=10.0, progress=None):
+    """Sample a vectorized function on [start, end] adaptively
+
+    tolerance is the allowed deviation from a straight line, relative to the
+    visible y range. Refinement stops when every interval is flat enough,
+    intervals reach 1 / 2**max_depth of the initial spacing, or
+    max_evaluations points have been evaluated. progress, if given, is
+    called with the fraction of the evaluation budget used after every
+    refinement pass and may raise to abandon the sampling.
+
+    When function returns stacked curves, y has one row per curve, breaks
+    is their total and ylim a list with one entry per curve. Every point
+    is evaluated for all curves at once, so the budget counts grid points.
+    """
+    if not end > start:
+        raise ValueError("Range end must be greater than range start!")
+    initial_points = max(3, min(initial_points, max_evaluations))
+
+    x = np.linspace(start, end, initial_points)
+    y = np.asarray(function(x), dtype=np.float64)
+    evaluations = x.size
+    min_width = (end - start) / (initial_points - 1) / 2 ** max_depth
+
+    while evaluations < max_evaluations:
+        low, high = _scales(y, x)
+        priority = _refinement_priority(x, y, low, high, min_width)
+        split = np.nonzero(priority > tolerance)[0]
+        if split.size == 0:
+            break
+        budget = max_evaluations - evaluations
+        if split.size > budget:
+            split = np.sort(split[np.argsort(priority[split])[-budget:]])
+        midpoints = (x[split] + x[split + 1]) / 2
+        values = np.asarray(function(midpoints), dtype=np.float64)
+        evaluations += midpoints.size
+        x = np.insert(x, split + 1, midpoints)
+        y = np.insert(y, split + 1, values, axis=-1)
+        if progress is not None:
+            progress(evaluations / max_evaluations)
+
+    if y.ndim == 1:
+        breaks, ylim = _breaks_and_ylim(x, y, jump_ratio)
+        if breaks.size:
+            x = np.insert(x, breaks + 1, (x[breaks] + x[breaks + 1]) / 2)
+            y = np.insert(y, breaks + 1, np.nan)
+        return SampledCurve(x, y, evaluations, breaks.size, ylim)
+
+    rows = [_breaks_and_ylim(x, row, jump_ratio) for row in y]
+    breaks = np.unique(np.concatenate([row_breaks for row_breaks, _ in rows])).astype(np.intp)
+    if breaks.size:
+        # Curves without a break there get the midpoint of their straight segment
+        fill = (y[:, breaks] + y[:, breaks + 1]) / 2
+        for row, (row_breaks, _) in enumerate(rows):
+            fill[row, np.isin(breaks, row_breaks)] = np.nan
+        x = np.insert(x, breaks + 1, (x[breaks] + x[breaks + 1]) / 2)
+        y = np.insert(y, breaks + 1, fill, axis=1)
+    return SampledCurve(x, y, evaluations, sum(row_breaks.size for row_breaks, _ in rows),
+                        [ylim for _, ylim in rows])
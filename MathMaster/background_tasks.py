@@ -0,0 +1,169 @@
+"""
+BackgroundTasks - Run slow calculations and plots off the Tk main thread
+
+Work is submitted to a small thread pool. Workers never touch Tk: they put
+progress and outcomes on a queue that the main loop drains with root.after
+about sixty times a second, so the window keeps redrawing and scrolling
+while a job runs. Cancellation is cooperative; a cancelled job's result is
+discarded even if the job itself cannot be interrupted.
+"""
+
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskCancelled(Exception):
+    """Raised inside a job by Task.check() once the task was cancelled"""
+
+
+class Task:
+    """Handle for one submitted job"""
+
+    def __init__(self, name, runner, on_done=None, on_error=None, key=None):
+        self.name = name
+        self.key = name if key is None else key
+        self.progress = None
+        self.on_done = on_done
+        self.on_error = on_error
+        self._runner = runner
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Ask the job to stop and drop its result"""
+        self._cancelled.set()
+
+    def check(self):
+        """Raise TaskCancelled if the task was cancelled"""
+        if self._cancelled.is_set():
+            raise TaskCancelled(self.name)
+
+    def report(self, fraction):
+        """Record progress from the worker thread (0.0 to 1.0)
+
+        Also a cancellation point, so it can be passed as a progress
+        callback to long-running loops such as adaptive_sample.
+        """
+        self.check()
+        self._runner._events.put((self, "progress", fraction))
+
+
+class TaskRunner:
+    """Thread pool whose results are delivered on the Tk thread
+
+    on_change, if given, is called on the Tk thread with the runner
+    whenever the set of running tasks or their progress changes. While
+    profiler (an instrumentation.ProfileSession) is set, jobs run under it.
+    """
+
+    def __init__(self, root, workers=2, poll_interval=16, on_change=None):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.on_change = on_change
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="mathmaster")
+        self._events = queue.Queue()
+        self._active = {}
+        self._serial = itertools.count()
+        self._polling = None
+        self.profiler = None
+
+    @property
+    def active(self):
+        """Running tasks, oldest first"""
+        return list(self._active.values())
+
+    def submit(self, name, function, *args, on_done=None, on_error=None, pass_task=False,
+               replace=True):
+        """Run function(*args) in the background
+
+        A running task with the same name is cancelled first, so clicking
+        Plot again replaces the previous plot job; with replace=False the
+        task runs alongside it instead, for jobs whose side effects must
+        not be lost. on_done(result) and on_error(exception) are called
+        on the Tk thread; with pass_task the Task is passed to function
+        as its first argument.
+        """
+        if replace:
+            key = name
+            previous = self._active.pop(name, None)
+            if previous is not None:
+                previous.cancel()
+        else:
+            key = (name, next(self._serial))
+        task = Task(name, self, on_done, on_error, key)
+        self._active[key] = task
+        if pass_task:
+            args = (task,) + args
+        self._executor.submit(self._run, task, function, args)
+        self._schedule()
+        self._notify()
+        return task
+
+    def cancel(self, name=None):
+        """Cancel the tasks with that name, or every running task"""
+        keys = [key for key, task in self._active.items() if name is None or task.name == name]
+        for key in keys:
+            self._active.pop(key).cancel()
+        self._notify()
+
+    def shutdown(self):
+        """Cancel everything and stop polling"""
+        self.cancel()
+        if self._polling is not None:
+            self.root.after_cancel(self._polling)
+            self._polling = None
+        self._executor.shutdown(wait=False)
+
+    def _run(self, task, function, args):
+        """Worker thread: run the job and queue its outcome"""
+        try:
+            task.check()
+            profiler = self.profiler
+            if profiler is not None:
+                result = profiler.call(function, *args)
+            else:
+                result = function(*args)
+        except TaskCancelled:
+            return
+        except Exception as e:
+            self._events.put((task, "error", e))
+        else:
+            self._events.put((task, "done", result))
+
+    def _schedule(self):
+        if self._polling is None:
+            self._polling = self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        """Tk thread: deliver queued events, keep polling while tasks run"""
+        self._polling = None
+        changed = False
+        while True:
+            try:
+                task, kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if task.cancelled or self._active.get(task.key) is not task:
+                continue
+            changed = True
+            if kind == "progress":
+                task.progress = payload
+                continue
+            del self._active[task.key]
+            callback = task.on_done if kind == "done" else task.on_error
+            if callback is not None:
+                callback(payload)
+        if changed:
+            self._notify()
+        if self._active:
+            self._schedule()
+
+    def _notify(self):
+        if self.on_change is not None:
+            self.on_change(self)
@@ -0,0 +1,290 @@
+"""
+BatchCLI - Streaming command-line batch calculator for MathMaster
+
+Reads (op, a, b) records as CSV or JSONL from a file or stdin, evaluates
+them chunk by chunk with the vectorized BatchOperations rules and streams
+results and per-row errors to the output. Memory use is bounded by the
+chunk size, and nothing here imports Tk, so it runs on servers without a
+display.
+"""
+
+import csv
+import json
+import math
+import sys
+import time
+from collections import namedtuple
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+
+from batch_operations import BatchOperations
+
+
+# Symbols and short names accepted in the op column
+OPERATION_ALIASES = {
+    "+": "add", "-": "subtract", "*": "multiply", "/": "divide",
+    "%": "modulus", "^": "power", "**": "power",
+    "sqrt": "square_root", "log": "logarithm", "ln": "logarithm",
+    "abs": "absolute", "round": "round_number", "percent": "percentage",
+}
+
+DEFAULT_CHUNK_SIZE = 65536
+
+ChunkResult = namedtuple("ChunkResult", ["results", "errors"])
+
+
+@lru_cache(maxsize=1024)
+def resolve_operation(name):
+    """Map an op column value to a BatchOperations method name"""
+    name = str(name).strip()
+    name = OPERATION_ALIASES.get(name, name).lower()
+    name = OPERATION_ALIASES.get(name, name)
+    if name in BatchOperations.BINARY_OPERATIONS or name in BatchOperations.UNARY_OPERATIONS:
+        return name
+    return None
+
+
+_SCALAR_TYPES = (str, int, float)
+
+
+def _parse_column(values):
+    """Parse operand strings into floats, flagging the ones that fail
+
+    Integers too large for a float (JSON 10**400 written out) and non-scalar
+    JSON values such as lists or objects are flagged too.
+    """
+    if all(isinstance(value, _SCALAR_TYPES) for value in values):
+        try:
+            parsed = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError, OverflowError):
+            pass
+        else:
+            if parsed.ndim == 1:
+                return parsed, np.zeros(len(values), dtype=bool)
+    parsed = np.empty(len(values), dtype=np.float64)
+    invalid = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            if not isinstance(value, _SCALAR_TYPES):
+                raise TypeError(value)
+            parsed[i] = float(value)
+        except (TypeError, ValueError, OverflowError):
+            parsed[i] = np.nan
+            invalid[i] = True
+    return parsed, invalid
+
+
+def _missing(values):
+    """Mask of operand cells that are absent or blank"""
+    return np.array([value is None or str(value).strip() == "" for value in values], dtype=bool)
+
+
+def evaluate_chunk(records):
+    """Evaluate a list of (op, a, b) records
+
+    Records are grouped by operation so each group is one vectorized call.
+    Returns a ChunkResult whose results and errors lists are in input
+    order; for every row exactly one of the two is None.
+    """
+    count = len(records)
+    results = np.full(count, None, dtype=object)
+    errors = np.full(count, None, dtype=object)
+    if not count:
+        return ChunkResult([], [])
+    ops, a_column, b_column = zip(*records)
+    a_column = np.array(a_column, dtype=object)
+    b_column = np.array(b_column, dtype=object)
+    labels, inverse = np.unique(np.array(ops, dtype=str), return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[order], np.arange(len(labels) + 1))
+
+    for k, label in enumerate(labels):
+        indices = order[bounds[k]:bounds[k + 1]]
+        name = resolve_operation(label)
+        if name is None:
+            errors[indices] = f"Unknown operation '{label}'!"
+            continue
+        binary = name in BatchOperations.BINARY_OPERATIONS
+        missing = _missing(a_column[indices])
+        if binary:
+            missing |= _missing(b_column[indices])
+        errors[indices[missing]] = (f"Operation '{name}' requires two operands!" if binary
+                                    else f"Operation '{name}' requires an operand!")
+        indices = indices[~missing]
+        if not indices.size:
+            continue
+        a_values, invalid = _parse_column(a_column[indices].tolist())
+        if binary:
+            b_values, b_invalid = _parse_column(b_column[indices].tolist())
+            invalid |= b_invalid
+            result = BatchOperations.apply(name, a_values, b_values)
+        elif name == "round_number":
+            # An optional b column gives the decimal places
+            b_text = b_column[indices]
+            decimals = np.full(len(indices), 2.0)
+            given = ~_missing(b_text)
+            if given.any():
+                decimals[given], b_invalid = _parse_column(b_text[given].tolist())
+                invalid[given] |= b_invalid
+            result = BatchOperations.round_number(a_values, decimals)
+        else:
+            result = BatchOperations.apply(name, a_values)
+        ok = ~(invalid | result.errors)
+        # tolist() turns NumPy scalars into plain Python ints, floats and bools
+        results[indices[ok]] = result.values[ok].tolist()
+        errors[indices[result.errors & ~invalid]] = \
+            BatchOperations.ERROR_MESSAGES.get(name, "Invalid operands!")
+        errors[indices[invalid]] = "Please enter valid numbers!"
+    return ChunkResult(results.tolist(), errors.tolist())
+
+
+def read_csv(stream, chunk_size):
+    """Yield chunks of (op, a, b) records from CSV, skipping an optional header"""
+    reader = csv.reader(stream)
+    first = True
+    while True:
+        rows = list(islice(reader, chunk_size))
+        if not rows:
+            return
+        if first and rows[0] and rows[0][0].strip().lower() == "op":
+            rows = rows[1:]
+        first = False
+        yield [(row[0], row[1] if len(row) > 1 else None, row[2] if len(row) > 2 else None)
+               for row in rows if row and row[0].strip()]
+
+
+def read_jsonl(stream, chunk_size):
+    """Yield chunks of (op, a, b) records from JSON lines"""
+    while True:
+        lines = list(islice(stream, chunk_size))
+        if not lines:
+            return
+        chunk = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                chunk.append((record.get("op"), record.get("a"), record.get("b")))
+            except (ValueError, AttributeError):
+                chunk.append(("<invalid json>", None, None))
+        yield chunk
+
+
+class CSVWriter:
+    """Streams op,a,b,result,error rows"""
+
+    def __init__(self, stream):
+        self.writer = csv.writer(stream, lineterminator="\n")
+        self.writer.writerow(["op", "a", "b", "result", "error"])
+
+    def write(self, records, outcome):
+        self.writer.writerows(
+            (op, a, b, result, error)
+            for (op, a, b), result, error in zip(records, outcome.results, outcome.errors))
+
+
+def json_value(value):
+    """Values that JSON cannot carry exactly become strings
+
+    Integers beyond double precision and NaN/infinities (which strict JSON has
+    no literal for) are written as text, inside echoed lists and objects too.
+    """
+    if isinstance(value, int) and not isinstance(value, bool) and abs(value) > 2 ** 53:
+        return str(value)
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, list):
+        return [json_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: json_value(item) for key, item in value.items()}
+    return value
+
+
+class JSONLWriter:
+    """Streams one JSON object per record"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, records, outcome):
+        lines = []
+        for (op, a, b), result, error in zip(records, outcome.results, outcome.errors):
+            record = {"op": op, "a": json_value(a), "b": json_value(b)}
+            if error is None:
+                record["result"] = json_value(result)
+            else:
+                record["error"] = error
+            lines.append(json.dumps(record, allow_nan=False))
+        self.stream.write("\n".join(lines) + "\n")
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+WRITERS = {"csv": CSVWriter, "jsonl": JSONLWriter}
+
+
+def detect_format(path, default="csv"):
+    """Guess csv or jsonl from a file name"""
+    if path and path != "-":
+        lowered = path.lower()
+        if lowered.endswith((".jsonl", ".ndjson", ".json")):
+            return "jsonl"
+        if lowered.endswith(".csv"):
+            return "csv"
+    return default
+
+
+def run_batch(input_path="-", output_path="-", input_format=None, output_format=None,
+              chunk_size=DEFAULT_CHUNK_SIZE, evaluate=evaluate_chunk, executor=None):
+    """Stream a batch file through the calculator, returns (rows, errors)
+
+    "-" means stdin or stdout. evaluate maps a chunk of records to a
+    ChunkResult. With a ParallelExecutor, chunks are evaluated in worker
+    processes while the next ones are read, and written in input order.
+    """
+    input_format = input_format or detect_format(input_path)
+    output_format = output_format or detect_format(output_path, input_format)
+    source = sys.stdin if input_path == "-" else open(input_path, newline="", encoding="utf-8")
+    target = sys.stdout if output_path == "-" else open(output_path, "w", newline="",
+                                                        encoding="utf-8", buffering=1 << 20)
+    rows = errors = 0
+    try:
+        writer = WRITERS[output_format](target)
+        chunks = READERS[input_format](source, chunk_size)
+        if executor is None:
+            outcomes = ((chunk, evaluate(chunk)) for chunk in chunks)
+        else:
+            outcomes = executor.map_batches(evaluate, chunks)
+        for chunk, outcome in outcomes:
+            writer.write(chunk, outcome)
+            rows += len(chunk)
+            errors += len(outcome.errors) - outcome.errors.count(None)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+        else:
+            target.flush()
+    return rows, errors
+
+
+def main(args):
+    """Run a batch job from parsed command-line arguments"""
+    started = time.perf_counter()
+    executor = None
+    if args.workers != 1:
+        from parallel_executor import ParallelExecutor
+        executor = ParallelExecutor(args.workers or None)
+    try:
+        rows, errors = run_batch(args.batch, args.output, args.input_format,
+                                 args.output_format, args.chunk_size, executor=executor)
+    finally:
+        if executor is not None:
+            executor.close()
+    elapsed = time.perf_counter() - started
+    print(f"MathMaster batch: {rows} rows, {errors} errors in {elapsed:.2f} s",
+          file=sys.stderr)
+    return 0
@@ -0,0 +1,299 @@
+"""
+BatchOperations - Vectorized MathOperations over NumPy arrays for MathMaster
+"""
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+
+class BatchResult(namedtuple("BatchResult", ["values", "errors"])):
+    """Result of a batch operation
+
+    values holds the computed results (NaN, or None for object arrays, where
+    the input was invalid) and errors is a boolean mask that is True for every
+    element the scalar MathOperations method would have rejected.
+    """
+
+    __slots__ = ()
+
+    @property
+    def valid(self):
+        """Boolean mask of successfully computed elements"""
+        return ~self.errors
+
+    @property
+    def error_count(self):
+        """Number of rejected elements"""
+        return int(np.count_nonzero(self.errors))
+
+
+# Largest magnitude up to which every integer is exactly a float64 and an int64
+_EXACT_INTEGER = 2 ** 53
+_INT64_MAX = np.iinfo(np.int64).max
+
+
+def as_array(data, dtype=np.float64):
+    """Convert a sequence, NumPy array or raw buffer into a NumPy array"""
+    if isinstance(data, (bytes, bytearray)):
+        return np.frombuffer(data, dtype=dtype)
+    return np.asarray(data, dtype=dtype)
+
+
+def _checked(compute, shape, errors, fill=np.nan):
+    """Run compute on the valid elements only and fill the rest"""
+    out = np.full(shape, fill, dtype=np.float64)
+    with np.errstate(all="ignore"):
+        compute(out, ~errors)
+    return BatchResult(out, errors)
+
+
+class BatchOperations:
+    """Vectorized counterparts of the MathOperations methods
+
+    Every method accepts NumPy arrays (or anything as_array understands),
+    broadcasts its operands and returns a BatchResult instead of raising
+    ValueError on the first invalid element.
+    """
+
+    BINARY_OPERATIONS = ("add", "subtract", "multiply", "divide", "modulus",
+                         "power", "percentage", "gcd", "lcm")
+    UNARY_OPERATIONS = ("square_root", "logarithm", "factorial", "absolute",
+                        "round_number", "is_infinity")
+
+    # Message for flagged elements, matching the MathOperations errors
+    ERROR_MESSAGES = {
+        "divide": "Division by zero is not allowed!",
+        "modulus": "Modulus by zero is not allowed!",
+        "power": "Result is not a finite real number!",
+        "square_root": "Square root of negative number is not real!",
+        "logarithm": "Logarithm is only defined for positive numbers!",
+        "factorial": "Factorial requires an integer between 0 and 1000!",
+        "percentage": "Total cannot be zero for percentage calculation!",
+        "gcd": "GCD requires finite numbers!",
+        "lcm": "LCM requires finite numbers!",
+        "round_number": "Decimal places must be an integer!",
+    }
+
+    _factorial_table = None
+
+    @staticmethod
+    def _operands(a, b):
+        a, b = np.broadcast_arrays(as_array(a), as_array(b))
+        return a, b
+
+    @staticmethod
+    def add(a, b):
+        """Vectorized addition"""
+        a, b = BatchOperations._operands(a, b)
+        with np.errstate(over="ignore"):
+            values = np.add(a, b)
+        return BatchResult(values, np.zeros(a.shape, dtype=bool))
+
+    @staticmethod
+    def subtract(a, b):
+        """Vectorized subtraction"""
+        a, b = BatchOperations._operands(a, b)
+        with np.errstate(over="ignore"):
+            values = np.subtract(a, b)
+        return BatchResult(values, np.zeros(a.shape, dtype=bool))
+
+    @staticmethod
+    def multiply(a, b):
+        """Vectorized multiplication"""
+        a, b = BatchOperations._operands(a, b)
+        with np.errstate(over="ignore"):
+            values = np.multiply(a, b)
+        return BatchResult(values, np.zeros(a.shape, dtype=bool))
+
+    @staticmethod
+    def divide(a, b):
+        """Vectorized division, division by zero is flagged"""
+        a, b = BatchOperations._operands(a, b)
+        return _checked(lambda out, ok: np.divide(a, b, out=out, where=ok),
+                        a.shape, b == 0)
+
+    @staticmethod
+    def modulus(a, b):
+        """Vectorized modulus, modulus by zero is flagged"""
+        a, b = BatchOperations._operands(a, b)
+        return _checked(lambda out, ok: np.mod(a, b, out=out, where=ok),
+                        a.shape, b == 0)
+
+    @staticmethod
+    def power(base, exponent):
+        """Vectorized power, complex and overflowing results are flagged"""
+        base, exponent = BatchOperations._operands(base, exponent)
+        with np.errstate(all="ignore"):
+            values = np.power(base, exponent)
+        finite = np.isfinite(base) & np.isfinite(exponent)
+        errors = finite & ~np.isfinite(values)
+        values[errors] = np.nan
+        return BatchResult(values, errors)
+
+    @staticmethod
+    def square_root(x):
+        """Vectorized square root, negative numbers are flagged"""
+        x = as_array(x)
+        return _checked(lambda out, ok: np.sqrt(x, out=out, where=ok),
+                        x.shape, x < 0)
+
+    @staticmethod
+    def trig_functions(angle):
+        """Vectorized sin, cos and tan"""
+        angle = as_array(angle)
+        return {
+            'sin': np.sin(angle),
+            'cos': np.cos(angle),
+            'tan': np.tan(angle)
+        }
+
+    @staticmethod
+    def logarithm(x):
+        """Vectorized natural logarithm, non-positive numbers are flagged"""
+        x = as_array(x)
+        return _checked(lambda out, ok: np.log(x, out=out, where=ok),
+                        x.shape, x <= 0)
+
+    @staticmethod
+    def factorial(n):
+        """Vectorized factorial using a precomputed table of exact results
+
+        Negative, non-integer and too large (> 1000) inputs are flagged, the
+        same rules as MathOperations.factorial. The values array has object
+        dtype because most factorials do not fit into a float.
+        """
+        n = as_array(n)
+        with np.errstate(invalid="ignore"):
+            errors = (n < 0) | (n != np.floor(n)) | (n > 1000) | np.isnan(n)
+        table = BatchOperations._factorials()
+        index = np.where(errors, 0, n).astype(np.intp)
+        values = table[index]
+        values[errors] = None
+        return BatchResult(values, errors)
+
+    @staticmethod
+    def _factorials():
+        """Lazily build the table of exact factorials 0! .. 1000!"""
+        if BatchOperations._factorial_table is None:
+            table = np.empty(1001, dtype=object)
+            value = 1
+            for i in range(1001):
+                if i:
+                    value *= i
+                table[i] = value
+            BatchOperations._factorial_table = table
+        return BatchOperations._factorial_table
+
+    @staticmethod
+    def absolute(x):
+        """Vectorized absolute value"""
+        x = as_array(x)
+        return BatchResult(np.abs(x), np.zeros(x.shape, dtype=bool))
+
+    @staticmethod
+    def round_number(x, decimals=2):
+        """Vectorized rounding to the given decimal places
+
+        decimals may be an array with one entry per element; non-integer
+        decimal places are flagged, as round() rejects them.
+        """
+        x, decimals = BatchOperations._operands(x, decimals)
+        errors = ~np.isfinite(decimals) | (decimals != np.trunc(decimals))
+        # Beyond 400 places round() returns a float unchanged, or 0
+        decimals = np.clip(np.where(errors, 0, decimals), -400, 400).astype(np.int64)
+        values = np.full(x.shape, np.nan)
+        with np.errstate(all="ignore"):
+            for places in np.unique(decimals[~errors]):
+                where = ~errors & (decimals == places)
+                values[where] = np.round(x[where], places)
+        # np.round scales by 10**decimals, which can overflow where round() does not
+        lost = ~errors & np.isfinite(x) & ~np.isfinite(values)
+        for index in zip(*np.nonzero(lost)):
+            values[index] = round(float(x[index]), int(decimals[index]))
+        return BatchResult(values, errors)
+
+    @staticmethod
+    def percentage(value, total):
+        """Vectorized percentage, a zero total is flagged"""
+        value, total = BatchOperations._operands(value, total)
+
+        def compute(out, ok):
+            np.divide(value, total, out=out, where=ok)
+            np.multiply(out, 100, out=out, where=ok)
+
+        return _checked(compute, value.shape, total == 0)
+
+    @staticmethod
+    def is_infinity(x):
+        """Vectorized infinity check"""
+        x = as_array(x)
+        return BatchResult(np.isinf(x), np.zeros(x.shape, dtype=bool))
+
+    @staticmethod
+    def _integer_operands(a, b):
+        """Truncate operands like int() does, flagging non-finite values
+
+        Returns the truncated floats, their int64 counterparts and a mask of
+        the elements beyond 2**53, which int64 arithmetic cannot take exactly
+        (their int64 counterparts are 0).
+        """
+        a, b = BatchOperations._operands(a, b)
+        errors = ~(np.isfinite(a) & np.isfinite(b))
+        a = np.trunc(np.where(errors, 0, a))
+        b = np.trunc(np.where(errors, 0, b))
+        large = (np.abs(a) > _EXACT_INTEGER) | (np.abs(b) > _EXACT_INTEGER)
+        small_a = np.where(large, 0, a).astype(np.int64)
+        small_b = np.where(large, 0, b).astype(np.int64)
+        return a, b, small_a, small_b, large, errors
+
+    @staticmethod
+    def _exact(values, a, b, inexact, function):
+        """values with the inexact elements recomputed by the scalar function
+
+        Python ints of any size replace them, which makes values an object array.
+        """
+        if not inexact.any():
+            return values
+        values = values.astype(object)
+        for index in zip(*np.nonzero(inexact)):
+            values[index] = function(int(a[index]), int(b[index]))
+        return values
+
+    @staticmethod
+    def gcd(a, b):
+        """Vectorized Greatest Common Divisor on truncated integers
+
+        Operands beyond 2**53 are computed exactly with math.gcd.
+        """
+        a, b, small_a, small_b, large, errors = BatchOperations._integer_operands(a, b)
+        values = np.gcd(small_a, small_b)
+        return BatchResult(BatchOperations._exact(values, a, b, large, math.gcd), errors)
+
+    @staticmethod
+    def lcm(a, b):
+        """Vectorized Least Common Multiple on truncated integers
+
+        Operands beyond 2**53 and results beyond int64 are computed exactly
+        with math.lcm.
+        """
+        a, b, small_a, small_b, large, errors = BatchOperations._integer_operands(a, b)
+        divisor = np.gcd(small_a, small_b)
+        quotient = np.abs(np.floor_divide(small_a, np.maximum(divisor, 1)))
+        small_b = np.abs(small_b)
+        overflow = small_b > _INT64_MAX // np.maximum(quotient, 1)
+        values = np.where(overflow, 0, quotient * np.where(overflow, 0, small_b))
+        return BatchResult(BatchOperations._exact(values, a, b, large | overflow, math.lcm),
+                           errors)
+
+    @staticmethod
+    def apply(operation, a, b=None):
+        """Run a batch operation by its MathOperations name"""
+        if operation in BatchOperations.BINARY_OPERATIONS:
+            if b is None:
+                raise ValueError(f"Operation '{operation}' requires two operands!")
+            return getattr(BatchOperations, operation)(a, b)
+        if operation in BatchOperations.UNARY_OPERATIONS:
+            return getattr(BatchOperations, operation)(a)
+        raise ValueError(f"Unknown batch operation '{operation}'!")
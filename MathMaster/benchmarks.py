@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Benchmarks - Reproducible performance measurements for MathMaster
+
+Times scalar operations, vectorized batches of growing size, factorial and
+GCD scaling, expression parsing and evaluation, graph sampling and history
+growth (storage and the history panel). Runs headless: the history panel is
+driven through a hidden Tk root, or a stand-in Text widget when no display
+is available. Results are written as JSON and can be compared against a
+stored baseline, flagging benchmarks that got slower than a threshold.
+
+    python benchmarks.py --output results.json
+    python benchmarks.py --save-baseline benchmarks_baseline.json
+    python benchmarks.py --baseline benchmarks_baseline.json --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from adaptive_sampler import adaptive_sample
+from batch_operations import BatchOperations
+from calculator_core import CalculationHistory
+from exact_operations import ExactOperations
+from expression_engine import ExpressionEngine
+from expression_parser import ExpressionParser
+from history_store import HistoryStore
+from math_operations import MathOperations
+
+
+BenchmarkResult = namedtuple(
+    "BenchmarkResult", ["id", "group", "params", "best", "median", "mean", "stdev", "number", "repeat"]
+)
+Regression = namedtuple("Regression", ["id", "baseline", "current", "change"])
+
+DEFAULT_BASELINE = "benchmarks_baseline.json"
+
+
+def measure(function, repeat=5, min_time=0.05):
+    """Time function() and return per-call seconds for each repeat
+
+    Like timeit's autorange, the call count per repeat grows until one
+    repeat takes at least min_time, so fast and slow calls are both
+    measured with a useful resolution.
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - started) / number)
+    return timings, number
+
+
+class _HeadlessText:
+    """Minimal stand-in for tk.Text used when no display is available
+
+    Supports the calls HistoryView makes: config, insert and delete at
+    "line.column" indices or "end".
+    """
+
+    def __init__(self):
+        self.lines = []
+
+    def config(self, **options):
+        pass
+
+    def _line(self, index):
+        return len(self.lines) if index == "end" else int(str(index).split(".")[0]) - 1
+
+    def insert(self, index, text):
+        position = self._line(index)
+        self.lines[position:position] = text.splitlines()
+
+    def delete(self, start, end):
+        del self.lines[self._line(start):self._line(end)]
+
+
+def _text_widget():
+    """A Text widget on a hidden Tk root, or a stand-in without a display"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return _HeadlessText(), None
+    root.withdraw()
+    return tk.Text(root), root
+
+
+# Benchmark groups: each yields (name, params, callable)
+
+def bench_scalar(quick):
+    """Single MathOperations calls, as made by the calculator buttons"""
+    cases = [
+        ("add", (12.5, 7.25)), ("subtract", (12.5, 7.25)), ("multiply", (12.5, 7.25)),
+        ("divide", (12.5, 7.25)), ("modulus", (17.0, 5.0)), ("power", (2.0, 10.0)),
+        ("square_root", (2.0,)), ("trig_functions", (0.5,)), ("logarithm", (100.0,)),
+        ("factorial", (20,)), ("absolute", (-3.5,)), ("round_number", (3.14159,)),
+        ("percentage", (25.0, 200.0)), ("gcd", (48, 18)), ("lcm", (48, 18)),
+    ]
+    for name, args in cases:
+        method = getattr(MathOperations, name)
+        yield name, {}, lambda method=method, args=args: method(*args)
+
+
+def bench_batch(quick):
+    """Vectorized BatchOperations over growing array sizes"""
+    sizes = (1000, 100000) if quick else (1000, 10000, 100000, 1000000)
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        a = rng.uniform(-100, 100, size)
+        b = rng.uniform(-100, 100, size)
+        n = rng.integers(0, 170, size).astype(np.float64)
+        yield "add", {"size": size}, lambda a=a, b=b: BatchOperations.add(a, b)
+        yield "divide", {"size": size}, lambda a=a, b=b: BatchOperations.divide(a, b)
+        yield "square_root", {"size": size}, lambda a=a: BatchOperations.square_root(a)
+        yield "trig_functions", {"size": size}, lambda a=a: BatchOperations.trig_functions(a)
+        yield "factorial", {"size": size}, lambda n=n: BatchOperations.factorial(n)
+
+
+def bench_scaling(quick):
+    """Exact factorial and big-integer GCD/LCM as the operands grow"""
+    exact = ExactOperations()
+    factorials = (100, 1000, 10000) if quick else (100, 1000, 10000, 50000, 100000)
+    for n in factorials:
+        yield "factorial", {"n": n}, lambda n=n: exact.factorial(n)
+    bits_list = (64, 1024, 16384) if quick else (64, 1024, 16384, 65536, 262144)
+    rng = random.Random(0)
+    for bits in bits_list:
+        common = rng.getrandbits(bits // 2) | 1
+        a = common * (rng.getrandbits(bits // 2) | 1)
+        b = common * (rng.getrandbits(bits // 2) | 1)
+        yield "gcd", {"bits": bits}, lambda a=a, b=b: exact.gcd(a, b)
+        yield "lcm", {"bits": bits}, lambda a=a, b=b: exact.lcm(a, b)
+
+
+def bench_expression(quick):
+    """Expression mode parsing/evaluation and compiled graph expressions"""
+    text = "gcd(48, 18) + sqrt(2)^3 % 5 * x - 7! / (x + 1)"
+    parser = ExpressionParser()
+    tree = parser.parse(text)
+    yield "parse_uncached", {}, lambda: ExpressionParser().parse(text)
+    yield "evaluate_cached", {}, lambda: parser.evaluate(tree, {"x": 2.5})
+    engine = ExpressionEngine()
+    source = "sin(x) * exp(-x**2 / 10) + log(abs(x) + 1)"
+    yield "compile_uncached", {}, lambda: ExpressionEngine().compile(source)
+    function = engine.compile(source)
+    for size in ((1000, 100000) if quick else (1000, 100000, 1000000)):
+        x = np.linspace(-10, 10, size)
+        yield "evaluate_grid", {"size": size}, lambda x=x: function(x)
+
+
+def bench_plot(quick):
+    """Curve sampling as done by plot_graph for typical and difficult functions"""
+    engine = ExpressionEngine()
+    sources = ("x**2", "sin(x)", "tan(x)", "1/x", "sin(1/x)")
+    if quick:
+        sources = sources[:3]
+    for source in sources:
+        function = engine.compile(source)
+        yield "adaptive_sample", {"function": source}, \
+            lambda function=function: adaptive_sample(function, -10, 10)
+
+
+def bench_history(quick):
+    """Recording calculations and redrawing the history panel as it grows"""
+    from history_view import HistoryView
+
+    sizes = (100, 10000) if quick else (100, 10000, 100000)
+    widget, root = _text_widget()
+    directory = tempfile.mkdtemp(prefix="mathmaster-bench-")
+    try:
+        for size in sizes:
+            for kind in ("memory", "sqlite"):
+                if kind == "memory":
+                    history = CalculationHistory()
+                else:
+                    history = HistoryStore(os.path.join(directory, f"history-{size}.db"))
+                for i in range(size):
+                    history.add("add", (i, 1), i + 1, f"{i} + 1 = {i + 1}")
+                view = HistoryView(widget, history)
+                params = {"entries": size, "store": kind}
+                counter = [size]
+
+                def record(history=history, view=view, counter=counter):
+                    i = counter[0] = counter[0] + 1
+                    number = history.add("add", (i, 1), i + 1, f"{i} + 1 = {i + 1}")
+                    view.add(number, f"{i} + 1 = {i + 1}")
+
+                yield "record", params, record
+                yield "update_history_display", params, view.show_latest
+                yield "page_older", params, lambda view=view: (view.show_latest(), view.older())
+                if kind == "sqlite":
+                    history.close()
+    finally:
+        if root is not None:
+            root.destroy()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+GROUPS = {
+    "scalar": bench_scalar,
+    "batch": bench_batch,
+    "scaling": bench_scaling,
+    "expression": bench_expression,
+    "plot": bench_plot,
+    "history": bench_history,
+}
+
+
+def _benchmark_id(group, name, params):
+    suffix = ",".join(f"{key}={value}" for key, value in params.items())
+    return f"{group}/{name}" + (f"[{suffix}]" if suffix else "")
+
+
+def run_benchmarks(groups=None, quick=False, repeat=5, min_time=0.05, progress=None):
+    """Run the selected groups and return a list of BenchmarkResult"""
+    results = []
+    for group in groups or GROUPS:
+        for name, params, function in GROUPS[group](quick):
+            timings, number = measure(function, repeat, min_time)
+            result = BenchmarkResult(
+                _benchmark_id(group, name, params), group, params, min(timings),
+                statistics.median(timings), statistics.mean(timings),
+                statistics.stdev(timings) if len(timings) > 1 else 0.0, number, repeat)
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    return results
+
+
+def environment():
+    """Describe the machine and library versions the results came from"""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def to_json(results):
+    """Machine-readable report of a run"""
+    return {"environment": environment(),
+            "results": [result._asdict() for result in results]}
+
+
+def load_results(path):
+    """Read a JSON report, returns {id: best seconds}"""
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return {result["id"]: result["best"] for result in report["results"]}
+
+
+def compare(results, baseline, threshold=0.25):
+    """Return a Regression for every benchmark slower than baseline by more than threshold
+
+    Best-of-repeats times are compared, as they are the least sensitive
+    to background noise. Benchmarks missing from the baseline are skipped.
+    """
+    regressions = []
+    for result in results:
+        before = baseline.get(result.id)
+        if not before:
+            continue
+        change = result.best / before - 1
+        if change > threshold:
+            regressions.append(Regression(result.id, before, result.best, change))
+    return regressions
+
+
+def _format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="MathMaster benchmark suite")
+    parser.add_argument("--group", action="append", choices=sorted(GROUPS),
+                        help="run only this group (repeatable)")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes for a fast check")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repeats per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="minimum seconds per repeat")
+    parser.add_argument("--output", metavar="FILE", help="write the JSON report to FILE")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help=f"compare against this report (default: {DEFAULT_BASELINE} if present)")
+    parser.add_argument("--save-baseline", metavar="FILE",
+                        help="store this run as the baseline report")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown before flagging a regression (0.25 = 25%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run the suite, returns 1 when a regression was found"""
+    args = parse_args(argv)
+
+    def report(result):
+        print(f"{result.id:<60} {_format_time(result.best):>10}  (x{result.number})",
+              file=sys.stderr)
+
+    results = run_benchmarks(args.group, args.quick, args.repeat, args.min_time, report)
+    document = json.dumps(to_json(results), indent=2)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(document + "\n")
+    if not args.output and not args.save_baseline:
+        print(document)
+
+    baseline_path = args.baseline
+    if baseline_path is None and not args.save_baseline and os.path.exists(DEFAULT_BASELINE):
+        baseline_path = DEFAULT_BASELINE
+    if not baseline_path:
+        return 0
+    regressions = compare(results, load_results(baseline_path), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression.id}: {_format_time(regression.baseline)} -> "
+              f"{_format_time(regression.current)} (+{regression.change:.0%})", file=sys.stderr)
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} against {baseline_path}",
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,594 @@
+"""
+CalculationService - Local HTTP/JSON calculation service for MathMaster
+
+Serves the validated MathOperations rules to other local tools over HTTP
+(TCP or a Unix socket) without Tk. Requests that arrive in the same pass of
+the asyncio event loop are micro-batched into one vectorized evaluate_chunk
+call. Connections are kept alive and may pipeline requests; responses are
+written in request order. Backpressure comes from a global limit on queued
+records (503 when exceeded), a per-connection limit on requests in flight
+(reading pauses) and the transport's write buffer. Every request has a
+deadline and is answered 504 instead of evaluated once it has passed.
+
+Endpoints:
+    POST /calculate   {"op": "add", "a": 2, "b": 3} -> {"result": 5}
+                      or a JSON array of such objects -> array of results
+    GET  /health      status, queue depth, connections and uptime
+    GET  /metrics     Prometheus text
+
+CalculationClient is a small keep-alive client for tests and scripts.
+"""
+
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from http import HTTPStatus
+
+from batch_cli import evaluate_chunk, json_value
+from instrumentation import Metrics
+
+
+DEFAULT_PORT = 8765
+MAX_HEADER_BYTES = 16384
+
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+_decode = json.JSONDecoder().decode
+
+
+class ServiceError(Exception):
+    """An HTTP error answer: status code and message"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _outcome(result, error):
+    return {"result": json_value(result)} if error is None else {"error": error}
+
+
+def _response(status, body, content_type=b"application/json", close=False, extra=b""):
+    """Serialized HTTP/1.1 response"""
+    phrase = HTTPStatus(status).phrase.encode("ascii")
+    return b"".join([
+        b"HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\n"
+        % (status, phrase, content_type, len(body)),
+        extra,
+        b"Connection: close\r\n\r\n" if close else b"\r\n",
+        body])
+
+
+def _error_body(message):
+    return _encode({"error": message}).encode("utf-8")
+
+
+class MicroBatcher:
+    """Collects records from concurrent requests and evaluates them together
+
+    submit() queues a list of (op, a, b) records with a callback that
+    receives their (results, errors) slice, or an exception. The queue is
+    flushed once per event-loop pass (or after max_delay seconds, or as
+    soon as max_batch records wait), so every request that arrived in
+    between shares one vectorized call. Callbacks run directly from the
+    flush; futures per request would cost more than the arithmetic. If the
+    shared call raises, the requests are evaluated again one at a time, so
+    the exception only reaches the request that caused it.
+    """
+
+    def __init__(self, evaluate=evaluate_chunk, max_batch=8192, max_delay=0.0,
+                 max_pending=65536, metrics=None):
+        self.evaluate = evaluate
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.metrics = metrics
+        self.pending = 0
+        self._queue = []
+        self._scheduled = None
+
+    def submit(self, records, deadline, callback):
+        """Queue records for evaluation, raises ServiceError 503 when full"""
+        if self.pending + len(records) > self.max_pending:
+            raise ServiceError(503, "Too many queued calculations, retry later")
+        self._queue.append((records, callback, deadline))
+        self.pending += len(records)
+        if self.pending >= self.max_batch:
+            self._cancel_flush()
+            self.flush()
+        elif self._scheduled is None:
+            loop = asyncio.get_running_loop()
+            if self.max_delay > 0:
+                self._scheduled = loop.call_later(self.max_delay, self.flush)
+            else:
+                self._scheduled = loop.call_soon(self.flush)
+
+    def _cancel_flush(self):
+        if self._scheduled is not None:
+            self._scheduled.cancel()
+            self._scheduled = None
+
+    def flush(self):
+        """Evaluate everything queued in one call and run the callbacks"""
+        self._scheduled = None
+        queue, self._queue = self._queue, []
+        self.pending = 0
+        now = time.monotonic()
+        live = []
+        for records, callback, deadline in queue:
+            if now > deadline:
+                # Shed requests that waited too long rather than make them later still
+                callback(None, ServiceError(504, "Calculation timed out"))
+            else:
+                live.append((records, callback))
+        if not live:
+            return
+        records = [record for entry, _ in live for record in entry]
+        started = time.perf_counter()
+        try:
+            outcome = self.evaluate(records)
+        except Exception as e:
+            if len(live) == 1:
+                live[0][1](None, e)
+            else:
+                self._evaluate_each(live)
+            return
+        if self.metrics is not None:
+            self.metrics.observe("mathmaster_service_batch_seconds", time.perf_counter() - started)
+            self.metrics.increment("mathmaster_service_batches_total")
+            self.metrics.increment("mathmaster_service_batched_records_total", len(records))
+        start = 0
+        for entry, callback in live:
+            stop = start + len(entry)
+            callback((outcome.results[start:stop], outcome.errors[start:stop]), None)
+            start = stop
+
+
+    def _evaluate_each(self, live):
+        """Evaluate request by request after the shared call failed"""
+        if self.metrics is not None:
+            self.metrics.increment("mathmaster_service_split_batches_total")
+        for records, callback in live:
+            try:
+                outcome = self.evaluate(records)
+            except Exception as e:
+                callback(None, e)
+            else:
+                callback((outcome.results, outcome.errors), None)
+
+
+class _Slot:
+    """Place of a response that is still being calculated"""
+
+    __slots__ = ("data",)
+
+    def __init__(self):
+        self.data = None
+
+
+class _Connection(asyncio.Protocol):
+    """One client connection: parses pipelined requests, answers in order"""
+
+    def __init__(self, service):
+        self.service = service
+        self.transport = None
+        self.buffer = bytearray()
+        self.responses = deque()
+        self.request_started = None
+        self.last_activity = time.monotonic()
+        self.closing = False
+        self.reading_paused = False
+        self.writing_paused = False
+        self._write_scheduled = False
+        self._timer = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.service.connections.add(self)
+        self._schedule_check(self.service.keep_alive_timeout)
+
+    def connection_lost(self, exc):
+        self.service.connections.discard(self)
+        self.closing = True
+        if self._timer is not None:
+            self._timer.cancel()
+        self.responses.clear()
+
+    def pause_writing(self):
+        self.writing_paused = True
+        self._update_reading()
+
+    def resume_writing(self):
+        self.writing_paused = False
+        self._update_reading()
+
+    def _update_reading(self):
+        """Stop reading while the client does not collect its answers"""
+        paused = self.writing_paused or len(self.responses) >= self.service.max_pipeline
+        if paused != self.reading_paused and not self.closing:
+            self.reading_paused = paused
+            if paused:
+                self.transport.pause_reading()
+            else:
+                self.transport.resume_reading()
+
+    def _schedule_check(self, delay):
+        self._timer = asyncio.get_running_loop().call_later(delay, self._check_timeouts)
+
+    def _check_timeouts(self):
+        """Close idle keep-alive connections and ones sending a request too slowly"""
+        now = time.monotonic()
+        service = self.service
+        if self.request_started is not None and now - self.request_started > service.request_timeout:
+            self._fail(408, "Request not received in time")
+            return
+        idle = now - self.last_activity
+        if not self.responses and not self.buffer and idle >= service.keep_alive_timeout:
+            self.transport.close()
+            return
+        self._schedule_check(min(service.keep_alive_timeout, service.request_timeout))
+
+    def _fail(self, status, message):
+        """Answer with an error after the pending responses and close"""
+        self.buffer.clear()
+        self.request_started = None
+        self._queue(_response(status, _error_body(message), close=True))
+        self.closing = True
+        self._write_ready()
+
+    def data_received(self, data):
+        if self.closing:
+            return
+        self.last_activity = time.monotonic()
+        self.buffer += data
+        service = self.service
+        while self.buffer and not self.closing:
+            if self.request_started is None:
+                self.request_started = self.last_activity
+            end = self.buffer.find(b"\r\n\r\n")
+            if end < 0:
+                if len(self.buffer) > MAX_HEADER_BYTES:
+                    self._fail(431, "Request headers too large")
+                return
+            try:
+                method, target, version, headers = self._parse_head(bytes(self.buffer[:end]))
+                length = int(headers.get(b"content-length", 0))
+                if length < 0:
+                    raise ValueError(length)
+            except ValueError:
+                self._fail(400, "Malformed request")
+                return
+            if length > service.max_body:
+                self._fail(413, "Request body too large")
+                return
+            if len(self.buffer) < end + 4 + length:
+                return
+            body = bytes(self.buffer[end + 4:end + 4 + length])
+            del self.buffer[:end + 4 + length]
+            self.request_started = None
+
+            connection = headers.get(b"connection", b"").lower()
+            close = connection == b"close" or (version == b"HTTP/1.0" and connection != b"keep-alive")
+            self._queue(service.handle(self, method, target, body, close))
+            if close:
+                self.closing = True
+        self._write_ready()
+
+    @staticmethod
+    def _parse_head(head):
+        lines = head.split(b"\r\n")
+        method, target, version = lines[0].split(b" ")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(b":")
+            headers[name.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    def _queue(self, response):
+        self.responses.append(response)
+        self._update_reading()
+
+    def fill(self, slot, data):
+        """Complete a pending response; writes are coalesced per loop pass"""
+        slot.data = data
+        if not self._write_scheduled:
+            self._write_scheduled = True
+            asyncio.get_running_loop().call_soon(self._write_ready)
+
+    def _write_ready(self):
+        """Write the finished responses at the head of the queue, in order"""
+        self._write_scheduled = False
+        if self.transport.is_closing():
+            return
+        responses = self.responses
+        ready = []
+        while responses:
+            head = responses[0]
+            if head.__class__ is _Slot:
+                if head.data is None:
+                    break
+                head = head.data
+            ready.append(head)
+            responses.popleft()
+        if ready and not self.transport.is_closing():
+            self.transport.write(b"".join(ready))
+        if self.closing and not responses:
+            self.transport.close()
+        else:
+            self._update_reading()
+
+
+class CalculationService:
+    """asyncio HTTP/JSON front end for the vectorized calculator
+
+    host/port select a TCP address (port 0 picks a free one); path serves
+    on a Unix socket instead. Limits: max_pending queued records overall,
+    max_pipeline requests in flight per connection, max_body bytes per
+    request, request_timeout seconds per request and keep_alive_timeout
+    seconds of idleness before a connection is closed.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, path=None, max_batch=8192,
+                 max_delay=0.0, max_pending=65536, max_pipeline=256, max_body=1 << 20,
+                 request_timeout=5.0, keep_alive_timeout=15.0, metrics=None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_pipeline = max_pipeline
+        self.max_body = max_body
+        self.request_timeout = request_timeout
+        self.keep_alive_timeout = keep_alive_timeout
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.metrics.describe("mathmaster_service_requests_total", "HTTP requests by endpoint and status")
+        self.metrics.describe("mathmaster_service_batch_seconds", "Time to evaluate one micro-batch")
+        self.batcher = MicroBatcher(max_batch=max_batch, max_delay=max_delay,
+                                    max_pending=max_pending, metrics=self.metrics)
+        self.connections = set()
+        self.server = None
+        self.started = None
+
+    async def start(self):
+        """Start listening; returns the bound address"""
+        loop = asyncio.get_running_loop()
+        factory = lambda: _Connection(self)
+        if self.path is not None:
+            self.server = await loop.create_unix_server(factory, self.path, backlog=1024)
+        else:
+            self.server = await loop.create_server(factory, self.host, self.port, backlog=1024,
+                                                   reuse_address=True)
+        self.started = time.monotonic()
+        return self.address
+
+    @property
+    def address(self):
+        if self.server is None:
+            return None
+        return self.server.sockets[0].getsockname()
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        """Stop accepting connections and close the open ones"""
+        if self.server is not None:
+            self.server.close()
+            for connection in list(self.connections):
+                connection.transport.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    def handle(self, connection, method, target, body, close):
+        """Response bytes, or a _Slot the connection fills later, for one request"""
+        path = target.split(b"?", 1)[0]
+        try:
+            if path == b"/calculate":
+                if method != b"POST":
+                    raise ServiceError(405, "Use POST for /calculate")
+                return self._calculate(connection, body, close)
+            if path == b"/health":
+                return self._finish("health", 200, _encode(self.health()).encode("utf-8"), close)
+            if path == b"/metrics":
+                return self._finish("metrics", 200, self.metrics_text().encode("utf-8"), close,
+                                    b"text/plain; version=0.0.4")
+            raise ServiceError(404, "Unknown endpoint")
+        except ServiceError as e:
+            return self._finish("calculate" if path == b"/calculate" else "other",
+                                e.status, _error_body(str(e)), close)
+
+    def _finish(self, endpoint, status, body, close, content_type=b"application/json",
+                started=None):
+        self.metrics.increment("mathmaster_service_requests_total", endpoint=endpoint, status=status)
+        if started is not None:
+            self.metrics.observe("mathmaster_service_request_seconds",
+                                 time.perf_counter() - started, endpoint=endpoint)
+        extra = b"Retry-After: 1\r\n" if status == 503 else b""
+        return _response(status, body, content_type, close, extra)
+
+    def _calculate(self, connection, body, close):
+        started = time.perf_counter()
+        try:
+            payload = _decode(body.decode("utf-8"))
+        except ValueError:
+            raise ServiceError(400, "Request body is not valid JSON")
+        many = isinstance(payload, list)
+        items = payload if many else [payload]
+        if not all(isinstance(item, dict) for item in items):
+            raise ServiceError(400, "Expected an object or an array of objects with op, a and b")
+        records = [(item.get("op"), item.get("a"), item.get("b")) for item in items]
+        slot = _Slot()
+
+        def respond(outcome, error):
+            if error is not None:
+                if isinstance(error, ServiceError):
+                    status = error.status
+                else:
+                    # Operands the evaluation rejected, otherwise a bug
+                    status = 422 if isinstance(error, (ValueError, ArithmeticError)) else 500
+                connection.fill(slot, self._finish("calculate", status, _error_body(str(error)), close))
+                return
+            results, errors = outcome
+            if many:
+                status, data = 200, [_outcome(r, e) for r, e in zip(results, errors)]
+            else:
+                data = _outcome(results[0], errors[0])
+                status = 200 if errors[0] is None else 422
+            connection.fill(slot, self._finish("calculate", status, _encode(data).encode("utf-8"),
+                                               close, started=started))
+
+        self.batcher.submit(records, time.monotonic() + self.request_timeout, respond)
+        return slot
+
+    def health(self):
+        return {"status": "ok", "pending": self.batcher.pending,
+                "connections": len(self.connections),
+                "uptime": round(time.monotonic() - self.started, 3) if self.started else 0.0}
+
+    def metrics_text(self):
+        """Prometheus text with the current queue depth and connection count"""
+        gauges = [
+            "# TYPE mathmaster_service_pending gauge",
+            f"mathmaster_service_pending {self.batcher.pending}",
+            "# TYPE mathmaster_service_connections gauge",
+            f"mathmaster_service_connections {len(self.connections)}",
+        ]
+        return self.metrics.to_prometheus() + "\n".join(gauges) + "\n"
+
+
+class CalculationClient:
+    """Keep-alive HTTP/JSON client for a CalculationService
+
+    Requests on one client are sent over a single connection; pipeline()
+    writes many requests before reading the answers, as a load generator
+    would.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, path=None, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        if self.path is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.reader = self.writer = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @staticmethod
+    def _request(method, target, payload=None):
+        body = b"" if payload is None else _encode(payload).encode("utf-8")
+        return (b"%s %s HTTP/1.1\r\nHost: mathmaster\r\nContent-Type: application/json\r\n"
+                b"Content-Length: %d\r\n\r\n" % (method, target, len(body))) + body
+
+    async def _read_response(self):
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.split(b"\r\n")
+        status = int(lines[0].split(b" ", 2)[1])
+        length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+                if length < 0:
+                    raise ValueError(f"Malformed Content-Length: {length}")
+        body = await self.reader.readexactly(length)
+        return status, body
+
+    async def request(self, method, target, payload=None):
+        """(status, body bytes) for one request"""
+        if self.writer is None:
+            await self.connect()
+        self.writer.write(self._request(method.encode(), target.encode(), payload))
+        return await asyncio.wait_for(self._read_response(), self.timeout)
+
+    async def calculate(self, op, a, b=None):
+        """Result of one operation; calculation errors raise ValueError"""
+        status, body = await self.request("POST", "/calculate", {"op": op, "a": a, "b": b})
+        data = json.loads(body)
+        if "error" in data:
+            raise ValueError(data["error"]) if status == 422 else ServiceError(status, data["error"])
+        return data["result"]
+
+    async def calculate_many(self, records):
+        """{"result": ...} or {"error": ...} for each (op, a, b) record, in one request"""
+        payload = [{"op": op, "a": a, "b": b} for op, a, b in records]
+        status, body = await self.request("POST", "/calculate", payload)
+        if status != 200:
+            raise ServiceError(status, json.loads(body).get("error", ""))
+        return json.loads(body)
+
+    async def pipeline(self, records):
+        """Send one request per record without waiting, then read every answer"""
+        if self.writer is None:
+            await self.connect()
+        self.writer.write(b"".join(self._request(b"POST", b"/calculate", {"op": op, "a": a, "b": b})
+                                   for op, a, b in records))
+        return await asyncio.wait_for(self._read_responses(len(records)), self.timeout)
+
+    async def _read_responses(self, count):
+        answers = []
+        for _ in range(count):
+            status, body = await self._read_response()
+            answers.append((status, _decode(body.decode("utf-8"))))
+        return answers
+
+    async def health(self):
+        return json.loads((await self.request("GET", "/health"))[1])
+
+    async def metrics(self):
+        return (await self.request("GET", "/metrics"))[1].decode("utf-8")
+
+
+async def load_test(host="127.0.0.1", port=DEFAULT_PORT, path=None, requests=20000,
+                    connections=8, depth=64):
+    """Requests per second over connections clients pipelining depth requests"""
+    per_client = requests // connections
+
+    async def client_run(index):
+        async with CalculationClient(host, port, path) as client:
+            records = [("add", index, i) for i in range(depth)]
+            for _ in range(per_client // depth):
+                await client.pipeline(records)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_run(i) for i in range(connections)))
+    return per_client // depth * depth * connections / (time.perf_counter() - started)
+
+
+def main(args):
+    """Run the service until interrupted"""
+    service = CalculationService(args.host, args.port, args.socket, max_pending=args.max_pending,
+                                 request_timeout=args.request_timeout)
+
+    async def run():
+        address = await service.start()
+        print(f"MathMaster service listening on {address}", file=sys.stderr)
+        await service.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,442 @@
+"""
+CalculatorCore - GUI-free calculation core for MathMaster
+
+Holds the operation registry, input parsing, result formatting and the
+calculation history. It only depends on the standard library and
+math_operations, so it imports quickly and can be reused without Tk.
+"""
+
+import math
+import re
+import time
+from collections import namedtuple
+
+from math_operations import MathOperations
+from exact_operations import ExactOperations
+from operation_cache import OperationCache, typed_key
+from expression_parser import ExpressionParser
+
+
+class InputError(ValueError):
+    """Raised when an operand cannot be parsed"""
+
+
+Operation = namedtuple(
+    "Operation", ["name", "label", "function", "arity", "integer_operands", "formatter"]
+)
+
+Calculation = namedtuple(
+    "Calculation", ["operation", "operands", "result", "display", "history", "number"]
+)
+
+
+def format_result(label, operands, result):
+    """Default formatting for the results panel and the history"""
+    if len(operands) == 2:
+        num1, num2 = operands
+        return (f"{label}\n\n{num1} + {num2} = {result}",
+                f"{num1} {label} {num2} = {result}")
+    num1 = operands[0]
+    return (f"{label}\n\n{num1} = {result}",
+            f"{label}({num1}) = {result}")
+
+
+def _format_percentage(label, operands, result):
+    return format_result(label, operands, f"{result}%")
+
+
+def _fixed(value, digits):
+    """Fixed-point formatting for floats; exact results arrive preformatted"""
+    return f"{value:.{digits}f}" if isinstance(value, float) else str(value)
+
+
+def _format_six_decimals(label, operands, result):
+    return format_result(label, operands, _fixed(result, 6))
+
+
+def _format_infinity(label, operands, result):
+    return format_result(label, operands, "∞ Infinite" if result else "Finite")
+
+
+def _format_trig(label, operands, result):
+    angle = operands[0]
+    display = "📈 Trigonometric Functions (angle in radians):\n\n"
+    display += f"sin({angle}) = {result['sin']:.6f}\n"
+    display += f"cos({angle}) = {result['cos']:.6f}\n"
+    display += f"tan({angle}) = {result['tan']:.6f}"
+    return display, f"Trig functions({angle}) = {result}"
+
+
+def _constant_formatter(title, name):
+    def formatter(label, operands, result):
+        value = _fixed(result, 10)
+        return f"{title}:\n\n{value}", f"{name} constant = {value}"
+    return formatter
+
+
+def _format_prime(label, operands, result):
+    return format_result(label, operands, "Prime" if result else "Not prime")
+
+
+def _format_factorization(label, operands, result):
+    factors = " × ".join(f"{p}^{e}" if e > 1 else str(p) for p, e in result.items())
+    return format_result(label, operands, factors or "1")
+
+
+_number_theory = None
+
+
+def _number_theory_method(name):
+    """Call a NumberTheory method, building the shared tables on first use"""
+    def call(*args):
+        global _number_theory
+        if _number_theory is None:
+            # Imported lazily: NumberTheory pulls in NumPy
+            from number_theory import NumberTheory
+            _number_theory = NumberTheory()
+        return getattr(_number_theory, name)(*args)
+    call.__name__ = name
+    return call
+
+
+_matrix_operations = None
+
+
+def _matrix_operations_class():
+    """MatrixOperations, imported on first use because it pulls in NumPy"""
+    global _matrix_operations
+    if _matrix_operations is None:
+        from matrix_operations import MatrixOperations
+        _matrix_operations = MatrixOperations
+    return _matrix_operations
+
+
+def _describe_matrix(value):
+    shape = getattr(value, "shape", ())
+    if len(shape) == 2:
+        return f"{shape[0]}×{shape[1]} matrix"
+    if len(shape) == 1:
+        return f"vector of {shape[0]}"
+    return value
+
+
+def _builtin_operations():
+    ops = MathOperations
+    return [
+        Operation("add", "➕ Addition", ops.add, 2, False, format_result),
+        Operation("subtract", "➖ Subtraction", ops.subtract, 2, False, format_result),
+        Operation("multiply", "✖ Multiplication", ops.multiply, 2, False, format_result),
+        Operation("divide", "➗ Division", ops.divide, 2, False, format_result),
+        Operation("modulus", "📐 Modulus", ops.modulus, 2, False, format_result),
+        Operation("power", "💪 Power", ops.power, 2, False, format_result),
+        Operation("square_root", "📊 Square Root", ops.square_root, 1, False, format_result),
+        Operation("percentage", "📈 Percentage", ops.percentage, 2, False, _format_percentage),
+        Operation("trig_functions", "📈 Sin/Cos/Tan", ops.trig_functions, 1, False, _format_trig),
+        Operation("logarithm", "🧮 Natural Logarithm", ops.logarithm, 1, False, _format_six_decimals),
+        Operation("factorial", "📐 Factorial", ops.factorial, 1, True, format_result),
+        Operation("absolute", "🎯 Absolute Value", ops.absolute, 1, False, format_result),
+        Operation("round_number", "🔄 Rounded Value", ops.round_number, 1, False, format_result),
+        Operation("pi", "π Pi Constant", lambda: math.pi, 0, False,
+                  _constant_formatter("π (Pi) Constant", "π")),
+        Operation("e", "𝑒 Euler's Number", lambda: math.e, 0, False,
+                  _constant_formatter("𝑒 (Euler's Number)", "e")),
+        Operation("is_infinity", "∞ Infinity Check", ops.is_infinity, 1, False, _format_infinity),
+        Operation("gcd", "🧮 GCD", ops.gcd, 2, True, format_result),
+        Operation("lcm", "📏 LCM", ops.lcm, 2, True, format_result),
+        Operation("is_prime", "🔍 Prime Check", _number_theory_method("is_prime"), 1, True,
+                  _format_prime),
+        Operation("factorize", "🧩 Prime Factors", _number_theory_method("factorize"), 1, True,
+                  _format_factorization),
+        Operation("totient", "φ Euler's Totient", _number_theory_method("totient"), 1, True,
+                  format_result),
+        Operation("divisor_count", "🔢 Divisor Count", _number_theory_method("divisor_count"), 1,
+                  True, format_result),
+    ]
+
+
+class CalculationHistory:
+    """Ordered in-memory record of formatted calculations
+
+    HistoryStore (history_store.py) provides the same interface backed by
+    a persistent database.
+    """
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, operation, operands, result, text):
+        """Record a calculation, only its formatted text is kept"""
+        return self.append(text)
+
+    def append(self, entry):
+        """Add an entry to the end of the history, returns its number"""
+        self.entries.append(entry)
+        return len(self.entries)
+
+    def recent(self, count=20):
+        """Return up to count entries, newest first"""
+        return list(reversed(self.entries[-count:]))
+
+    def page(self, before=None, count=20):
+        """Return up to count (number, entry) pairs numbered below before, newest first"""
+        end = len(self.entries) if before is None else min(before - 1, len(self.entries))
+        start = max(end - count, 0)
+        return [(i + 1, self.entries[i]) for i in range(end - 1, start - 1, -1)]
+
+    def clear(self):
+        """Remove every entry"""
+        self.entries.clear()
+
+    def export(self, path="math_calculations_history.txt"):
+        """Write the whole history to a text file, returns the entry count"""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("MathMaster Calculation History\n")
+            f.write("=" * 50 + "\n")
+            for i, calc in enumerate(self.entries, 1):
+                f.write(f"{i}. {calc}\n")
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_INTEGER = re.compile(r"[+-]?\d+")
+
+
+class CalculatorCore:
+    """Runs registered operations on raw text input and records the history
+
+    In exact mode operands are parsed without going through float and every
+    operation that has an ExactOperations counterpart uses it instead.
+    """
+
+    def __init__(self, history=None):
+        self.operations = {}
+        self.history = history if history is not None else CalculationHistory()
+        self.exact_operations = None
+        self.cache = None
+        self.metrics = None
+        self.last_result = None
+        self._float_parser = ExpressionParser()
+        self._exact_parser = None
+        for operation in _builtin_operations():
+            self.register(operation)
+
+    def enable_cache(self, cache=None):
+        """Memoize operation results in an OperationCache (opt-in)"""
+        self.cache = cache if cache is not None else OperationCache()
+        return self.cache
+
+    def disable_cache(self):
+        """Stop memoizing results"""
+        self.cache = None
+
+    def enable_metrics(self, metrics=None):
+        """Record call counts, errors and latencies in a Metrics registry (opt-in)"""
+        if metrics is None:
+            from instrumentation import Metrics
+            metrics = Metrics()
+        metrics.describe("mathmaster_operation_seconds", "Latency of calculator operations")
+        metrics.describe("mathmaster_operation_errors_total", "Calculations that raised an error")
+        self.metrics = metrics
+        return metrics
+
+    def disable_metrics(self):
+        """Stop recording metrics"""
+        self.metrics = None
+
+    def _measured(self, name, function, *args):
+        """Run function(*args), recording its latency and errors under name"""
+        metrics = self.metrics
+        mode = "exact" if self.exact else "float"
+        started = time.perf_counter()
+        try:
+            return function(*args)
+        except Exception as e:
+            metrics.increment("mathmaster_operation_errors_total", operation=name, mode=mode,
+                              error=type(e).__name__)
+            raise
+        finally:
+            metrics.observe("mathmaster_operation_seconds", time.perf_counter() - started,
+                            operation=name, mode=mode)
+
+    @property
+    def exact(self):
+        """True when exact, arbitrary-precision arithmetic is enabled"""
+        return self.exact_operations is not None
+
+    def set_exact_mode(self, enabled, precision=50):
+        """Switch between float and exact arithmetic"""
+        if not enabled:
+            self.exact_operations = None
+            self._exact_parser = None
+        elif self.exact_operations is None:
+            self.exact_operations = ExactOperations(precision)
+            self._exact_parser = ExpressionParser(self.exact_operations, self.exact_operations.parse)
+        elif self.exact_operations.precision != precision:
+            self.exact_operations.precision = precision
+            # Folded constants depend on the precision
+            self._exact_parser.clear_cache()
+
+    def register(self, operation):
+        """Add or replace an operation in the registry"""
+        self.operations[operation.name] = operation
+
+    def get_operation(self, name):
+        """Look up a registered operation"""
+        try:
+            return self.operations[name]
+        except KeyError:
+            raise ValueError(f"Unknown operation '{name}'!") from None
+
+    @staticmethod
+    def parse_number(text):
+        """Parse a single operand"""
+        try:
+            return float(text)
+        except (TypeError, ValueError):
+            raise InputError("Please enter a valid number!") from None
+
+    @staticmethod
+    def parse_numbers(first, second):
+        """Parse a pair of operands"""
+        try:
+            return float(first), float(second)
+        except (TypeError, ValueError):
+            raise InputError("Please enter valid numbers!") from None
+
+    def parse_exact(self, *texts):
+        """Parse operands without losing precision"""
+        try:
+            return tuple(self.exact_operations.parse(text) for text in texts)
+        except ValueError:
+            message = "Please enter a valid number!" if len(texts) == 1 else "Please enter valid numbers!"
+            raise InputError(message) from None
+
+    def parse_operands(self, operation, first=None, second=None):
+        """Parse the operands an operation needs from raw text"""
+        texts = (first, second)[:operation.arity]
+        if not texts:
+            operands = ()
+        elif operation.integer_operands and all(
+                isinstance(text, str) and _INTEGER.fullmatch(text.strip()) for text in texts):
+            # Whole numbers skip float so big integers stay exact
+            operands = tuple(int(text) for text in texts)
+        elif self.exact and hasattr(self.exact_operations, operation.name):
+            operands = self.parse_exact(*texts)
+        elif operation.arity == 1:
+            operands = (self.parse_number(first),)
+        else:
+            operands = self.parse_numbers(first, second)
+        if operation.integer_operands:
+            try:
+                operands = tuple(int(value) for value in operands)
+            except (OverflowError, ValueError):
+                raise ValueError(f"{operation.label} requires integer numbers!") from None
+        return operands
+
+    def calculate(self, name, first=None, second=None):
+        """Parse, compute, format and record a calculation
+
+        Raises InputError for unparseable input and ValueError when the
+        operation itself rejects the operands.
+        """
+        if self.metrics is not None:
+            return self._measured(name, self._calculate, name, first, second)
+        return self._calculate(name, first, second)
+
+    def preview(self, name, first=None, second=None):
+        """Compute like calculate, without recording anything in the history
+
+        Returns a Calculation whose number is None.
+        """
+        operation, operands, result, display, history = self._compute(name, first, second)
+        return Calculation(operation, operands, result, display, history, None)
+
+    def _calculate(self, name, first, second):
+        operation, operands, result, display, history = self._compute(name, first, second)
+        number = self.history.add(operation.name, operands, result, history)
+        return Calculation(operation, operands, result, display, history, number)
+
+    def _compute(self, name, first, second):
+        operation = self.get_operation(name)
+        operands = self.parse_operands(operation, first, second)
+        if self.exact and hasattr(self.exact_operations, operation.name):
+            function = getattr(self.exact_operations, operation.name)
+            mode = ("exact", self.exact_operations.precision)
+        else:
+            function = operation.function
+            mode = ("float",)
+        if self.cache is not None:
+            result = self.cache.call(mode + (operation.name,) + typed_key(*operands),
+                                     function, *operands)
+        else:
+            result = function(*operands)
+        if mode[0] == "exact":
+            display, history = self._format_exact(operation, operands, result)
+        else:
+            display, history = operation.formatter(operation.label, operands, result)
+        return operation, operands, result, display, history
+
+    def calculate_matrix(self, name, first, second=None):
+        """Run a MatrixOperations method on matrices (arrays or memory maps)
+
+        The history records the shapes of the operands and of the result,
+        not the matrices themselves.
+        """
+        if self.metrics is not None:
+            return self._measured("matrix_" + name, self._calculate_matrix, name, first, second)
+        return self._calculate_matrix(name, first, second)
+
+    def _calculate_matrix(self, name, first, second):
+        operations = _matrix_operations_class()
+        if name not in operations.OPERATIONS:
+            raise ValueError(f"Unknown matrix operation '{name}'!")
+        label, arity = operations.OPERATIONS[name]
+        if arity == 2 and second is None:
+            raise InputError(f"{label} needs a second matrix!")
+        operands = (first, second)[:arity]
+        result = getattr(operations, name)(*operands)
+        described = tuple(_describe_matrix(operand) for operand in operands)
+        # Decompositions are namedtuples of factors
+        summary = "factors" if hasattr(result, "_fields") else _describe_matrix(result)
+        names = ", ".join(f"{symbol}: {shape}" for symbol, shape in zip("AB", described))
+        history = f"{label} ({names}) = {summary}"
+        display = f"🔲 {label}\n\n{operations.format(name, result)}"
+        number = self.history.add("matrix_" + name, described, summary, history)
+        operation = Operation("matrix_" + name, label, getattr(operations, name), arity, False, None)
+        return Calculation(operation, operands, result, display, history, number)
+
+    def evaluate_expression(self, text):
+        """Evaluate a full expression such as "gcd(48, 18) + sqrt(2)^3 % 5"
+
+        The previous result is available as "ans". Raises
+        ExpressionSyntaxError for malformed input and ValueError (with the
+        position) when an operation rejects its operands.
+        """
+        if self.metrics is not None:
+            return self._measured("expression", self._evaluate_expression, text)
+        return self._evaluate_expression(text)
+
+    def _evaluate_expression(self, text):
+        parser = self._exact_parser if self.exact else self._float_parser
+        variables = {} if self.last_result is None else {"ans": self.last_result}
+        result = parser.evaluate(text.strip(), variables)
+        self.last_result = result
+        shown = self.exact_operations.format(result) if self.exact else result
+        display = f"🧮 Expression\n\n{text.strip()} = {shown}"
+        history = f"{text.strip()} = {shown}"
+        number = self.history.add("expression", (text.strip(),), result, history)
+        operation = Operation("expression", "🧮 Expression", parser.evaluate, 1, False, None)
+        return Calculation(operation, (text.strip(),), result, display, history, number)
+
+    def _format_exact(self, operation, operands, result):
+        """Format exact operands and results before the usual formatter runs"""
+        render = self.exact_operations.format
+        operands = tuple(render(value) for value in operands)
+        if not isinstance(result, bool):
+            result = render(result)
+        return operation.formatter(operation.label, operands, result)
@@ -1,12 +1,38 @@
+import os
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
-import math
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
-from math_operations import MathOperations
+from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
+import sqlite3
+from contextlib import nullcontext
+from functools import partial
+from background_tasks import TaskRunner
+from calculator_core import CalculatorCore, InputError
+from expression_parser import ExpressionSyntaxError
+from history_export import detect_format, export_history
+from history_store import HistoryStore
+from history_view import HistoryView
+from operation_cache import typed_key
 from styles import StyleManager
 
+# NumPy and matplotlib are imported lazily by _load_graph_modules
+np = None
+GraphCanvas = None
+adaptive_sample = None
+LevelOfDetailSampler = None
+plot_modes = None
+
+# Live mode waits this long after the last keystroke before evaluating
+LIVE_CALCULATION_DELAY_MS = 120
+LIVE_PLOT_DELAY_MS = 250
+
+# Entry label and range label for each plot mode
+PLOT_PROMPTS = {
+    "Function": ("Function f(x) =", "Range:"),
+    "Parametric": ("x(t); y(t) =", "t range:"),
+    "Polar": ("r(θ) =", "θ range:"),
+    "Implicit": ("F(x, y) = 0:", "x range:"),
+    "Heatmap": ("f(x, y) =", "x range:"),
+}
+
 class MathCalculatorApp:
     def __init__(self, root):
         self.root = root
@@ -16,8 +42,23 @@ class MathCalculatorApp:
         
         # Initialize components
         self.style_manager = StyleManager()
-        self.operations = MathOperations()
-        self.history = []
+        self.core = CalculatorCore(history=self.open_history_store())
+        self.expression_engine = None
+        self.graph_canvas = None
+        self.view_samplers = {}
+        self.plotted = {}
+        self.curve_vars = {}
+        self.loaded_matrices = {"A": None, "B": None}
+        self.matrix_result = None
+        self.live_operation = "add"
+        self._live_jobs = {}
+        self._live_calculation_key = None
+        self._live_plot_key = None
+        self.analyzer = None
+        self.tile_cache = None
+        self.profiler = None
+        self.tasks = TaskRunner(root, on_change=self.update_task_status)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         self.setup_gui()
         self.apply_styles()
@@ -69,6 +110,9 @@ class MathCalculatorApp:
         # Results and History Section
         self.create_results_history_section(self.scrollable_frame)
         
+        # Matrix Section
+        self.create_matrix_section(self.scrollable_frame)
+        
         # Graph Section
         self.create_graph_section(self.scrollable_frame)
         
@@ -98,9 +142,10 @@ class MathCalculatorApp:
         ttk.Label(input_frame, text="First Number:", font=('Arial', 11, 'bold')).grid(
             row=0, column=0, sticky=tk.W, padx=(0, 15), pady=5
         )
+        self.num1_var = tk.StringVar()
         self.num1_entry = tk.Entry(input_frame, font=('Arial', 12), width=20, 
                                  bg='white', fg='black', insertbackground='black',
-                                 relief='solid', bd=1)
+                                 relief='solid', bd=1, textvariable=self.num1_var)
         self.num1_entry.grid(row=0, column=1, sticky="ew", padx=(0, 30), pady=5)
         self.num1_entry.insert(0, "0")
         
@@ -108,22 +153,61 @@ class MathCalculatorApp:
         ttk.Label(input_frame, text="Second Number:", font=('Arial', 11, 'bold')).grid(
             row=0, column=2, sticky=tk.W, padx=(0, 15), pady=5
         )
+        self.num2_var = tk.StringVar()
         self.num2_entry = tk.Entry(input_frame, font=('Arial', 12), width=20,
                                  bg='white', fg='black', insertbackground='black',
-                                 relief='solid', bd=1)
+                                 relief='solid', bd=1, textvariable=self.num2_var)
         self.num2_entry.grid(row=0, column=3, sticky="ew", pady=5)
         self.num2_entry.insert(0, "0")
         
+        # Live preview of the last operation, errors included
+        self.live_label = ttk.Label(input_frame, text="", font=('Arial', 11))
+        self.live_label.grid(row=1, column=0, columnspan=4, sticky=tk.W)
+        for variable in (self.num1_var, self.num2_var):
+            variable.trace_add("write", self.on_number_change)
+        
+        # Expression mode
+        ttk.Label(input_frame, text="Expression:", font=('Arial', 11, 'bold')).grid(
+            row=2, column=0, sticky=tk.W, padx=(0, 15), pady=(10, 5)
+        )
+        self.expression_entry = tk.Entry(input_frame, font=('Arial', 12),
+                                       bg='white', fg='black', insertbackground='black',
+                                       relief='solid', bd=1)
+        self.expression_entry.grid(row=2, column=1, columnspan=2, sticky="ew", padx=(0, 15), pady=(10, 5))
+        self.expression_entry.insert(0, "gcd(48, 18) + sqrt(2)^3 % 5")
+        self.expression_entry.bind("<Return>", lambda event: self.evaluate_expression())
+        ttk.Button(input_frame, text="= Evaluate", command=self.evaluate_expression,
+                  style="Accent.TButton").grid(row=2, column=3, sticky=tk.W, pady=(10, 5))
+        
         # Input buttons
         button_frame = ttk.Frame(input_frame)
-        button_frame.grid(row=1, column=0, columnspan=4, pady=(15, 5))
+        button_frame.grid(row=3, column=0, columnspan=4, pady=(15, 5))
         
         ttk.Button(button_frame, text="🧹 Clear Inputs", 
                   command=self.clear_inputs, style="Accent.TButton").pack(side=tk.LEFT, padx=(0, 15))
         ttk.Button(button_frame, text="🎲 Set Random Numbers", 
                   command=self.set_random_numbers).pack(side=tk.LEFT, padx=(0, 15))
         ttk.Button(button_frame, text="🔢 Swap Numbers", 
-                  command=self.swap_numbers).pack(side=tk.LEFT)
+                  command=self.swap_numbers).pack(side=tk.LEFT, padx=(0, 15))
+        
+        # Exact arithmetic mode
+        self.exact_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_frame, text="Exact mode", variable=self.exact_var,
+                       command=self.toggle_exact_mode).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Label(button_frame, text="Digits:").pack(side=tk.LEFT, padx=(0, 5))
+        self.precision_var = tk.StringVar(value="50")
+        tk.Spinbox(button_frame, from_=1, to=10000, width=6, textvariable=self.precision_var,
+                   command=self.toggle_exact_mode).pack(side=tk.LEFT, padx=(0, 15))
+        
+        # Evaluate and plot while typing
+        self.live_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_frame, text="Live", variable=self.live_var,
+                       command=self.toggle_live_mode).pack(side=tk.LEFT, padx=(0, 15))
+        
+        # Result memoization
+        self.cache_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_frame, text="Cache results", variable=self.cache_var,
+                       command=self.toggle_cache).pack(side=tk.LEFT)
         
     def create_operations_section(self, parent):
         """Create basic operations buttons section"""
@@ -170,7 +254,11 @@ class MathCalculatorApp:
             ("𝑒 Euler's Number", self.euler_constant, "#e67e22"),
             ("∞ Check Infinity", self.check_infinity, "#34495e"),
             ("🧮 GCD Calculator", self.gcd_calculator, "#8e44ad"),
-            ("📏 LCM Calculator", self.lcm_calculator, "#d35400")
+            ("📏 LCM Calculator", self.lcm_calculator, "#d35400"),
+            ("🔍 Prime Check", self.prime_check, "#27ae60"),
+            ("🧩 Prime Factors", self.prime_factors, "#3498db"),
+            ("φ Euler's Totient", self.euler_totient, "#9b59b6"),
+            ("🔢 Divisor Count", self.divisor_count, "#e67e22")
         ]
         
         for i, (text, command, color) in enumerate(advanced_ops):
@@ -221,20 +309,91 @@ class MathCalculatorApp:
         ttk.Button(history_controls, text="📋 Copy Result", 
                   command=self.copy_result).pack(side=tk.LEFT)
         
+        # History paging
+        history_paging = ttk.Frame(history_frame)
+        history_paging.grid(row=2, column=0, pady=(10, 0), sticky="ew")
+        
+        ttk.Button(history_paging, text="◀ Older",
+                  command=self.show_older_history).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(history_paging, text="Newer ▶",
+                  command=self.show_newer_history).pack(side=tk.LEFT, padx=(0, 10))
+        self.history_page_label = ttk.Label(history_paging, text="Latest")
+        self.history_page_label.pack(side=tk.LEFT)
+        
+        self.history_view = HistoryView(self.history_text, self.core.history,
+                                        on_page_change=self.update_history_page_label)
+        self.history_view.show_latest()
+        
+    def create_matrix_section(self, parent):
+        """Create matrix input and linear algebra section"""
+        matrix_frame = ttk.LabelFrame(parent, text="🔲 Matrices", padding="15")
+        matrix_frame.grid(row=5, column=0, columnspan=3, sticky="ew", pady=(0, 15))
+        matrix_frame.columnconfigure(0, weight=1)
+        matrix_frame.columnconfigure(1, weight=1)
+        
+        # One grid entry per matrix; rows on separate lines or separated by ';'
+        self.matrix_texts = {}
+        self.matrix_labels = {}
+        for column, (name, default) in enumerate((("A", "4 3\n6 3"), ("B", "1\n2"))):
+            ttk.Label(matrix_frame, text=f"Matrix {name}:", font=('Arial', 11, 'bold')).grid(
+                row=0, column=column, sticky=tk.W, pady=(0, 5))
+            text = tk.Text(matrix_frame, height=5, width=30, font=('Courier', 11),
+                           bg='white', fg='black', insertbackground='black',
+                           relief='solid', bd=1)
+            text.grid(row=1, column=column, sticky="ew", padx=(0, 15))
+            text.insert(1.0, default)
+            self.matrix_texts[name] = text
+            
+            file_frame = ttk.Frame(matrix_frame)
+            file_frame.grid(row=2, column=column, sticky=tk.W, pady=(5, 0))
+            ttk.Button(file_frame, text=f"📂 Load {name}…",
+                      command=partial(self.load_matrix_file, name)).pack(side=tk.LEFT, padx=(0, 10))
+            ttk.Button(file_frame, text="✖ Use Grid",
+                      command=partial(self.unload_matrix, name)).pack(side=tk.LEFT, padx=(0, 10))
+            self.matrix_labels[name] = ttk.Label(file_frame, text="Grid entry")
+            self.matrix_labels[name].pack(side=tk.LEFT)
+        
+        # Operations
+        matrix_ops = ttk.Frame(matrix_frame)
+        matrix_ops.grid(row=3, column=0, columnspan=2, pady=(15, 0), sticky="ew")
+        for i in range(5):
+            matrix_ops.columnconfigure(i, weight=1)
+        operations = [
+            ("➕ A + B", "add"), ("✖ A × B", "multiply"), ("📐 det(A)", "determinant"),
+            ("🔄 A⁻¹", "inverse"), ("🎯 Solve Ax = B", "solve"), ("λ Eigenvalues", "eigenvalues"),
+            ("🧩 LU", "lu"), ("🧩 QR", "qr"), ("📏 rank(A)", "rank"),
+        ]
+        for i, (text, name) in enumerate(operations):
+            row, col = divmod(i, 5)
+            ttk.Button(matrix_ops, text=text, command=partial(self.run_matrix_operation, name)).grid(
+                row=row, column=col, padx=6, pady=6, sticky="ew")
+        ttk.Button(matrix_ops, text="💾 Save Result…", command=self.save_matrix_result).grid(
+            row=1, column=4, padx=6, pady=6, sticky="ew")
+        ttk.Button(matrix_ops, text="📊 Summarize Data…", command=self.summarize_data_file).grid(
+            row=2, column=0, padx=6, pady=6, sticky="ew")
+        
     def create_graph_section(self, parent):
         """Create graphing section"""
         graph_frame = ttk.LabelFrame(parent, text="📈 Function Graph", padding="15")
-        graph_frame.grid(row=5, column=0, columnspan=3, sticky="ew", pady=(0, 15))
+        graph_frame.grid(row=6, column=0, columnspan=3, sticky="ew", pady=(0, 15))
         graph_frame.columnconfigure(0, weight=1)
         
         # Graph controls
         graph_controls = ttk.Frame(graph_frame)
         graph_controls.grid(row=0, column=0, pady=(0, 15), sticky="ew")
         
-        ttk.Label(graph_controls, text="Function f(x) =", font=('Arial', 11, 'bold')).pack(side=tk.LEFT, padx=(0, 10))
+        self.plot_mode = tk.StringVar(value="Function")
+        mode_box = ttk.Combobox(graph_controls, textvariable=self.plot_mode, values=list(PLOT_PROMPTS),
+                                state="readonly", width=10)
+        mode_box.pack(side=tk.LEFT, padx=(0, 10))
+        mode_box.bind("<<ComboboxSelected>>", self.change_plot_mode)
+        
+        self.function_label = ttk.Label(graph_controls, text="Function f(x) =", font=('Arial', 11, 'bold'))
+        self.function_label.pack(side=tk.LEFT, padx=(0, 10))
+        self.function_var = tk.StringVar()
         self.function_entry = tk.Entry(graph_controls, width=25, font=('Arial', 11),
                                      bg='white', fg='black', insertbackground='black',
-                                     relief='solid', bd=1)
+                                     relief='solid', bd=1, textvariable=self.function_var)
         self.function_entry.pack(side=tk.LEFT, padx=(0, 15))
         self.function_entry.insert(0, "x**2")
         
@@ -242,12 +401,18 @@ class MathCalculatorApp:
                   command=self.plot_graph, style="Accent.TButton").pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(graph_controls, text="🗑️ Clear Graph", 
                   command=self.clear_graph).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(graph_controls, text="🔍 Analyze", 
+                  command=self.analyze_graph).pack(side=tk.LEFT, padx=(0, 10))
+        self.overlay_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(graph_controls, text="Overlay",
+                       variable=self.overlay_var).pack(side=tk.LEFT, padx=(0, 10))
         
         # Range controls
         range_frame = ttk.Frame(graph_frame)
         range_frame.grid(row=1, column=0, pady=(0, 15), sticky="w")
         
-        ttk.Label(range_frame, text="Range:").pack(side=tk.LEFT, padx=(0, 10))
+        self.range_label = ttk.Label(range_frame, text="Range:")
+        self.range_label.pack(side=tk.LEFT, padx=(0, 10))
         ttk.Label(range_frame, text="From").pack(side=tk.LEFT, padx=(0, 5))
         self.range_start = tk.Entry(range_frame, width=8, font=('Arial', 10),
                                   bg='white', fg='black', insertbackground='black',
@@ -262,271 +427,789 @@ class MathCalculatorApp:
         self.range_end.pack(side=tk.LEFT, padx=(0, 15))
         self.range_end.insert(0, "10")
         
+        # y range of implicit curves and heatmaps
+        ttk.Label(range_frame, text="y From").pack(side=tk.LEFT, padx=(0, 5))
+        self.y_range_start = tk.Entry(range_frame, width=8, font=('Arial', 10),
+                                    bg='white', fg='black', insertbackground='black',
+                                    relief='solid', bd=1)
+        self.y_range_start.pack(side=tk.LEFT, padx=(0, 15))
+        self.y_range_start.insert(0, "-10")
+        
+        ttk.Label(range_frame, text="To").pack(side=tk.LEFT, padx=(0, 5))
+        self.y_range_end = tk.Entry(range_frame, width=8, font=('Arial', 10),
+                                  bg='white', fg='black', insertbackground='black',
+                                  relief='solid', bd=1)
+        self.y_range_end.pack(side=tk.LEFT, padx=(0, 15))
+        self.y_range_end.insert(0, "10")
+        
+        # Live mode shows plot errors here and keeps the last valid plot
+        self.graph_status = ttk.Label(range_frame, text="", foreground='#e74c3c')
+        self.graph_status.pack(side=tk.LEFT)
+        self.function_var.trace_add("write", self.on_function_change)
+        
+        # One toggle per plotted curve
+        self.curve_toggles = ttk.Frame(graph_frame)
+        self.curve_toggles.grid(row=2, column=0, sticky="w")
+        
         # Graph display
         self.graph_frame = ttk.Frame(graph_frame, height=300)
-        self.graph_frame.grid(row=2, column=0, sticky="ew")
+        self.graph_frame.grid(row=3, column=0, sticky="ew")
         self.graph_frame.columnconfigure(0, weight=1)
         
     def create_footer(self, parent):
         """Create footer section"""
         footer_frame = ttk.Frame(parent)
-        footer_frame.grid(row=6, column=0, columnspan=3, sticky="ew", pady=(20, 0))
+        footer_frame.grid(row=7, column=0, columnspan=3, sticky="ew", pady=(20, 0))
         
         footer_label = ttk.Label(footer_frame, text="🧮 MathMaster - Your Advanced Mathematical Companion", 
                                font=('Arial', 10, 'italic'), foreground='#7f8c8d')
         footer_label.pack()
         
+        # Background job status
+        status_frame = ttk.Frame(footer_frame)
+        status_frame.pack(pady=(10, 0))
+        self.status_label = ttk.Label(status_frame, text="Ready", width=30)
+        self.status_label.pack(side=tk.LEFT, padx=(0, 10))
+        self.progress_bar = ttk.Progressbar(status_frame, length=200, maximum=1.0)
+        self.progress_bar.pack(side=tk.LEFT, padx=(0, 10))
+        self.cancel_button = ttk.Button(status_frame, text="✖ Cancel",
+                                        command=self.cancel_tasks, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=(0, 20))
+        
+        # Opt-in instrumentation
+        self.metrics_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(status_frame, text="Record metrics", variable=self.metrics_var,
+                       command=self.toggle_metrics).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(status_frame, text="💾 Export Metrics",
+                  command=self.export_metrics).pack(side=tk.LEFT, padx=(0, 10))
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(status_frame, text="Profile session", variable=self.profile_var,
+                       command=self.toggle_profiling).pack(side=tk.LEFT)
+        
+    def open_history_store(self):
+        """Open the persistent history, falling back to memory if unavailable"""
+        try:
+            return HistoryStore()
+        except sqlite3.Error:
+            return None
+
     def apply_styles(self):
         """Apply custom styles to the application"""
         self.style_manager.configure_styles()
         
-    def get_numbers(self):
-        """Get and validate input numbers"""
+    def toggle_exact_mode(self):
+        """Switch the calculator between float and exact arithmetic"""
         try:
-            num1 = float(self.num1_entry.get())
-            num2 = float(self.num2_entry.get())
-            return num1, num2
+            self.core.set_exact_mode(self.exact_var.get(), int(self.precision_var.get()))
         except ValueError:
-            messagebox.showerror("Input Error", "Please enter valid numbers!")
-            return None, None
+            messagebox.showerror("Input Error", "Precision must be a positive whole number!")
+            return
+        # The live result was computed in the other mode or precision
+        self._live_calculation_key = None
+        if self.live_var.get():
+            self.preview_calculation()
+            
+    def toggle_cache(self):
+        """Turn memoization of operations and graph samples on or off"""
+        if self.cache_var.get():
+            self.core.enable_cache()
+        else:
+            self.core.disable_cache()
+            
+    def run_operation(self, name):
+        """Run a registered operation on the current inputs in the background"""
+        # Tk widgets are only read here, on the main thread
+        first, second = self.num1_entry.get(), self.num2_entry.get()
+        # Live mode previews the operation used last
+        self.live_operation = name
+        self._live_calculation_key = None
+        # Not replace: the history row is written by the job itself
+        return self.tasks.submit("calculation", self.core.calculate, name, first, second,
+                                 replace=False,
+                                 on_done=self.show_calculation,
+                                 on_error=self.show_calculation_error)
+
+    def toggle_live_mode(self):
+        """Start or stop evaluating and plotting while typing"""
+        self._live_calculation_key = None
+        self._live_plot_key = None
+        if self.live_var.get():
+            self.preview_calculation()
+            self.preview_plot()
+            return
+        for job in self._live_jobs.values():
+            self.root.after_cancel(job)
+        self._live_jobs.clear()
+        # A live plot still sampling would report its errors in a dialog
+        self.tasks.cancel("preview")
+        self.tasks.cancel("plot")
+        self.live_label.config(text="")
+        self.graph_status.config(text="")
+        
+    def _debounce(self, name, delay, function):
+        """Run function once no call for name came in for delay ms"""
+        job = self._live_jobs.pop(name, None)
+        if job is not None:
+            self.root.after_cancel(job)
+        
+        def run():
+            del self._live_jobs[name]
+            function()
+        
+        self._live_jobs[name] = self.root.after(delay, run)
+        
+    def on_number_change(self, *trace):
+        if self.live_var.get():
+            self._debounce("calculation", LIVE_CALCULATION_DELAY_MS, self.preview_calculation)
+            
+    def on_function_change(self, *trace):
+        if self.live_var.get():
+            self._debounce("plot", LIVE_PLOT_DELAY_MS, self.preview_plot)
             
-    def get_single_number(self):
-        """Get and validate a single input number"""
+    def preview_calculation(self):
+        """Re-evaluate the live operation if its parsed operands changed"""
+        name = self.live_operation
+        first, second = self.num1_entry.get(), self.num2_entry.get()
         try:
-            return float(self.num1_entry.get())
-        except ValueError:
-            messagebox.showerror("Input Error", "Please enter a valid number!")
+            operation = self.core.get_operation(name)
+            operands = self.core.parse_operands(operation, first, second)
+        except ValueError as e:
+            self._live_calculation_key = None
+            self.show_live_error(e)
+            return None
+        # "2", "2.0" and an edit to an unused second operand give the same key
+        precision = self.core.exact_operations.precision if self.core.exact else None
+        key = (name, precision) + typed_key(*operands)
+        if key == self._live_calculation_key:
             return None
+        self._live_calculation_key = key
+        return self.tasks.submit("preview", self.core.preview, name, first, second,
+                                 on_done=self.show_live_result, on_error=self.show_live_error)
+        
+    def show_live_result(self, calculation):
+        self.live_label.config(text=f"= {calculation.history}", foreground='#27ae60')
+        
+    def show_live_error(self, error):
+        self.live_label.config(text=f"⚠ {error}", foreground='#e74c3c')
+        
+    def preview_plot(self):
+        """Plot the function entry as typed; invalid input keeps the last plot"""
+        if self.function_entry.get().strip():
+            self.plot_graph(live=True)
+            
+    def evaluate_expression(self):
+        """Evaluate the expression entry in the background"""
+        text = self.expression_entry.get()
+        return self.tasks.submit("expression", self.core.evaluate_expression, text, replace=False,
+                                 on_done=self.show_calculation,
+                                 on_error=self.show_calculation_error)
+
+    def show_calculation(self, calculation):
+        """Show a finished calculation and add it to the history"""
+        self.show_result(calculation.display)
+        self.history_view.add(calculation.number, calculation.history)
+
+    def show_calculation_error(self, error):
+        """Report why a calculation failed"""
+        if isinstance(error, ExpressionSyntaxError):
+            # Put the cursor where the problem is
+            self.expression_entry.icursor(error.position)
+            self.expression_entry.focus_set()
+            messagebox.showerror("Input Error", str(error))
+        elif isinstance(error, InputError):
+            messagebox.showerror("Input Error", str(error))
+        elif isinstance(error, (ValueError, ArithmeticError)):
+            messagebox.showerror("Math Error", str(error))
+        else:
+            messagebox.showerror("Error", f"Calculation failed: {str(error)}")
+
+    def read_matrix(self, name):
+        """Matrix name from its loaded file or its grid entry"""
+        if self.loaded_matrices[name] is not None:
+            return self.loaded_matrices[name]
+        from matrix_operations import parse_matrix
+        try:
+            return parse_matrix(self.matrix_texts[name].get(1.0, tk.END))
+        except ValueError as e:
+            raise InputError(f"Matrix {name}: {e}") from None
+            
+    def run_matrix_operation(self, name):
+        """Run a linear algebra operation on A (and B) in the background"""
+        try:
+            first = self.read_matrix("A")
+            second = self.read_matrix("B") if name in ("add", "multiply", "solve") else None
+        except (InputError, ValueError) as e:
+            self.show_calculation_error(e)
+            return None
+        
+        def done(calculation):
+            self.matrix_result = calculation.result
+            self.show_calculation(calculation)
+        
+        return self.tasks.submit("matrix", self.core.calculate_matrix, name, first, second,
+                                 replace=False,
+                                 on_done=done, on_error=self.show_calculation_error)
+            
+    def load_matrix_file(self, name):
+        """Load matrix name from a .npy (memory-mapped) or CSV file in the background"""
+        path = filedialog.askopenfilename(
+            title=f"Load Matrix {name}",
+            filetypes=[("Matrices", "*.npy *.csv *.txt"), ("All files", "*.*")])
+        if not path:
+            return None
+        
+        def load():
+            from matrix_operations import load_matrix
+            return load_matrix(path)
+        
+        def done(matrix):
+            self.loaded_matrices[name] = matrix
+            rows, columns = matrix.shape
+            self.matrix_labels[name].config(text=f"{os.path.basename(path)} ({rows}×{columns})")
+            self.matrix_texts[name].config(state=tk.DISABLED)
+        
+        return self.tasks.submit(f"load {name}", load, on_done=done,
+                                 on_error=lambda error: messagebox.showerror(
+                                     "Load Error", f"Could not load matrix: {str(error)}"))
+            
+    def unload_matrix(self, name):
+        """Go back to the grid entry for matrix name"""
+        self.loaded_matrices[name] = None
+        self.matrix_labels[name].config(text="Grid entry")
+        self.matrix_texts[name].config(state=tk.NORMAL)
+        
+    def save_matrix_result(self):
+        """Save the last matrix result as .npy or CSV"""
+        if self.matrix_result is None:
+            messagebox.showinfo("Save Result", "Run a matrix operation first.")
+            return
+        path = filedialog.asksaveasfilename(
+            title="Save Matrix Result", defaultextension=".npy",
+            filetypes=[("NumPy array", "*.npy"), ("CSV", "*.csv")])
+        if not path:
+            return
+        from matrix_operations import save_matrix
+        result = self.matrix_result
+        # Decompositions are saved as their packed factors
+        if hasattr(result, "_fields"):
+            result = result[0]
+        try:
+            save_matrix(path, result)
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Could not save result: {str(e)}")
+            
+    def summarize_data_file(self):
+        """Mean, spread, quantiles and histogram of a data file, in one background pass"""
+        path = filedialog.askopenfilename(
+            title="Summarize Data", filetypes=[("Data", "*.csv *.txt *.npy"), ("All files", "*.*")])
+        if not path:
+            return None
+        column = simpledialog.askstring("Summarize Data",
+                                        "Column index or name (leave empty for every value):",
+                                        parent=self.root)
+        if column is None:
+            return None
+        column = column.strip() or None
+        name = os.path.basename(path) + (f"[{column}]" if column else "")
+        
+        def summarize():
+            from data_statistics import format_statistics, summarize_file
+            statistics = summarize_file(path, column).result()
+            return statistics, format_statistics(statistics)
+        
+        def done(result):
+            statistics, report = result
+            self.show_result(f"📊 Statistics of {name}\n\n{report}")
+            history = (f"Statistics of {name}: n = {statistics.count}, mean = {statistics.mean:.10g}, "
+                       f"std = {statistics.std:.10g}")
+            number = self.core.history.add("statistics", (name,), statistics.mean, history)
+            self.history_view.add(number, history)
+        
+        return self.tasks.submit("statistics", summarize, on_done=done,
+                                 on_error=self.show_calculation_error)
+            
+    def cancel_tasks(self):
+        """Cancel every running calculation and plot"""
+        self.tasks.cancel()
+
+    def update_task_status(self, runner):
+        """Reflect running background jobs in the status bar"""
+        active = runner.active
+        if not active:
+            self.status_label.config(text="Ready")
+            self.progress_bar.stop()
+            self.progress_bar.config(mode="determinate", value=0)
+            self.cancel_button.config(state=tk.DISABLED)
+            return
+        task = active[-1]
+        self.status_label.config(text=f"Working: {task.name}…")
+        self.cancel_button.config(state=tk.NORMAL)
+        if task.progress is None:
+            if str(self.progress_bar.cget("mode")) != "indeterminate":
+                self.progress_bar.config(mode="indeterminate")
+                self.progress_bar.start(15)
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.config(mode="determinate", value=task.progress)
+
+    def toggle_metrics(self):
+        """Turn latency and error recording on or off"""
+        if self.metrics_var.get():
+            metrics = self.core.enable_metrics()
+            metrics.describe("mathmaster_plot_phase_seconds", "Time spent in each step of plotting")
+        else:
+            self.core.disable_metrics()
+            
+    def export_metrics(self):
+        """Export recorded metrics as Prometheus text and JSON"""
+        if self.core.metrics is None:
+            messagebox.showinfo("Metrics", "Tick 'Record metrics' to start recording first.")
+            return
+        try:
+            self.core.metrics.export("mathmaster_metrics.prom")
+            self.core.metrics.export("mathmaster_metrics.json")
+            messagebox.showinfo("Export Successful",
+                                "Metrics exported to 'mathmaster_metrics.prom' and 'mathmaster_metrics.json'")
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Could not export metrics: {str(e)}")
+            
+    def toggle_profiling(self):
+        """Start a cProfile session, or stop it and dump the stats"""
+        if self.profile_var.get():
+            from instrumentation import ProfileSession
+            self.profiler = ProfileSession()
+            self.tasks.profiler = self.profiler
+            self.profiler.start()
+            return
+        profiler, self.profiler = self.profiler, None
+        self.tasks.profiler = None
+        if profiler is None:
+            return
+        try:
+            profiler.dump("mathmaster_profile.prof")
+            messagebox.showinfo("Profile Saved", "Profile written to 'mathmaster_profile.prof'")
+        except Exception as e:
+            messagebox.showerror("Profile Error", f"Could not write profile: {str(e)}")
+            
+    def _plot_phase(self, phase):
+        """Time one step of plotting when metrics are being recorded"""
+        metrics = self.core.metrics
+        if metrics is None:
+            return nullcontext()
+        return metrics.timer("mathmaster_plot_phase_seconds", phase=phase)
+
+    def on_close(self):
+        """Stop background work before the window goes away"""
+        self.tasks.shutdown()
+        if self.profiler is not None:
+            self.profiler.dump("mathmaster_profile.prof")
+        self.root.destroy()
+
+    def show_result(self, text):
+        """Replace the contents of the results panel"""
+        self.result_text.config(state=tk.NORMAL)
+        self.result_text.delete(1.0, tk.END)
+        self.result_text.insert(tk.END, text)
+        self.result_text.config(state=tk.DISABLED)
 
     # Basic Operations
     def addition(self):
-        num1, num2 = self.get_numbers()
-        if num1 is not None and num2 is not None:
-            result = self.operations.add(num1, num2)
-            self.display_result("➕ Addition", num1, num2, result)
+        self.run_operation("add")
             
     def subtraction(self):
-        num1, num2 = self.get_numbers()
-        if num1 is not None and num2 is not None:
-            result = self.operations.subtract(num1, num2)
-            self.display_result("➖ Subtraction", num1, num2, result)
+        self.run_operation("subtract")
             
     def multiplication(self):
-        num1, num2 = self.get_numbers()
-        if num1 is not None and num2 is not None:
-            result = self.operations.multiply(num1, num2)
-            self.display_result("✖ Multiplication", num1, num2, result)
+        self.run_operation("multiply")
             
     def division(self):
-        num1, num2 = self.get_numbers()
-        if num1 is not None and num2 is not None:
-            try:
-                result = self.operations.divide(num1, num2)
-                self.display_result("➗ Division", num1, num2, result)
-            except ValueError as e:
-                messagebox.showerror("Math Error", str(e))
+        self.run_operation("divide")
                 
     def modulus(self):
-        num1, num2 = self.get_numbers()
-        if num1 is not None and num2 is not None:
-            try:
-                result = self.operations.modulus(num1, num2)
-                self.display_result("📐 Modulus", num1, num2, result)
-            except ValueError as e:
-                messagebox.showerror("Math Error", str(e))
+        self.run_operation("modulus")
                 
     def power(self):
-        num1, num2 = self.get_numbers()
-        if num1 is not None and num2 is not None:
-            result = self.operations.power(num1, num2)
-            self.display_result("💪 Power", num1, num2, result)
+        self.run_operation("power")
             
     def square_root(self):
-        num1 = self.get_single_number()
-        if num1 is not None:
-            try:
-                result = self.operations.square_root(num1)
-                self.display_result("📊 Square Root", num1, None, result)
-            except ValueError as e:
-                messagebox.showerror("Math Error", str(e))
+        self.run_operation("square_root")
 
     def percentage(self):
-        num1, num2 = self.get_numbers()
-        if num1 is not None and num2 is not None:
-            try:
-                result = self.operations.percentage(num1, num2)
-                self.display_result("📈 Percentage", num1, num2, f"{result}%")
-            except ValueError as e:
-                messagebox.showerror("Math Error", str(e))
+        self.run_operation("percentage")
                 
     # Advanced Operations
     def trig_functions(self):
-        num1 = self.get_single_number()
-        if num1 is not None:
-            results = self.operations.trig_functions(num1)
-            result_str = f"📈 Trigonometric Functions (angle in radians):\n\n"
-            result_str += f"sin({num1}) = {results['sin']:.6f}\n"
-            result_str += f"cos({num1}) = {results['cos']:.6f}\n"
-            result_str += f"tan({num1}) = {results['tan']:.6f}"
-            
-            self.result_text.config(state=tk.NORMAL)
-            self.result_text.delete(1.0, tk.END)
-            self.result_text.insert(tk.END, result_str)
-            self.result_text.config(state=tk.DISABLED)
-            
-            self.history.append(f"Trig functions({num1}) = {results}")
-            self.update_history_display()
+        self.run_operation("trig_functions")
             
     def logarithm(self):
-        num1 = self.get_single_number()
-        if num1 is not None:
-            try:
-                result = self.operations.logarithm(num1)
-                self.display_result("🧮 Natural Logarithm", num1, None, f"{result:.6f}")
-            except ValueError as e:
-                messagebox.showerror("Math Error", str(e))
+        self.run_operation("logarithm")
                 
     def factorial(self):
-        num1 = self.get_single_number()
-        if num1 is not None:
-            try:
-                result = self.operations.factorial(int(num1))
-                self.display_result("📐 Factorial", int(num1), None, result)
-            except ValueError as e:
-                messagebox.showerror("Math Error", str(e))
+        self.run_operation("factorial")
                 
     def absolute(self):
-        num1 = self.get_single_number()
-        if num1 is not None:
-            result = self.operations.absolute(num1)
-            self.display_result("🎯 Absolute Value", num1, None, result)
+        self.run_operation("absolute")
             
     def round_number(self):
-        num1 = self.get_single_number()
-        if num1 is not None:
-            result = self.operations.round_number(num1)
-            self.display_result("🔄 Rounded Value", num1, None, result)
+        self.run_operation("round_number")
 
     def pi_constant(self):
         """Display Pi constant"""
-        result = math.pi
-        self.result_text.config(state=tk.NORMAL)
-        self.result_text.delete(1.0, tk.END)
-        self.result_text.insert(tk.END, f"π (Pi) Constant:\n\n{result:.10f}")
-        self.result_text.config(state=tk.DISABLED)
-        self.history.append(f"π constant = {result:.10f}")
-        self.update_history_display()
+        self.run_operation("pi")
 
     def euler_constant(self):
         """Display Euler's number"""
-        result = math.e
-        self.result_text.config(state=tk.NORMAL)
-        self.result_text.delete(1.0, tk.END)
-        self.result_text.insert(tk.END, f"𝑒 (Euler's Number):\n\n{result:.10f}")
-        self.result_text.config(state=tk.DISABLED)
-        self.history.append(f"e constant = {result:.10f}")
-        self.update_history_display()
+        self.run_operation("e")
 
     def check_infinity(self):
         """Check if number is infinite"""
-        num1 = self.get_single_number()
-        if num1 is not None:
-            is_inf = math.isinf(num1)
-            result_str = "∞ Infinite" if is_inf else "Finite"
-            self.display_result("∞ Infinity Check", num1, None, result_str)
+        self.run_operation("is_infinity")
 
     def gcd_calculator(self):
         """Calculate Greatest Common Divisor"""
-        num1, num2 = self.get_numbers()
-        if num1 is not None and num2 is not None:
-            try:
-                result = math.gcd(int(num1), int(num2))
-                self.display_result("🧮 GCD", int(num1), int(num2), result)
-            except ValueError as e:
-                messagebox.showerror("Math Error", "GCD requires integer numbers!")
+        self.run_operation("gcd")
 
     def lcm_calculator(self):
         """Calculate Least Common Multiple"""
-        num1, num2 = self.get_numbers()
-        if num1 is not None and num2 is not None:
-            try:
-                result = math.lcm(int(num1), int(num2))
-                self.display_result("📏 LCM", int(num1), int(num2), result)
-            except (ValueError, AttributeError):
-                # Fallback for older Python versions without math.lcm
-                try:
-                    gcd = math.gcd(int(num1), int(num2))
-                    result = abs(int(num1) * int(num2)) // gcd
-                    self.display_result("📏 LCM", int(num1), int(num2), result)
-                except ValueError as e:
-                    messagebox.showerror("Math Error", "LCM requires integer numbers!")
-            
-    def display_result(self, operation, num1, num2=None, result=None):
-        """Display the result and add to history"""
-        if result is None:
-            return
-            
-        if num2 is not None:
-            result_str = f"{operation}\n\n{num1} + {num2} = {result}"
-            history_str = f"{num1} {operation} {num2} = {result}"
-        else:
-            result_str = f"{operation}\n\n{num1} = {result}"
-            history_str = f"{operation}({num1}) = {result}"
-            
-        # Display in results
-        self.result_text.config(state=tk.NORMAL)
-        self.result_text.delete(1.0, tk.END)
-        self.result_text.insert(tk.END, result_str)
-        self.result_text.config(state=tk.DISABLED)
-        
-        # Add to history
-        self.history.append(history_str)
-        self.update_history_display()
+        self.run_operation("lcm")
+
+    # Number Theory
+    def prime_check(self):
+        """Check whether the first number is prime"""
+        self.run_operation("is_prime")
+
+    def prime_factors(self):
+        """Factor the first number into primes"""
+        self.run_operation("factorize")
+
+    def euler_totient(self):
+        """Count the integers up to the first number that are coprime to it"""
+        self.run_operation("totient")
+
+    def divisor_count(self):
+        """Count the divisors of the first number"""
+        self.run_operation("divisor_count")
         
     def update_history_display(self):
-        """Update the history display"""
-        self.history_text.config(state=tk.NORMAL)
-        self.history_text.delete(1.0, tk.END)
-        for i, calc in enumerate(reversed(self.history[-20:]), 1):
-            self.history_text.insert(tk.END, f"{i}. {calc}\n")
-        self.history_text.config(state=tk.DISABLED)
+        """Redraw the history display from the newest entry"""
+        self.history_view.show_latest()
+        
+    def show_older_history(self):
+        """Browse to the previous page of history"""
+        self.history_view.older()
+        
+    def show_newer_history(self):
+        """Browse to the next page of history"""
+        self.history_view.newer()
+        
+    def update_history_page_label(self, view):
+        """Show which history page is displayed"""
+        text = "Latest" if view.is_live else f"Page {view.page_number}"
+        self.history_page_label.config(text=text)
         
     # Graph Functions
-    def plot_graph(self):
-        """Plot a mathematical function"""
+    def _load_graph_modules(self):
+        """Import NumPy, matplotlib and the graph helpers on first use
+
+        These imports dominate start-up time, so they are deferred until the
+        graph section is actually used.
+        """
+        global np, GraphCanvas, adaptive_sample, LevelOfDetailSampler, plot_modes
+        if self.expression_engine is None:
+            import numpy as np
+            import plot_modes
+            from graph_canvas import GraphCanvas
+            from expression_engine import ExpressionEngine
+            from adaptive_sampler import adaptive_sample
+            from level_of_detail import LevelOfDetailSampler
+            from operation_cache import OperationCache
+            from function_analysis import FunctionAnalyzer
+            self.expression_engine = ExpressionEngine()
+            self.analyzer = FunctionAnalyzer()
+            # Sampled tiles shared by every zoomable curve
+            self.tile_cache = OperationCache(max_entries=2048, max_bytes=32 * 1024 * 1024)
+
+    def change_plot_mode(self, event=None):
+        """Update the entry and range labels for the selected plot mode"""
+        entry_text, range_text = PLOT_PROMPTS[self.plot_mode.get()]
+        self.function_label.config(text=entry_text)
+        self.range_label.config(text=range_text)
+        
+    def plot_graph(self, live=False):
+        """Plot the functions in the entry (separated by ';'), sampling them in the background
+
+        A live plot always replaces the graph, is skipped when the entry
+        still means the same functions and only samples functions that are
+        not plotted already.
+        """
+        mode = self.plot_mode.get()
+        if mode != "Function":
+            return self.plot_special(mode, live)
         try:
-            function_str = self.function_entry.get()
+            self._load_graph_modules()
+            labels = [part.strip() for part in self.function_entry.get().split(";") if part.strip()]
             start = float(self.range_start.get())
             end = float(self.range_end.get())
+            with self._plot_phase("parse"):
+                functions = [self.expression_engine.compile(label) for label in labels or [""]]
+                # Several functions share one grid, one stacked evaluation and their
+                # common subexpressions
+                if len(functions) == 1:
+                    sampled = functions[0]
+                else:
+                    sampled = self.expression_engine.compile_many(labels)
+        except Exception as e:
+            self.show_graph_error(e)
+            return None
+        if live:
+            return self._plot_live(labels, functions, start, end)
+        
+        def sample(task):
+            # task.report raises once the plot is cancelled
+            sampler = partial(adaptive_sample, progress=task.report)
+            with self._plot_phase("sample"):
+                if self.core.cache is not None:
+                    key = ("plot", tuple(f.expression for f in functions), start, end)
+                    return self.core.cache.call(key, sampler, sampled, start, end)
+                return sampler(sampled, start, end)
+        
+        return self.tasks.submit("plot", sample, pass_task=True,
+                                 on_done=partial(self.show_curves, labels,
+                                                 not self.overlay_var.get(), functions,
+                                                 (start, end)),
+                                 on_error=self.show_graph_error)
             
-            x = np.linspace(start, end, 400)
-            y = eval(function_str, {"x": x, "np": np, "math": math, "sin": np.sin, "cos": np.cos, "tan": np.tan})
+    def _plot_live(self, labels, functions, start, end):
+        """Sample only the functions whose curves are not on the graph yet"""
+        key = ("Function", tuple(f.expression for f in functions), start, end)
+        if key == self._live_plot_key:
+            self.graph_status.config(text="")
+            return None
+        self._live_plot_key = key
+        # Normalized expression -> curve already sampled over this range
+        plotted = {function.expression: curve
+                   for function, span, curve in self.plotted.values() if span == (start, end)}
+        missing = [f for f in functions if f.expression not in plotted]
+        
+        def sample(task):
+            curves = dict(plotted)
+            with self._plot_phase("sample"):
+                for function in missing:
+                    curves[function.expression] = adaptive_sample(function, start, end,
+                                                                  progress=task.report)
+            return [curves[f.expression] for f in functions]
+        
+        show = partial(self.show_curves, labels, True, functions, (start, end))
+        if not missing:
+            return show(sample(None))
+        return self.tasks.submit("plot", sample, pass_task=True, on_done=show,
+                                 on_error=self.show_graph_error)
             
-            # Clear previous graph
-            for widget in self.graph_frame.winfo_children():
-                widget.destroy()
-                
-            # Create new figure
-            fig, ax = plt.subplots(figsize=(10, 4))
-            ax.plot(x, y, 'b-', linewidth=2, label=f'f(x) = {function_str}')
-            ax.grid(True, alpha=0.3)
-            ax.set_title(f"Graph of f(x) = {function_str}", fontsize=12, fontweight='bold')
-            ax.set_xlabel("x", fontweight='bold')
-            ax.set_ylabel("f(x)", fontweight='bold')
-            ax.legend()
-            
-            # Embed in tkinter
-            canvas = FigureCanvasTkAgg(fig, self.graph_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+    def show_curves(self, labels, replace, functions, span, curve):
+        """Draw sampled curves on the Tk thread
+
+        curve holds one row per function when several were sampled together,
+        or is a list with one curve per function.
+        """
+        try:
+            # The figure is created once and reused by every later plot
+            if self.graph_canvas is None:
+                with self._plot_phase("figure"):
+                    self.graph_canvas = GraphCanvas(self.graph_frame,
+                                                    on_view_change=self.resample_view)
+            if replace:
+                self.view_samplers.clear()
+                self.plotted.clear()
+            curves = []
+            for row, (label, function) in enumerate(zip(labels, functions)):
+                if isinstance(curve, list):
+                    single = curve[row]
+                elif len(labels) > 1:
+                    single = curve._replace(y=curve.y[row], ylim=curve.ylim[row])
+                else:
+                    single = curve
+                self.view_samplers[label] = LevelOfDetailSampler(function, cache=self.tile_cache)
+                # Kept so analysis can start from the samples instead of re-evaluating
+                self.plotted[label] = (function, span, single)
+                curves.append((label, single.x, single.y, single.ylim))
+            with self._plot_phase("draw"):
+                self.graph_canvas.plot_many(curves, replace=replace)
+            self.graph_status.config(text="")
+            self.update_curve_toggles()
+        except Exception as e:
+            self.show_graph_error(e)
             
+    def plot_special(self, mode, live=False):
+        """Plot a parametric, polar or implicit curve or a heatmap in the background"""
+        try:
+            self._load_graph_modules()
+            text = self.function_entry.get().strip()
+            start = float(self.range_start.get())
+            end = float(self.range_end.get())
+            if mode in ("Implicit", "Heatmap"):
+                y_range = (float(self.y_range_start.get()), float(self.y_range_end.get()))
+                if self.graph_canvas is not None:
+                    width, height = self.graph_canvas.pixel_width(), self.graph_canvas.pixel_height()
+                else:
+                    # Plotting area of the default 10 x 4 inch figure
+                    width, height = 775, 308
+                # One grid point per pixel of the plotting area
+                size = plot_modes.mesh_size(width, height)
+                plot = partial(getattr(plot_modes, mode.lower()), self.expression_engine, text,
+                               (start, end), y_range, size)
+                key = ("plot", mode, text, start, end, y_range, size)
+            else:
+                plot = partial(getattr(plot_modes, mode.lower()), self.expression_engine, text,
+                               (start, end))
+                key = ("plot", mode, text, start, end)
         except Exception as e:
-            messagebox.showerror("Graph Error", f"Error plotting function: {str(e)}")
+            self.show_graph_error(e)
+            return None
+        if live:
+            if key == self._live_plot_key:
+                return None
+            self._live_plot_key = key
+        
+        def sample(task):
+            with self._plot_phase("sample"):
+                if self.core.cache is not None:
+                    return self.core.cache.call(key, partial(plot, progress=task.report))
+                return plot(progress=task.report)
+        
+        return self.tasks.submit("plot", sample, pass_task=True,
+                                 on_done=partial(self.show_special, mode, text,
+                                                 live or not self.overlay_var.get()),
+                                 on_error=self.show_graph_error)
+            
+    def show_special(self, mode, text, replace, result):
+        """Draw a curve or heatmap from plot_special on the Tk thread"""
+        try:
+            if self.graph_canvas is None:
+                with self._plot_phase("figure"):
+                    self.graph_canvas = GraphCanvas(self.graph_frame,
+                                                    on_view_change=self.resample_view)
+            if replace:
+                self.view_samplers.clear()
+                self.plotted.clear()
+            key = (mode, text)
+            label = plot_modes.label(mode, text)
+            with self._plot_phase("draw"):
+                if mode == "Heatmap":
+                    self.graph_canvas.show_image(key, result.image, result.extent, label, replace)
+                else:
+                    self.graph_canvas.plot_path(key, result.x, result.y, label, replace)
+            self.graph_status.config(text="")
+            self.update_curve_toggles()
+        except Exception as e:
+            self.show_graph_error(e)
+            
+    def update_curve_toggles(self):
+        """One checkbox per plotted curve to hide or show it"""
+        for widget in self.curve_toggles.winfo_children():
+            widget.destroy()
+        self.curve_vars = {}
+        if len(self.plotted) < 2:
+            return
+        for label in self.plotted:
+            variable = tk.BooleanVar(value=self.graph_canvas.is_visible(label))
+            ttk.Checkbutton(self.curve_toggles, text=label, variable=variable,
+                            command=partial(self.toggle_curve, label)).pack(side=tk.LEFT, padx=(0, 10))
+            self.curve_vars[label] = variable
+            
+    def toggle_curve(self, label):
+        """Hide or show one curve; nothing is re-sampled"""
+        if self.graph_canvas is None:
+            return
+        visible = self.curve_vars[label].get()
+        self.graph_canvas.set_visible(label, visible)
+        if visible:
+            # The view may have been zoomed or panned while the curve was hidden
+            x_low, x_high = self.graph_canvas.ax.get_xlim()
+            self.resample_view(x_low, x_high, self.graph_canvas.pixel_width())
+            
+    def resample_view(self, x_low, x_high, columns):
+        """Re-sample every curve for the zoomed or panned view"""
+        # Hidden curves are re-sampled once they are shown again
+        samplers = {label: sampler for label, sampler in self.view_samplers.items()
+                    if self.graph_canvas.is_visible(label)}
+        
+        def sample(task):
+            views = {}
+            with self._plot_phase("view"):
+                for label, sampler in samplers.items():
+                    task.check()
+                    views[label] = sampler.sample(x_low, x_high, columns)
+            return views
+        
+        return self.tasks.submit("view", sample, pass_task=True,
+                                 on_done=self.show_view, on_error=self.show_graph_error)
+            
+    def show_view(self, views):
+        """Draw the re-sampled view"""
+        if self.graph_canvas is not None:
+            self.graph_canvas.show_view({label: (view.x, view.y, view.ylim)
+                                         for label, view in views.items()})
+            
+    def analyze_graph(self):
+        """Find roots, extrema and the integral of every plotted function"""
+        if not self.plotted:
+            messagebox.showinfo("Analyze", "Plot a function first.")
+            return None
+        plotted = dict(self.plotted)
+        
+        def analyze(task):
+            results = {}
+            for label, (function, (start, end), curve) in plotted.items():
+                task.check()
+                results[label] = (start, end, self.analyzer.analyze(function, start, end, curve))
+            return results
+        
+        return self.tasks.submit("analysis", analyze, pass_task=True,
+                                 on_done=self.show_analysis, on_error=self.show_graph_error)
+            
+    def show_analysis(self, results):
+        """Report the analysis and mark roots and extrema on the graph"""
+        def listing(values, limit=8):
+            shown = ", ".join(f"{value:.10g}" for value in values[:limit])
+            return shown + (f", … ({len(values)} in total)" if len(values) > limit else "")
+        
+        lines = []
+        for label, (start, end, analysis) in results.items():
+            integral = analysis.integral
+            if integral.converged:
+                area = f"{integral.value:.10g} (± {integral.error:.2g})"
+            else:
+                area = f"does not converge (estimate {integral.value:.6g})"
+            lines += [f"f(x) = {label} on [{start:g}, {end:g}]",
+                      f"  Roots: {listing(analysis.roots) or 'none'}",
+                      f"  Minima at x = {listing(analysis.minima.x) or 'none'}",
+                      f"  Maxima at x = {listing(analysis.maxima.x) or 'none'}",
+                      f"  ∫ f(x) dx = {area}"]
+            if self.graph_canvas is not None:
+                x = np.concatenate([analysis.roots, analysis.minima.x, analysis.maxima.x])
+                y = np.concatenate([np.zeros(analysis.roots.size), analysis.minima.y,
+                                    analysis.maxima.y])
+                self.graph_canvas.mark(label, x, y)
+        self.show_result("\n".join(lines))
+            
+    def show_graph_error(self, error):
+        """Report why a plot failed; in live mode inline, keeping the last plot"""
+        if self.live_var.get():
+            self.graph_status.config(text=f"⚠ {error}")
+            return
+        messagebox.showerror("Graph Error", f"Error plotting function: {str(error)}")
             
     def clear_graph(self):
         """Clear the graph display"""
-        for widget in self.graph_frame.winfo_children():
-            widget.destroy()
+        self.tasks.cancel("plot")
+        self.tasks.cancel("view")
+        self.tasks.cancel("analysis")
+        self.view_samplers.clear()
+        self.plotted.clear()
+        self._live_plot_key = None
+        self.update_curve_toggles()
+        if self.graph_canvas is not None:
+            self.graph_canvas.clear()
             
     # Utility Functions
     def clear_inputs(self):
@@ -558,20 +1241,31 @@ class MathCalculatorApp:
         
     def clear_history(self):
         """Clear calculation history"""
-        self.history.clear()
+        self.core.history.clear()
         self.update_history_display()
         
     def export_history(self):
-        """Export history to a text file"""
-        try:
-            with open("math_calculations_history.txt", "w") as f:
-                f.write("MathMaster Calculation History\n")
-                f.write("=" * 50 + "\n")
-                for i, calc in enumerate(self.history, 1):
-                    f.write(f"{i}. {calc}\n")
-            messagebox.showinfo("Export Successful", "History exported to 'math_calculations_history.txt'")
-        except Exception as e:
-            messagebox.showerror("Export Error", f"Could not export history: {str(e)}")
+        """Export history in the background to a file chosen by the user"""
+        path = filedialog.asksaveasfilename(
+            title="Export History", initialfile="math_calculations_history.txt",
+            defaultextension=".txt",
+            filetypes=[("Text", "*.txt"), ("CSV", "*.csv *.csv.gz *.csv.xz"),
+                       ("JSON lines", "*.jsonl *.jsonl.gz *.jsonl.xz"),
+                       ("NumPy archive", "*.npz"), ("All files", "*.*")])
+        if not path:
+            return None
+        if detect_format(path) == ("txt", None):
+            # Plain text keeps appending only the entries added since the last export
+            def export(task):
+                return self.core.history.export(path)
+        else:
+            def export(task):
+                return export_history(self.core.history, path, progress=task.report)
+        return self.tasks.submit("export", export, pass_task=True,
+                                 on_done=lambda result: messagebox.showinfo(
+                                     "Export Successful", f"History exported to '{path}'"),
+                                 on_error=lambda error: messagebox.showerror(
+                                     "Export Error", f"Could not export history: {str(error)}"))
             
     def copy_result(self):
         """Copy the current result to clipboard"""
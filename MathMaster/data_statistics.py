@@ -0,0 +1,423 @@
+"""
+DataStatistics - Streaming descriptive statistics for MathMaster
+
+Summarizes a column of numbers in one pass and constant memory: count,
+mean, variance and standard deviation (Welford's update, merged chunk by
+chunk with Chan's formula), minimum and maximum, quantiles from a merging
+t-digest and histograms. Values are read in chunks from .npy files (memory
+mapped) or CSV/text files (memory mapped and parsed a block at a time), so
+files larger than RAM can be summarized. Every summary can be merged with
+another, which lets worker processes summarize parts of a file and the
+results be combined exactly as if one pass had read everything.
+"""
+
+import mmap
+import os
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+
+DEFAULT_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+# Values per chunk read from .npy files
+CHUNK_VALUES = 1 << 20
+# Bytes of CSV text parsed per chunk
+CHUNK_BYTES = 8 * 1024 * 1024
+
+Statistics = namedtuple("Statistics", [
+    "count", "missing", "mean", "variance", "std", "minimum", "maximum",
+    "quantiles", "histogram",
+])
+Histogram = namedtuple("Histogram", ["counts", "edges", "exact"])
+
+
+class Moments:
+    """Count, mean, sum of squared deviations, minimum and maximum
+
+    Each chunk is reduced with NumPy and folded in with the parallel form
+    of Welford's algorithm, which is also how two Moments are merged.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def update(self, values):
+        """Add a chunk of finite values"""
+        if values.size == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(np.square(values - mean).sum())
+        self._combine(values.size, mean, m2, float(values.min()), float(values.max()))
+
+    def merge(self, other):
+        """Fold another Moments into this one"""
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.minimum, other.maximum)
+
+    def _combine(self, count, mean, m2, minimum, maximum):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.minimum = min(self.minimum, minimum)
+        self.maximum = max(self.maximum, maximum)
+
+    def variance(self, ddof=1):
+        return self.m2 / (self.count - ddof) if self.count > ddof else np.nan
+
+
+class TDigest:
+    """Merging t-digest for quantiles of a stream
+
+    Values are buffered and periodically merged into at most about
+    compression / 2 weighted centroids, small near the tails (with the k1
+    scale function) so extreme quantiles stay accurate. Two digests merge
+    by pooling their centroids. While every centroid still holds a single
+    value, quantiles are exact.
+    """
+
+    def __init__(self, compression=200, buffer_size=None):
+        self.compression = compression
+        self.buffer_size = buffer_size or 50 * compression
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+        self._buffer = []
+        self._buffered = 0
+
+    def update(self, values):
+        """Add a chunk of finite values"""
+        if values.size == 0:
+            return
+        self._buffer.append(np.array(values, dtype=np.float64))
+        self._buffered += values.size
+        if self._buffered >= self.buffer_size:
+            self._compress()
+
+    def merge(self, other):
+        """Pool another digest's centroids into this one"""
+        other._compress()
+        self._compress(other.means, other.weights)
+
+    def _compress(self, means=None, weights=None):
+        parts = [self.means] + self._buffer + ([means] if means is not None else [])
+        weight_parts = ([self.weights] + [np.ones(chunk.size) for chunk in self._buffer]
+                        + ([weights] if weights is not None else []))
+        self._buffer, self._buffered = [], 0
+        means = np.concatenate(parts)
+        weights = np.concatenate(weight_parts)
+        if means.size <= 1:
+            self.means, self.weights = means, weights
+            return
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        total = cumulative[-1]
+        # k1 scale: one unit of k per centroid, so centroids are small near q = 0 and 1
+        q = (cumulative - weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        group = np.floor(k - k[0])
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        merged = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged
+        self.weights = merged
+
+    def _centroids(self):
+        self._compress()
+        return self.means, self.weights
+
+    def quantile(self, q, minimum, maximum):
+        """Values at quantiles q, interpolating between centroid centres
+
+        minimum and maximum are the exact extremes of the stream.
+        """
+        means, weights = self._centroids()
+        q = np.asarray(q, dtype=np.float64)
+        if means.size == 0:
+            return np.full(q.shape, np.nan)
+        if np.all(weights == 1):
+            return np.quantile(means, q)
+        total = weights.sum()
+        centres = np.cumsum(weights) - weights / 2
+        positions = np.concatenate([[0.0], centres, [total]])
+        values = np.concatenate([[minimum], means, [maximum]])
+        return np.interp(q * total, positions, values)
+
+    def cdf(self, x, minimum, maximum):
+        """Fraction of the stream at or below x"""
+        means, weights = self._centroids()
+        if means.size == 0:
+            return np.zeros(np.shape(x))
+        total = weights.sum()
+        centres = np.cumsum(weights) - weights / 2
+        positions = np.concatenate([[0.0], centres, [total]])
+        values = np.concatenate([[minimum], means, [maximum]])
+        return np.interp(x, values, positions) / total
+
+
+class StreamingSummary:
+    """Mergeable one-pass summary of a stream of numbers
+
+    bins and value_range set up a histogram with exact counts (values
+    outside the range are left out). Without value_range the histogram
+    spans the observed minimum and maximum and is estimated from the
+    t-digest. NaN and infinite values are counted as missing.
+    """
+
+    def __init__(self, compression=200, bins=20, value_range=None):
+        self.moments = Moments()
+        self.digest = TDigest(compression)
+        self.missing = 0
+        self.bins = bins
+        self.value_range = value_range
+        self.counts = np.zeros(bins, dtype=np.int64) if value_range is not None else None
+
+    def update(self, values):
+        """Add a chunk of values"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        finite = np.isfinite(values)
+        if not finite.all():
+            self.missing += int(values.size - np.count_nonzero(finite))
+            values = values[finite]
+        self.moments.update(values)
+        self.digest.update(values)
+        if self.counts is not None:
+            self.counts += np.histogram(values, self.bins, self.value_range)[0]
+        return self
+
+    def merge(self, other):
+        """Fold in a summary of other data; histogram settings must match"""
+        if (other.bins, other.value_range) != (self.bins, self.value_range):
+            raise ValueError("Only summaries with the same histogram settings can be merged!")
+        self.moments.merge(other.moments)
+        self.digest.merge(other.digest)
+        self.missing += other.missing
+        if self.counts is not None:
+            self.counts += other.counts
+        return self
+
+    def histogram(self):
+        if self.counts is not None:
+            return Histogram(self.counts.copy(),
+                             np.linspace(self.value_range[0], self.value_range[1], self.bins + 1),
+                             True)
+        moments = self.moments
+        if not moments.count:
+            return Histogram(np.zeros(self.bins), np.zeros(self.bins + 1), False)
+        edges = np.linspace(moments.minimum, moments.maximum, self.bins + 1)
+        fractions = self.digest.cdf(edges, moments.minimum, moments.maximum)
+        fractions[0], fractions[-1] = 0.0, 1.0
+        return Histogram(np.diff(fractions) * moments.count, edges, False)
+
+    def result(self, quantiles=DEFAULT_QUANTILES, ddof=1):
+        """The statistics as a Statistics tuple; variance uses ddof (sample by default)"""
+        moments = self.moments
+        variance = moments.variance(ddof)
+        values = self.digest.quantile(quantiles, moments.minimum, moments.maximum)
+        empty = moments.count == 0
+        return Statistics(
+            moments.count, self.missing,
+            np.nan if empty else moments.mean, variance, float(np.sqrt(variance)),
+            np.nan if empty else moments.minimum, np.nan if empty else moments.maximum,
+            dict(zip(quantiles, (float(value) for value in values))), self.histogram())
+
+
+def _is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def inspect_text(path):
+    """(delimiter, header names or None, offset of the first data line)"""
+    with open(path, "rb") as f:
+        offset = 0
+        for raw in f:
+            line = raw.decode("utf-8").strip()
+            if line and not line.startswith("#"):
+                delimiter = "," if "," in line else ";" if ";" in line else None
+                fields = [field.strip().strip('"') for field in line.split(delimiter)]
+                if all(_is_number(field) for field in fields if field):
+                    return delimiter, None, offset
+                return delimiter, fields, offset + len(raw)
+            offset += len(raw)
+    raise ValueError(f"'{path}' holds no data!")
+
+
+def _column_index(column, header):
+    """Column number from an index or a header name; None means every column"""
+    if column is None or isinstance(column, int):
+        return column
+    if str(column).lstrip("-").isdigit():
+        return int(column)
+    if header is None or column not in header:
+        raise ValueError(f"No column named '{column}'!")
+    return header.index(column)
+
+
+def _parse_lines(lines, delimiter, column):
+    """Values of one column (or all columns) of a block of text lines
+
+    np.loadtxt parses clean blocks; blocks with empty or non-numeric
+    cells are parsed line by line with those cells as NaN.
+    """
+    try:
+        return np.loadtxt(lines, delimiter=delimiter, usecols=column, ndmin=1,
+                          comments="#").ravel()
+    except ValueError:
+        values = []
+        for line in lines:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split(delimiter)
+            for field in (fields if column is None else fields[column:column + 1 or None]):
+                try:
+                    values.append(float(field.strip().strip('"')))
+                except ValueError:
+                    values.append(np.nan)
+        return np.array(values, dtype=np.float64)
+
+
+def _text_chunks(path, delimiter, column, start, end):
+    """Parse the lines starting in [start, end) of a text file, a block at a time"""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            if start > 0 and view[start - 1:start] != b"\n":
+                # The line under way belongs to the previous part
+                start = view.find(b"\n", start) + 1 or len(view)
+            view.seek(start)
+            block, used = [], 0
+            while view.tell() < end:
+                line = view.readline()
+                if not line:
+                    break
+                block.append(line.decode("utf-8"))
+                used += len(line)
+                if used >= CHUNK_BYTES:
+                    yield _parse_lines(block, delimiter, column)
+                    block, used = [], 0
+            if block:
+                yield _parse_lines(block, delimiter, column)
+
+
+def _npy_chunks(path, column, start, end):
+    """Slices of rows [start, end) of a memory-mapped .npy file"""
+    data = np.load(path, mmap_mode="r")
+    if column is not None:
+        if data.ndim != 2:
+            raise ValueError("Columns can only be chosen in a 2-D array!")
+        data = data[:, column]
+    rows = max(CHUNK_VALUES // max(data[0].size if data.ndim > 1 else 1, 1), 1)
+    for first in range(start, end, rows):
+        yield data[first:min(first + rows, end)]
+
+
+def _layout(path, column):
+    """(kind, options, total) describing how to read path in parts"""
+    if path.lower().endswith(".npy"):
+        data = np.load(path, mmap_mode="r")
+        return "npy", (_column_index(column, None),), data.shape[0] if data.ndim else 1
+    delimiter, header, offset = inspect_text(path)
+    return "text", (delimiter, _column_index(column, header), offset), os.path.getsize(path)
+
+
+def _summarize_part(path, kind, options, start, end, settings):
+    """Worker: summary of one part of a file"""
+    summary = StreamingSummary(*settings)
+    if kind == "npy":
+        chunks = _npy_chunks(path, options[0], start, end)
+    else:
+        delimiter, column, offset = options
+        chunks = _text_chunks(path, delimiter, column, max(start, offset), end)
+    for chunk in chunks:
+        summary.update(chunk)
+    return summary
+
+
+def summarize_file(path, column=None, compression=200, bins=20, value_range=None,
+                   executor=None):
+    """StreamingSummary of a column of a .npy or CSV/text file
+
+    column is an index or a header name; None takes every value. With a
+    ParallelExecutor the file is split into parts that worker processes
+    summarize; their summaries are merged here.
+    """
+    kind, options, total = _layout(path, column)
+    settings = (compression, bins, value_range)
+    parts = 1
+    if executor is not None and not executor.is_serial(total):
+        parts = executor.workers * executor.chunks_per_worker
+    bounds = np.linspace(0, total, parts + 1).astype(np.int64)
+    jobs = [(path, kind, options, int(start), int(end), settings)
+            for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+    if parts == 1:
+        summaries = [_summarize_part(*job) for job in jobs]
+    else:
+        summaries = executor.map(_summarize_part, jobs)
+    summary = StreamingSummary(*settings)
+    for part in summaries:
+        summary.merge(part)
+    return summary
+
+
+def format_statistics(statistics):
+    """Readable report of a Statistics tuple"""
+    lines = [
+        f"Count: {statistics.count}" + (f" ({statistics.missing} missing)" if statistics.missing else ""),
+        f"Mean: {statistics.mean:.10g}",
+        f"Variance: {statistics.variance:.10g}",
+        f"Std: {statistics.std:.10g}",
+        f"Min: {statistics.minimum:.10g}",
+        f"Max: {statistics.maximum:.10g}",
+        "Quantiles: " + ", ".join(f"{q:g}: {value:.6g}" for q, value in statistics.quantiles.items()),
+    ]
+    histogram = statistics.histogram
+    peak = max(histogram.counts.max(), 1) if histogram.counts.size else 1
+    lines.append("Histogram" + ("" if histogram.exact else " (estimated)") + ":")
+    for low, high, count in zip(histogram.edges[:-1], histogram.edges[1:], histogram.counts):
+        lines.append(f"  [{low:10.4g}, {high:10.4g})  {count:12.0f}  {'█' * int(30 * count / peak)}")
+    return "\n".join(lines)
+
+
+def parse_quantiles(text):
+    """Quantiles from comma-separated text such as "0.25,0.5,0.75" """
+    try:
+        quantiles = tuple(float(q) for q in text.split(",") if q.strip())
+    except ValueError:
+        raise ValueError(f"Quantiles must be comma-separated numbers, not '{text}'!") from None
+    for q in quantiles:
+        if not 0 <= q <= 1:
+            raise ValueError(f"Quantile {q:g} is outside [0, 1]!")
+    return quantiles
+
+
+def main(args):
+    """Print statistics for a file from parsed command-line arguments"""
+    started = time.perf_counter()
+    executor = None
+    try:
+        quantiles = parse_quantiles(args.quantiles)
+        if args.workers != 1:
+            from parallel_executor import ParallelExecutor
+            executor = ParallelExecutor(args.workers or None, serial_threshold=CHUNK_BYTES)
+        summary = summarize_file(args.stats, args.column, bins=args.bins,
+                                 value_range=tuple(args.range) if args.range else None,
+                                 executor=executor)
+    except (OSError, ValueError) as e:
+        print(f"MathMaster statistics: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if executor is not None:
+            executor.close()
+    print(format_statistics(summary.result(quantiles)))
+    print(f"MathMaster statistics: {time.perf_counter() - started:.2f} s", file=sys.stderr)
+    return 0
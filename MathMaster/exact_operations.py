@@ -0,0 +1,251 @@
+"""
+ExactOperations - Arbitrary-precision and big-integer arithmetic for MathMaster
+
+Operands are kept exact as Python ints or fractions.Fraction, and results
+that cannot be exact (square roots, logarithms, fractional powers) are
+computed with decimal at a configurable precision. The expensive cases use
+the fast algorithms CPython already implements in C: math.factorial uses
+divide-and-conquer binary splitting over the odd part, int.__pow__ is
+left-to-right exponentiation by squaring and math.gcd uses Lehmer's
+algorithm, all of which outrun pure-Python prime-swing or binary GCD.
+"""
+
+import decimal
+import math
+from fractions import Fraction
+
+
+class ExactOperations:
+    """Exact counterparts of the MathOperations methods"""
+
+    def __init__(self, precision=50, max_factorial=100000, max_power_bits=2000000,
+                 max_display_digits=2000):
+        self.context = decimal.Context(prec=precision)
+        self.max_factorial = max_factorial
+        # About the size of 100000!, so no exact result takes much longer
+        self.max_power_bits = max_power_bits
+        self.max_display_digits = max_display_digits
+
+    @property
+    def precision(self):
+        """Significant digits used for inexact results"""
+        return self.context.prec
+
+    @precision.setter
+    def precision(self, value):
+        if int(value) < 1:
+            raise ValueError("Precision must be at least 1 digit!")
+        self.context.prec = int(value)
+
+    # Parsing and formatting
+    def parse(self, text):
+        """Parse an operand exactly: integers, decimals, fractions and exponents
+
+        "12345678901234567890" stays an int, "0.1" becomes Fraction(1, 10)
+        and "2/3" becomes Fraction(2, 3). Exponents are held to the same size
+        as powers, since "1e50000000" would otherwise build a 50-million-digit
+        integer.
+        """
+        text = str(text).strip().replace("_", "")
+        try:
+            number = None if "/" in text else decimal.Decimal(text)
+        except decimal.InvalidOperation:
+            raise ValueError("Please enter a valid number!") from None
+        digits = int(self.max_power_bits * math.log10(2))
+        if number is not None and number.is_finite() and abs(number.adjusted()) > digits:
+            raise ValueError(f"Exponents are limited to {digits} digits in exact mode!")
+        try:
+            value = Fraction(text) if number is None else Fraction(number)
+        except (ValueError, OverflowError, ZeroDivisionError):
+            raise ValueError("Please enter a valid number!") from None
+        return self._simplify(value)
+
+    @staticmethod
+    def _simplify(value):
+        """Return ints for whole fractions"""
+        if isinstance(value, Fraction) and value.denominator == 1:
+            return value.numerator
+        return value
+
+    def format(self, value):
+        """Render a result, abbreviating integers with very many digits"""
+        if isinstance(value, bool):
+            return str(value)
+        if isinstance(value, int):
+            magnitude = abs(value)
+            count = self._digit_count(magnitude)
+            if count > self.max_display_digits:
+                # Only the ends are printed, so never convert every digit
+                sign = "-" if value < 0 else ""
+                head = magnitude // 10 ** (count - 20)
+                tail = str(magnitude % 10 ** 20).zfill(20)
+                return f"{sign}{head}…{tail} ({count} digits)"
+            # Decimal is not bound by the int-to-str digit limit
+            return str(decimal.Decimal(value))
+        if isinstance(value, Fraction):
+            places = self._decimal_places(value.denominator)
+            if (places is not None and places + self._digit_count(abs(value.numerator))
+                    <= self.max_display_digits):
+                # Exactly representable as a decimal, e.g. operands typed as 0.1
+                with decimal.localcontext(decimal.Context(prec=decimal.MAX_PREC)):
+                    return str(decimal.Decimal(value.numerator) / value.denominator)
+            return (f"{self.format(value.numerator)}/{self.format(value.denominator)}"
+                    f" ≈ {self._decimal(value)}")
+        return str(value)
+
+    @staticmethod
+    def _digit_count(magnitude):
+        """Decimal digits of a non-negative int, from its bit length"""
+        if magnitude == 0:
+            return 1
+        count = int((magnitude.bit_length() - 1) * math.log10(2)) + 1
+        return count + 1 if magnitude >= 10 ** count else count
+
+    @staticmethod
+    def _decimal_places(denominator):
+        """Decimal places of 1/denominator, None when the expansion does not end
+
+        It ends when denominator is 2**twos * 5**fives, and then has
+        max(twos, fives) places.
+        """
+        twos = (denominator & -denominator).bit_length() - 1
+        odd = denominator >> twos
+        guess = int((odd.bit_length() - 1) / math.log2(5))
+        for fives in (guess, guess + 1):
+            if 5 ** fives == odd:
+                return max(twos, fives)
+        return None
+
+    def _leading(self, value):
+        """Decimal of an int, truncated to a few digits beyond the precision
+
+        Converting every digit of a huge int to Decimal takes quadratic time.
+        """
+        drop = self._digit_count(abs(value)) - self.precision - 10
+        if drop <= 0:
+            return decimal.Decimal(value)
+        return decimal.Decimal(f"{value // 10 ** drop}E{drop}")
+
+    def _decimal(self, value):
+        """Convert an exact operand to a Decimal at the working precision"""
+        if isinstance(value, Fraction):
+            return self.context.divide(self._leading(value.numerator),
+                                       self._leading(value.denominator))
+        return self.context.plus(self._leading(value))
+
+    # Basic operations
+    def add(self, a, b):
+        """Exact addition"""
+        return self._simplify(Fraction(a) + Fraction(b))
+
+    def subtract(self, a, b):
+        """Exact subtraction"""
+        return self._simplify(Fraction(a) - Fraction(b))
+
+    def multiply(self, a, b):
+        """Exact multiplication"""
+        return self._simplify(Fraction(a) * Fraction(b))
+
+    def divide(self, a, b):
+        """Exact division, the result is a fraction when not whole"""
+        if b == 0:
+            raise ValueError("Division by zero is not allowed!")
+        return self._simplify(Fraction(a) / Fraction(b))
+
+    def modulus(self, a, b):
+        """Exact modulus with Python's sign convention"""
+        if b == 0:
+            raise ValueError("Modulus by zero is not allowed!")
+        return self._simplify(Fraction(a) % Fraction(b))
+
+    def power(self, base, exponent):
+        """Exact power for integer exponents, decimal precision otherwise"""
+        exponent = self._simplify(Fraction(exponent))
+        if isinstance(exponent, int):
+            if base == 0 and exponent < 0:
+                raise ValueError("Zero cannot be raised to a negative power!")
+            base = Fraction(base)
+            # Bits of the numerator or denominator of the result
+            bits = abs(exponent) * max(math.log2(abs(base.numerator) or 1),
+                                       math.log2(base.denominator))
+            if bits > self.max_power_bits:
+                digits = int(bits * math.log10(2)) + 1
+                raise ValueError(f"Result would have about {digits} digits; exact powers are "
+                                 f"limited to {self.max_power_bits} bits!")
+            return self._simplify(base ** exponent)
+        if base < 0:
+            raise ValueError("Negative base with a fractional exponent is not real!")
+        if base == 0:
+            return 0
+        return self.context.power(self._decimal(base), self._decimal(exponent))
+
+    def square_root(self, x):
+        """Exact square root of perfect squares, decimal precision otherwise"""
+        if x < 0:
+            raise ValueError("Square root of negative number is not real!")
+        x = Fraction(x)
+        numerator, denominator = math.isqrt(x.numerator), math.isqrt(x.denominator)
+        if numerator * numerator == x.numerator and denominator * denominator == x.denominator:
+            return self._simplify(Fraction(numerator, denominator))
+        return self.context.sqrt(self._decimal(x))
+
+    def logarithm(self, x):
+        """Natural logarithm at the working precision"""
+        if x <= 0:
+            raise ValueError("Logarithm is only defined for positive numbers!")
+        return self.context.ln(self._decimal(x))
+
+    def factorial(self, n):
+        """Exact factorial up to max_factorial"""
+        if n < 0:
+            raise ValueError("Factorial is not defined for negative numbers!")
+        if Fraction(n).denominator != 1:
+            raise ValueError("Factorial requires an integer!")
+        if n > self.max_factorial:
+            raise ValueError(f"Factorial is limited to n <= {self.max_factorial} in exact mode!")
+        return math.factorial(int(n))
+
+    def absolute(self, x):
+        """Exact absolute value"""
+        return abs(x)
+
+    def round_number(self, x, decimals=2):
+        """Round half to even at the given decimal places"""
+        return self._simplify(Fraction(round(Fraction(x), decimals)))
+
+    def percentage(self, value, total):
+        """Exact percentage"""
+        if total == 0:
+            raise ValueError("Total cannot be zero for percentage calculation!")
+        return self._simplify(Fraction(value) / Fraction(total) * 100)
+
+    def is_infinity(self, x):
+        """Exact values are never infinite"""
+        return False
+
+    def gcd(self, a, b):
+        """Greatest Common Divisor of arbitrarily large integers"""
+        return math.gcd(int(a), int(b))
+
+    def lcm(self, a, b):
+        """Least Common Multiple of arbitrarily large integers"""
+        a, b = int(a), int(b)
+        if a == 0 or b == 0:
+            return 0
+        return abs(a // math.gcd(a, b) * b)
+
+    # Constants
+    def pi(self):
+        """Pi to the working precision (Gauss-Legendre iteration)"""
+        with decimal.localcontext(decimal.Context(prec=self.precision + 10)):
+            a, b = decimal.Decimal(1), 1 / decimal.Decimal(2).sqrt()
+            t, p = decimal.Decimal("0.25"), decimal.Decimal(1)
+            # Each iteration doubles the number of correct digits
+            for _ in range(self.precision.bit_length() + 2):
+                a, b, t, p = (a + b) / 2, (a * b).sqrt(), t - p * ((a - b) / 2) ** 2, p * 2
+            value = (a + b) ** 2 / (4 * t)
+        return self.context.plus(value)
+
+    def e(self):
+        """Euler's number to the working precision"""
+        return self.context.exp(decimal.Decimal(1))
@@ -0,0 +1,415 @@
+"""
+ExpressionEngine - Safe, compiled and cached function expressions for MathMaster
+"""
+
+import ast
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression cannot be parsed or is not allowed"""
+
+
+def _round(values, decimals=0):
+    """np.round taking decimals as the float64 literal an expression passes"""
+    if not np.isfinite(decimals):
+        raise ExpressionError("round() needs a finite number of decimals!")
+    return np.round(values, int(decimals))
+
+
+# Vectorized functions that may be called in an expression. The same names
+# are accepted bare (sin(x)), through numpy (np.sin(x)) and through math
+# (math.sin(x)); all of them resolve to the NumPy implementation.
+FUNCTIONS = {
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+    'arcsin': np.arcsin, 'arccos': np.arccos, 'arctan': np.arctan,
+    'asin': np.arcsin, 'acos': np.arccos, 'atan': np.arctan,
+    'arctan2': np.arctan2, 'atan2': np.arctan2,
+    'sinh': np.sinh, 'cosh': np.cosh, 'tanh': np.tanh,
+    'arcsinh': np.arcsinh, 'arccosh': np.arccosh, 'arctanh': np.arctanh,
+    'asinh': np.arcsinh, 'acosh': np.arccosh, 'atanh': np.arctanh,
+    'exp': np.exp, 'expm1': np.expm1,
+    'log': np.log, 'log10': np.log10, 'log2': np.log2, 'log1p': np.log1p,
+    'sqrt': np.sqrt, 'cbrt': np.cbrt, 'abs': np.abs, 'fabs': np.fabs,
+    'absolute': np.abs, 'sign': np.sign,
+    'floor': np.floor, 'ceil': np.ceil, 'trunc': np.trunc, 'round': _round,
+    'power': np.power, 'hypot': np.hypot, 'mod': np.mod, 'fmod': np.fmod,
+    'minimum': np.minimum, 'maximum': np.maximum,
+    'degrees': np.degrees, 'radians': np.radians,
+    'sinc': np.sinc, 'heaviside': np.heaviside,
+}
+
+CONSTANTS = {
+    'pi': math.pi, 'e': math.e, 'tau': math.tau, 'inf': math.inf,
+}
+
+MODULE_ALIASES = ('np', 'numpy', 'math')
+
+_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv,
+                     ast.Mod, ast.Pow)
+_UNARY_OPERATORS = (ast.UAdd, ast.USub)
+
+
+class _Validator(ast.NodeTransformer):
+    """Checks an expression tree against the whitelist and canonicalizes it
+
+    Module attributes (np.sin, math.pi) are rewritten to bare names and the
+    caret operator is treated as exponentiation, so equivalent spellings of
+    the same function share one cache entry.
+    """
+
+    def __init__(self, variables):
+        self.variables = variables
+
+    def generic_visit(self, node):
+        raise ExpressionError(
+            f"'{type(node).__name__}' is not allowed in an expression!")
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _BINARY_OPERATORS):
+            raise ExpressionError(
+                f"Operator '{type(node.op).__name__}' is not allowed!")
+        node.left = self.visit(node.left)
+        node.right = self.visit(node.right)
+        return node
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, _UNARY_OPERATORS):
+            raise ExpressionError(
+                f"Operator '{type(node.op).__name__}' is not allowed!")
+        node.operand = self.visit(node.operand)
+        return node
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ExpressionError(f"Constant {node.value!r} is not a number!")
+        try:
+            float(node.value)
+        except OverflowError:
+            raise ExpressionError("Constant is too large for a float!") from None
+        return node
+
+    def visit_Name(self, node):
+        if node.id in self.variables or node.id in CONSTANTS:
+            return node
+        if node.id in FUNCTIONS:
+            raise ExpressionError(f"Function '{node.id}' must be called!")
+        raise ExpressionError(f"Unknown name '{node.id}'!")
+
+    def visit_Attribute(self, node):
+        if not (isinstance(node.value, ast.Name)
+                and node.value.id in MODULE_ALIASES):
+            raise ExpressionError("Only np.<name> and math.<name> attributes are allowed!")
+        if node.attr in self.variables:
+            raise ExpressionError(f"Unknown name '{node.value.id}.{node.attr}'!")
+        if node.attr not in CONSTANTS and node.attr not in FUNCTIONS:
+            raise ExpressionError(f"Unknown name '{node.value.id}.{node.attr}'!")
+        return ast.copy_location(ast.Name(id=node.attr, ctx=ast.Load()), node)
+
+    def visit_Call(self, node):
+        if node.keywords:
+            raise ExpressionError("Keyword arguments are not allowed!")
+        if isinstance(node.func, ast.Attribute):
+            node.func = self.visit_Attribute(node.func)
+        if not (isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS):
+            raise ExpressionError("Only whitelisted functions can be called!")
+        node.args = [self.visit(arg) for arg in node.args]
+        return node
+
+
+class _FloatConstants(ast.NodeTransformer):
+    """Replaces literals with names bound to np.float64 values
+
+    Arithmetic between literals then follows NumPy's rules like the rest of
+    the expression: 9**9**9**9 overflows to inf instead of growing a Python
+    int without bound, 1/0 is inf and (-8)**(1/3) is nan, not complex.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.count = 0
+
+    def visit_Constant(self, node):
+        name = f"_const{self.count}"
+        self.count += 1
+        self.namespace[name] = np.float64(node.value)
+        return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node)
+
+
+def _namespace():
+    """Globals for compiled expressions: the whitelist with float64 constants"""
+    namespace = {'__builtins__': {}}
+    namespace.update(FUNCTIONS)
+    namespace.update((name, np.float64(value)) for name, value in CONSTANTS.items())
+    return namespace
+
+
+def _real(result):
+    """result, refusing complex values instead of dropping their imaginary part"""
+    if np.iscomplexobj(result):
+        raise ExpressionError("Expression has complex values!")
+    return result
+
+
+class CompiledExpression:
+    """A validated expression compiled into a reusable vectorized callable"""
+
+    def __init__(self, expression, variables, function):
+        self.expression = expression
+        self.variables = variables
+        self._function = function
+
+    def __call__(self, *values):
+        """Evaluate the expression, broadcasting constants to the input shape"""
+        if len(values) != len(self.variables):
+            raise ExpressionError(
+                f"Expected {len(self.variables)} argument(s), got {len(values)}!")
+        try:
+            with np.errstate(all="ignore"):
+                result = self._function(*values)
+        except ArithmeticError as e:
+            raise ExpressionError(f"Cannot evaluate expression: {e}") from None
+        result = np.asarray(_real(result), dtype=np.float64)
+        shape = np.broadcast_shapes(*(np.shape(v) for v in values))
+        if result.shape != shape:
+            result = np.broadcast_to(result, shape).copy()
+        return result
+
+    def __repr__(self):
+        return f"CompiledExpression({self.expression!r}, variables={self.variables!r})"
+
+
+class CompiledGroup:
+    """Several expressions evaluated together as one stacked array
+
+    Subexpressions shared between the expressions (or repeated within one)
+    are computed once per call.
+    """
+
+    def __init__(self, expressions, variables, function, shared):
+        self.expressions = expressions
+        self.variables = variables
+        self.shared = shared
+        self._function = function
+
+    def __len__(self):
+        return len(self.expressions)
+
+    def __call__(self, *values):
+        """Evaluate every expression; row i of the result belongs to expression i"""
+        if len(values) != len(self.variables):
+            raise ExpressionError(
+                f"Expected {len(self.variables)} argument(s), got {len(values)}!")
+        try:
+            with np.errstate(all="ignore"):
+                results = self._function(*values)
+        except ArithmeticError as e:
+            raise ExpressionError(f"Cannot evaluate expressions: {e}") from None
+        shape = np.broadcast_shapes(*(np.shape(v) for v in values))
+        stacked = np.empty((len(results),) + shape, dtype=np.float64)
+        for row, result in zip(stacked, results):
+            # Constant expressions broadcast over the row
+            row[...] = _real(result)
+        return stacked
+
+    def __repr__(self):
+        return f"CompiledGroup({self.expressions!r}, variables={self.variables!r})"
+
+
+class _SharedSubexpressions:
+    """Hoists subtrees that occur more than once into temporaries"""
+
+    _NODES = (ast.BinOp, ast.UnaryOp, ast.Call)
+
+    def __init__(self, trees):
+        self.counts = {}
+        for tree in trees:
+            for node in ast.walk(tree):
+                if isinstance(node, self._NODES):
+                    key = ast.dump(node)
+                    self.counts[key] = self.counts.get(key, 0) + 1
+        self.names = {}
+        self.assignments = []
+
+    def rewrite(self, node):
+        """Rewrite node bottom-up so temporaries are assigned before use"""
+        key = ast.dump(node) if isinstance(node, self._NODES) else None
+        if key in self.names:
+            return ast.Name(id=self.names[key], ctx=ast.Load())
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, ast.AST):
+                setattr(node, field, self.rewrite(value))
+            elif isinstance(value, list):
+                setattr(node, field, [self.rewrite(item) if isinstance(item, ast.AST) else item
+                                      for item in value])
+        if key is not None and self.counts[key] > 1:
+            name = self.names[key] = f"_shared{len(self.names)}"
+            self.assignments.append((name, node))
+            return ast.Name(id=name, ctx=ast.Load())
+        return node
+
+
+def _original_column(text, column):
+    """Column in text of a column reported for text with '^' written as '**'"""
+    if column is None:
+        return column
+    position = 0
+    for index, char in enumerate(text):
+        position += 2 if char == '^' else 1
+        if position >= column:
+            return index + 1
+    return column - text.count('^')
+
+
+class ExpressionEngine:
+    """Parses expressions once and keeps the compiled callables in an LRU cache
+
+    Two levels of caching are used: raw text is mapped to its normalized
+    form, and each normalized expression is compiled at most once, so
+    spellings like "x^2", "x ** 2" and "np.sin(x)" / "sin(x)" share one
+    compiled function. The engine does not depend on Tk.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._compiled = OrderedDict()
+        self._normalized = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(expression, variables=('x',)):
+        """Parse and validate an expression, returning its canonical tree"""
+        if not isinstance(expression, str) or not expression.strip():
+            raise ExpressionError("Expression is empty!")
+        text = expression.strip()
+        try:
+            # "^" is rewritten before parsing so it binds like "**", not XOR
+            tree = ast.parse(text.replace('^', '**'), mode='eval')
+        except SyntaxError as e:
+            raise ExpressionError(
+                f"Invalid expression syntax at column {_original_column(text, e.offset)}: "
+                f"{e.msg}") from None
+        return _Validator(tuple(variables)).visit(tree)
+
+    def compile(self, expression, variables=('x',)):
+        """Return the CompiledExpression for an expression, using the cache"""
+        variables = tuple(variables)
+        raw_key = (expression, variables)
+        with self._lock:
+            key = self._normalized.get(raw_key)
+            if key is not None:
+                self._normalized.move_to_end(raw_key)
+                compiled = self._compiled.get(key)
+                if compiled is not None:
+                    self._compiled.move_to_end(key)
+                    self.hits += 1
+                    return compiled
+
+        tree = self.normalize(expression, variables)
+        key = (ast.unparse(tree), variables)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is None:
+                self.misses += 1
+                compiled = self._build(tree, key[0], variables)
+                self._compiled[key] = compiled
+                if len(self._compiled) > self.maxsize:
+                    self._compiled.popitem(last=False)
+            else:
+                self.hits += 1
+                self._compiled.move_to_end(key)
+            self._normalized[raw_key] = key
+            if len(self._normalized) > self.maxsize * 4:
+                self._normalized.popitem(last=False)
+        return compiled
+
+    def compile_many(self, expressions, variables=('x',)):
+        """Return a CompiledGroup evaluating all expressions in one call
+
+        Each expression is validated on its own, so an error names the
+        expression at fault; the group is cached like single expressions.
+        """
+        variables = tuple(variables)
+        trees = []
+        for expression in expressions:
+            try:
+                trees.append(self.normalize(expression, variables))
+            except ExpressionError as e:
+                raise ExpressionError(f"{expression.strip()}: {e}") from None
+        normalized = tuple(ast.unparse(tree) for tree in trees)
+        key = (normalized, variables)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self.hits += 1
+                self._compiled.move_to_end(key)
+                return compiled
+            self.misses += 1
+        compiled = self._build_group(trees, normalized, variables)
+        with self._lock:
+            self._compiled[key] = compiled
+            if len(self._compiled) > self.maxsize:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def evaluate(self, expression, *values, variables=('x',)):
+        """Compile (or fetch) an expression and evaluate it"""
+        return self.compile(expression, variables)(*values)
+
+    @staticmethod
+    def _build(tree, normalized, variables):
+        """Turn a validated tree into a Python function of the variables"""
+        arguments = ast.arguments(
+            posonlyargs=[], args=[ast.arg(arg=v) for v in variables],
+            vararg=None, kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[])
+        namespace = _namespace()
+        body = _FloatConstants(namespace).visit(tree.body)
+        lambda_tree = ast.Expression(body=ast.Lambda(args=arguments, body=body))
+        ast.fix_missing_locations(lambda_tree)
+        function = eval(compile(lambda_tree, f"<f({', '.join(variables)})>", 'eval'),
+                        namespace)
+        return CompiledExpression(normalized, variables, function)
+
+    @staticmethod
+    def _build_group(trees, normalized, variables):
+        """One Python function returning a tuple with every expression's value"""
+        shared = _SharedSubexpressions(trees)
+        bodies = [shared.rewrite(tree.body) for tree in trees]
+        namespace = _namespace()
+        constants = _FloatConstants(namespace)
+        lines = [f"def _group({', '.join(variables)}):"]
+        lines += [f"    {name} = {ast.unparse(constants.visit(node))}"
+                  for name, node in shared.assignments]
+        bodies = [constants.visit(body) for body in bodies]
+        lines.append(f"    return ({''.join(ast.unparse(body) + ', ' for body in bodies)})")
+        exec(compile("\n".join(lines), f"<group({', '.join(variables)})>", 'exec'), namespace)
+        return CompiledGroup(normalized, variables, namespace['_group'],
+                             len(shared.assignments))
+
+    def cache_info(self):
+        """Return cache statistics"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._compiled),
+                'maxsize': self.maxsize,
+            }
+
+    def clear_cache(self):
+        """Drop every compiled expression"""
+        with self._lock:
+            self._compiled.clear()
+            self._normalized.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,310 @@
+"""
+ExpressionParser - Precedence-climbing parser for calculator expressions
+
+Parses input such as "gcd(48, 18) + sqrt(2)^3 % 5" into a small tree whose
+operators and functions are evaluated with the MathOperations rules (or
+any object with the same methods, such as ExactOperations). Constant
+subtrees are folded once at parse time, parsed trees are cached by their
+source text, and every error reports the position it refers to.
+"""
+
+import math
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+from math_operations import MathOperations
+
+
+class ExpressionSyntaxError(ValueError):
+    """Raised for malformed expressions, position is a 0-based text offset"""
+
+    def __init__(self, message, position):
+        super().__init__(f"{message} at position {position + 1}")
+        self.position = position
+
+
+class ExpressionEvaluationError(ValueError):
+    """Raised when an operation rejects its operands while evaluating"""
+
+    def __init__(self, message, position):
+        super().__init__(f"{message} (at position {position + 1})")
+        self.position = position
+
+
+Number = namedtuple("Number", ["value", "position"])
+Variable = namedtuple("Variable", ["name", "position"])
+Unary = namedtuple("Unary", ["op", "operand", "position"])
+Binary = namedtuple("Binary", ["op", "left", "right", "position"])
+Call = namedtuple("Call", ["name", "args", "position"])
+
+Token = namedtuple("Token", ["kind", "text", "position"])
+
+# Binary operators: precedence, right associative, MathOperations method
+BINARY_OPERATORS = {
+    '+': (1, False, 'add'),
+    '-': (1, False, 'subtract'),
+    '*': (2, False, 'multiply'),
+    '/': (2, False, 'divide'),
+    '%': (2, False, 'modulus'),
+    '^': (4, True, 'power'),
+}
+UNARY_PRECEDENCE = 3
+
+# Function name: (MathOperations method, allowed argument counts)
+FUNCTIONS = {
+    'sqrt': ('square_root', (1,)),
+    'log': ('logarithm', (1,)),
+    'ln': ('logarithm', (1,)),
+    'factorial': ('factorial', (1,)),
+    'abs': ('absolute', (1,)),
+    'round': ('round_number', (1, 2)),
+    'gcd': ('gcd', (2,)),
+    'lcm': ('lcm', (2,)),
+    'pow': ('power', (2,)),
+    'mod': ('modulus', (2,)),
+    'percentage': ('percentage', (2,)),
+    'sin': ('trig_functions', (1,)),
+    'cos': ('trig_functions', (1,)),
+    'tan': ('trig_functions', (1,)),
+}
+
+CONSTANTS = {'pi': math.pi, 'e': math.e}
+
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<op>\*\*|[-+*/%^(),!])
+""", re.VERBOSE)
+
+
+def tokenize(text):
+    """Split an expression into tokens, reporting unknown characters"""
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if match is None:
+            raise ExpressionSyntaxError(f"Unexpected character '{text[position]}'", position)
+        kind = match.lastgroup
+        if kind != 'space':
+            value = match.group()
+            tokens.append(Token(kind, '^' if value == '**' else value, position))
+        position = match.end()
+    tokens.append(Token('end', '', len(text)))
+    return tokens
+
+
+class _Parser:
+    """Recursive precedence-climbing parser over a token list"""
+
+    def __init__(self, tokens, parse_number):
+        self.tokens = tokens
+        self.index = 0
+        self.parse_number = parse_number
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def advance(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, text):
+        token = self.advance()
+        if token.text != text:
+            found = f"'{token.text}'" if token.kind != 'end' else "end of input"
+            raise ExpressionSyntaxError(f"Expected '{text}' but found {found}", token.position)
+        return token
+
+    def parse(self):
+        node = self.climb(0)
+        token = self.peek()
+        if token.kind != 'end':
+            raise ExpressionSyntaxError(f"Unexpected '{token.text}'", token.position)
+        return node
+
+    def climb(self, min_precedence):
+        left = self.unary()
+        while True:
+            token = self.peek()
+            operator = BINARY_OPERATORS.get(token.text) if token.kind == 'op' else None
+            if operator is None or operator[0] < min_precedence:
+                return left
+            precedence, right_associative, _ = operator
+            self.advance()
+            right = self.climb(precedence if right_associative else precedence + 1)
+            left = Binary(token.text, left, right, token.position)
+
+    def unary(self):
+        token = self.peek()
+        if token.text in ('-', '+') and token.kind == 'op':
+            self.advance()
+            # Binds looser than ^ so that -2^2 == -(2^2)
+            return Unary(token.text, self.climb(UNARY_PRECEDENCE), token.position)
+        return self.postfix()
+
+    def postfix(self):
+        node = self.atom()
+        while self.peek().text == '!':
+            token = self.advance()
+            node = Call('factorial', (node,), token.position)
+        return node
+
+    def atom(self):
+        token = self.advance()
+        if token.kind == 'number':
+            return Number(self.parse_number(token.text), token.position)
+        if token.kind == 'name':
+            if self.peek().text == '(':
+                return self.call(token)
+            return Variable(token.text, token.position)
+        if token.text == '(':
+            node = self.climb(0)
+            self.expect(')')
+            return node
+        if token.kind == 'end':
+            raise ExpressionSyntaxError("Unexpected end of expression", token.position)
+        raise ExpressionSyntaxError(f"Unexpected '{token.text}'", token.position)
+
+    def call(self, name_token):
+        spec = FUNCTIONS.get(name_token.text)
+        if spec is None:
+            raise ExpressionSyntaxError(f"Unknown function '{name_token.text}'", name_token.position)
+        self.expect('(')
+        args = []
+        if self.peek().text != ')':
+            args.append(self.climb(0))
+            while self.peek().text == ',':
+                self.advance()
+                args.append(self.climb(0))
+        self.expect(')')
+        if len(args) not in spec[1]:
+            counts = " or ".join(str(count) for count in spec[1])
+            raise ExpressionSyntaxError(
+                f"Function '{name_token.text}' takes {counts} argument(s)", name_token.position)
+        return Call(name_token.text, tuple(args), name_token.position)
+
+
+def _default_number(text):
+    """Integer literals stay ints so factorial, gcd and lcm accept them"""
+    if re.fullmatch(r"\d+", text):
+        return int(text)
+    return float(text)
+
+
+class ExpressionParser:
+    """Parses, folds, caches and evaluates calculator expressions
+
+    operations supplies the arithmetic (MathOperations by default) and
+    parse_number turns numeric literals into operands.
+    """
+
+    def __init__(self, operations=MathOperations, parse_number=_default_number, maxsize=256):
+        self.operations = operations
+        self.parse_number = parse_number
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def parse(self, text):
+        """Return the constant-folded tree for text, parsing it at most once"""
+        with self._lock:
+            tree = self._cache.get(text)
+            if tree is not None:
+                self._cache.move_to_end(text)
+                return tree
+        if not text.strip():
+            raise ExpressionSyntaxError("Expression is empty", 0)
+        try:
+            tree = self.fold(_Parser(tokenize(text), self.parse_number).parse())
+        except RecursionError:
+            raise ExpressionSyntaxError("Expression is nested too deeply", 0) from None
+        with self._lock:
+            self._cache[text] = tree
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return tree
+
+    def clear_cache(self):
+        """Forget every parsed tree"""
+        with self._lock:
+            self._cache.clear()
+
+    def evaluate(self, expression, variables=None):
+        """Evaluate text or a parsed tree; variables maps names to values"""
+        tree = self.parse(expression) if isinstance(expression, str) else expression
+        return self._evaluate(tree, variables or {})
+
+    def fold(self, node):
+        """Replace every subtree without variables by its value
+
+        Subtrees whose evaluation fails are kept, so the error is reported
+        with its position when the expression is evaluated.
+        """
+        if isinstance(node, Number):
+            return node
+        if isinstance(node, Variable):
+            if node.name in CONSTANTS:
+                return Number(self._constant(node.name), node.position)
+            return node
+        if isinstance(node, Unary):
+            node = node._replace(operand=self.fold(node.operand))
+            children = (node.operand,)
+        elif isinstance(node, Binary):
+            node = node._replace(left=self.fold(node.left), right=self.fold(node.right))
+            children = (node.left, node.right)
+        else:
+            node = node._replace(args=tuple(self.fold(arg) for arg in node.args))
+            children = node.args
+        if all(isinstance(child, Number) for child in children):
+            try:
+                return Number(self._evaluate(node, {}), node.position)
+            except (ValueError, ArithmeticError):
+                return node
+        return node
+
+    def _constant(self, name):
+        """Constants come from the operations object when it provides them"""
+        method = getattr(self.operations, name, None)
+        if callable(method):
+            return method()
+        return CONSTANTS[name]
+
+    def _evaluate(self, node, variables):
+        if isinstance(node, Number):
+            return node.value
+        if isinstance(node, Variable):
+            if node.name in variables:
+                return variables[node.name]
+            if node.name in CONSTANTS:
+                return self._constant(node.name)
+            raise ExpressionEvaluationError(f"Unknown variable '{node.name}'", node.position)
+        if isinstance(node, Unary):
+            value = self._evaluate(node.operand, variables)
+            return -value if node.op == '-' else value
+        if isinstance(node, Binary):
+            left = self._evaluate(node.left, variables)
+            right = self._evaluate(node.right, variables)
+            return self._apply(BINARY_OPERATORS[node.op][2], (left, right), node)
+        args = tuple(self._evaluate(arg, variables) for arg in node.args)
+        method = FUNCTIONS[node.name][0]
+        if method == 'trig_functions':
+            return self._apply(method, (float(args[0]),), node)[node.name]
+        if method == 'factorial' and isinstance(args[0], float) and args[0].is_integer():
+            args = (int(args[0]),)
+        return self._apply(method, args, node)
+
+    def _apply(self, method, args, node):
+        function = getattr(self.operations, method, None)
+        if function is None:
+            function = getattr(MathOperations, method)
+            args = tuple(float(arg) for arg in args)
+        try:
+            return function(*args)
+        except ValueError as e:
+            raise ExpressionEvaluationError(str(e).rstrip('!'), node.position) from None
+        except (ArithmeticError, TypeError) as e:
+            raise ExpressionEvaluationError(str(e), node.position) from None
@@ -0,0 +1,288 @@
+"""
+FunctionAnalysis - Roots, extrema and integrals of plotted functions
+
+Analysis starts from the samples the graph already computed. Sign changes
+between neighbouring samples bracket the roots and changes of slope bracket
+the extrema; every bracket is then refined together by a vectorized Brent
+iteration, so each step is one call of the compiled function over all
+brackets. Definite integrals use adaptive Gauss-Kronrod (7-15) quadrature
+on a first partition taken from the samples, evaluating all intervals of a
+refinement round at once. Results are cached per (expression, range).
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from adaptive_sampler import adaptive_sample, robust_scale
+from operation_cache import OperationCache
+
+
+Points = namedtuple("Points", ["x", "y"])
+Integral = namedtuple("Integral", ["value", "error", "converged", "intervals"])
+Analysis = namedtuple("Analysis", ["roots", "minima", "maxima", "integral", "evaluations"])
+
+
+# Gauss-Kronrod 15-point nodes on [0, 1] with the embedded 7-point Gauss rule
+_KRONROD_NODES = np.array([
+    0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+    0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+    0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245, 0.0])
+_KRONROD_WEIGHTS = np.array([
+    0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649, 0.209482141084727828012999174891714])
+_GAUSS_WEIGHTS = np.array([
+    0.0, 0.129484966168869693270611432679082, 0.0, 0.279705391489276667901467771423780,
+    0.0, 0.381830050505118944950369775488975, 0.0, 0.417959183673469387755102040816327])
+# Mirrored onto [-1, 1]
+NODES = np.concatenate([-_KRONROD_NODES[:-1], _KRONROD_NODES[::-1]])
+KRONROD = np.concatenate([_KRONROD_WEIGHTS[:-1], _KRONROD_WEIGHTS[::-1]])
+GAUSS = np.concatenate([_GAUSS_WEIGHTS[:-1], _GAUSS_WEIGHTS[::-1]])
+
+_EPS = np.finfo(np.float64).eps
+
+
+class _Counted:
+    """Wraps a vectorized function and counts the points it evaluates"""
+
+    def __init__(self, function):
+        self.function = function
+        self.evaluations = 0
+
+    def __call__(self, x):
+        self.evaluations += np.size(x)
+        return np.asarray(self.function(x), dtype=np.float64)
+
+
+def brent(function, a, b, fa=None, fb=None, xtol=1e-12, rtol=4 * _EPS, max_iterations=100):
+    """Refine many brackets [a, b] with f(a), f(b) of opposite sign at once
+
+    Each iteration takes an inverse quadratic or secant step where it stays
+    inside the bracket and shrinks it quickly enough, and bisects otherwise.
+    Returns (x, f(x), valid); valid is False where the bracket closed on a
+    pole or jump instead of a zero, i.e. |f| grew rather than shrank.
+    """
+    a = np.array(a, dtype=np.float64)
+    b = np.array(b, dtype=np.float64)
+    if fa is None or fb is None:
+        values = function(np.concatenate([a, b]))
+        fa, fb = values[:a.size], values[a.size:]
+    fa = np.array(fa, dtype=np.float64)
+    fb = np.array(fb, dtype=np.float64)
+    bound = np.minimum(np.abs(fa), np.abs(fb))
+
+    # b is always the best estimate so far
+    swap = np.abs(fa) < np.abs(fb)
+    a[swap], b[swap] = b[swap], a[swap]
+    fa[swap], fb[swap] = fb[swap], fa[swap]
+    c, fc = a.copy(), fa.copy()
+    width = np.abs(b - a)
+    slow = np.zeros(a.size, dtype=bool)
+
+    for _ in range(max_iterations):
+        tol = xtol + rtol * np.abs(b)
+        active = np.nonzero((fb != 0) & (np.abs(b - a) > 2 * tol))[0]
+        if active.size == 0:
+            break
+        A, B, C = a[active], b[active], c[active]
+        FA, FB, FC = fa[active], fb[active], fc[active]
+        T = tol[active]
+        with np.errstate(all="ignore"):
+            quadratic = (FA != FC) & (FB != FC)
+            s = np.where(
+                quadratic,
+                A * FB * FC / ((FA - FB) * (FA - FC)) + B * FA * FC / ((FB - FA) * (FB - FC))
+                + C * FA * FB / ((FC - FA) * (FC - FB)),
+                B - FB * (B - A) / (FB - FA))
+        low = np.minimum((3 * A + B) / 4, B)
+        high = np.maximum((3 * A + B) / 4, B)
+        accept = (np.isfinite(s) & (s > low) & (s < high)
+                  & (np.abs(s - B) < np.abs(B - C) / 2) & ~slow[active])
+        s = np.where(accept, s, (A + B) / 2)
+        # Never step by less than the tolerance
+        s = np.where(np.abs(s - B) < T, B + np.copysign(T, A - B), s)
+
+        fs = function(s)
+        c[active], fc[active] = B, FB
+        keep = np.sign(FA) * np.sign(fs) < 0
+        a[active] = np.where(keep, A, B)
+        fa[active] = np.where(keep, FA, FB)
+        b[active], fb[active] = s, fs
+        swap = active[np.abs(fa[active]) < np.abs(fb[active])]
+        a[swap], b[swap] = b[swap], a[swap]
+        fa[swap], fb[swap] = fb[swap], fa[swap]
+
+        # Force a bisection when interpolation stops halving the bracket
+        new_width = np.abs(b[active] - a[active])
+        slow[active] = new_width > width[active] / 2
+        width[active] = new_width
+
+    valid = (fb == 0) | (np.abs(fb) < bound)
+    return b, fb, valid
+
+
+def find_roots(function, x, y, xtol=1e-12):
+    """Zeros of function located from samples y = function(x) sorted by x"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # A run of zero samples (a flat stretch on the axis) counts once
+    zero = y == 0
+    exact = x[zero & ~np.r_[False, zero[:-1]]]
+    # NaN samples (breaks, undefined regions) never bracket a root
+    with np.errstate(invalid="ignore"):
+        bracket = np.nonzero(np.sign(y[:-1]) * np.sign(y[1:]) < 0)[0]
+    if bracket.size == 0:
+        return np.sort(exact)
+    roots, _, valid = brent(function, x[bracket], x[bracket + 1], y[bracket], y[bracket + 1],
+                            xtol=xtol)
+    return np.sort(np.concatenate([exact, roots[valid]]))
+
+
+def _slope(function, span):
+    """Central-difference derivative with a step scaled to x"""
+    def derivative(x):
+        h = np.cbrt(_EPS) * np.maximum(np.abs(x), 1e-3 * span)
+        after, before = function(np.concatenate([x + h, x - h])).reshape(2, -1)
+        return (after - before) / (2 * h)
+    return derivative
+
+
+def find_extrema(function, x, y, xtol=1e-10):
+    """(minima, maxima) as Points, located from samples y = function(x)
+
+    An interior sample higher or lower than both neighbours brackets an
+    extremum, which is refined as a zero of the derivative.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    empty = Points(np.zeros(0), np.zeros(0))
+    if x.size < 3:
+        return empty, empty
+    with np.errstate(invalid="ignore"):
+        left, right = y[1:-1] - y[:-2], y[2:] - y[1:-1]
+        turning = np.nonzero(left * right < 0)[0] + 1
+    if turning.size == 0:
+        return empty, empty
+    maximum = y[turning] > y[turning - 1]
+
+    slope = _slope(function, x[-1] - x[0])
+    low, high = x[turning - 1], x[turning + 1]
+    ends = slope(np.concatenate([low, high]))
+    g_low, g_high = ends[:turning.size], ends[turning.size:]
+    location = x[turning].copy()
+    bracketed = np.nonzero(np.sign(g_low) * np.sign(g_high) < 0)[0]
+    valid = np.ones(turning.size, dtype=bool)
+    if bracketed.size:
+        refined, _, ok = brent(slope, low[bracketed], high[bracketed],
+                               g_low[bracketed], g_high[bracketed], xtol=xtol)
+        location[bracketed] = refined
+        valid[bracketed] = ok
+    value = function(location)
+    # A rising slope on both sides of a pole is not an extremum
+    valid &= np.isfinite(value)
+    minima, maxima = valid & ~maximum, valid & maximum
+    return Points(location[minima], value[minima]), Points(location[maxima], value[maxima])
+
+
+def integrate(function, start, end, x=None, abs_tol=1e-10, rel_tol=1e-10,
+              max_rounds=40, max_evaluations=200000):
+    """Adaptive Gauss-Kronrod integral of function over [start, end]
+
+    x, if given, are sample points of the function (e.g. from the graph);
+    the first partition follows their density, so regions the sampler
+    refined start out finely divided. Every round evaluates the 15 nodes of
+    all unfinished intervals in one call; intervals whose Gauss and Kronrod
+    estimates disagree are halved.
+    """
+    if not end > start:
+        raise ValueError("Range end must be greater than range start!")
+    if x is not None and np.size(x) > 2:
+        x = np.asarray(x, dtype=np.float64)
+        x = x[(x > start) & (x < end)]
+        pick = np.unique(np.linspace(0, x.size - 1, min(x.size, 31)).round().astype(np.int64))
+        edges = np.unique(np.concatenate([[start], x[pick] if x.size else [], [end]]))
+    else:
+        edges = np.linspace(start, end, 9)
+    low, high = edges[:-1], edges[1:]
+    total_width = end - start
+    value = error = 0.0
+    converged = True
+    intervals = 0
+    evaluations = 0
+    for round_ in range(max_rounds):
+        half = (high - low) / 2
+        nodes = ((low + high) / 2)[:, None] + half[:, None] * NODES
+        f = np.asarray(function(nodes.ravel()), dtype=np.float64).reshape(nodes.shape)
+        evaluations += f.size
+        kronrod = half * (f @ KRONROD)
+        gauss = half * (f @ GAUSS)
+        difference = np.abs(kronrod - gauss)
+        difference[~np.isfinite(difference)] = np.inf
+
+        estimate = value + kronrod.sum()
+        target = max(abs_tol, rel_tol * abs(estimate)) if np.isfinite(estimate) else abs_tol
+        done = difference <= target * (2 * half) / total_width
+        # Intervals that cannot be split further are accepted as they are
+        tiny = half <= 4 * _EPS * np.maximum(np.abs(low), np.abs(high))
+        last = (round_ == max_rounds - 1
+                or evaluations + 2 * f.size > max_evaluations)
+        # Splitting does not help where the function is undefined
+        finish = done | tiny | last | ~np.isfinite(kronrod)
+        converged &= bool(done[finish].all())
+        value += kronrod[finish].sum()
+        error += difference[finish].sum()
+        intervals += int(finish.sum())
+        split = ~finish
+        if not split.any():
+            break
+        middle = (low[split] + high[split]) / 2
+        low = np.concatenate([low[split], middle])
+        high = np.concatenate([middle, high[split]])
+        order = np.argsort(low)
+        low, high = low[order], high[order]
+    if not np.isfinite(value):
+        converged = False
+    return Integral(float(value), float(error), converged, intervals)
+
+
+class FunctionAnalyzer:
+    """Roots, extrema and the integral of a function over a range, cached
+
+    function is a vectorized callable such as a CompiledExpression. Results
+    are keyed by its expression and the range, so analysing the same plot
+    again is free.
+    """
+
+    def __init__(self, cache=None, xtol=1e-12):
+        self.cache = cache if cache is not None else OperationCache(max_entries=256)
+        self.xtol = xtol
+
+    def analyze(self, function, start, end, curve=None):
+        """Analysis of function on [start, end]
+
+        curve is the SampledCurve already computed for the graph; without
+        one the function is sampled adaptively first.
+        """
+        key = ("analysis", getattr(function, "expression", id(function)), float(start), float(end))
+        return self.cache.call(key, self._analyze, function, float(start), float(end), curve)
+
+    def _analyze(self, function, start, end, curve):
+        counted = _Counted(function)
+        if curve is None:
+            curve = adaptive_sample(counted, start, end)
+        x, y = curve.x, curve.y
+        roots = find_roots(counted, x, y, xtol=self.xtol)
+        minima, maxima = find_extrema(counted, x, y)
+
+        # Extrema that touch zero are roots without a sign change, like x**2 at 0
+        low, high = robust_scale(y, x)
+        touching = [points.x[np.abs(points.y) <= 1e-10 * (high - low)] for points in (minima, maxima)]
+        roots = np.sort(np.concatenate([roots] + touching))
+        if roots.size > 1:
+            roots = roots[np.r_[True, np.diff(roots) > 1e-9 * (end - start)]]
+
+        integral = integrate(counted, start, end, x)
+        return Analysis(roots, minima, maxima, integral, counted.evaluations)
@@ -0,0 +1,360 @@
+"""
+GraphCanvas - Persistent matplotlib plotting surface for the MathMaster GUI
+
+One Figure and one FigureCanvasTkAgg are created for the whole session and
+re-plots update the existing lines in place. The figure is created through
+matplotlib.figure.Figure rather than pyplot, so no figure manager keeps old
+figures alive. Curves are drawn as animated artists on top of a cached
+background, so data-only updates are blitted instead of redrawing the axes.
+
+The mouse wheel zooms around the pointer and dragging pans. Once the view
+settles, on_view_change(x_low, x_high, columns) is called so the owner can
+re-sample just the visible window at the canvas' pixel width. Parametric,
+polar and implicit curves are drawn as paths and heatmaps as images, which
+are part of the background.
+"""
+
+import tkinter as tk
+
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+from level_of_detail import minmax_downsample
+
+
+class GraphCanvas:
+    """Reusable figure that can overlay several functions"""
+
+    COLORS = ('#2980b9', '#e74c3c', '#27ae60', '#8e44ad', '#e67e22',
+              '#16a085', '#d35400', '#2c3e50', '#c0392b', '#f1c40f')
+    ZOOM_STEP = 1.25
+    VIEW_DELAY_MS = 40
+
+    def __init__(self, parent, figsize=(10, 4), on_view_change=None):
+        self.figure = Figure(figsize=figsize)
+        self.ax = self.figure.add_subplot()
+        self.canvas = FigureCanvasTkAgg(self.figure, parent)
+        self.widget = self.canvas.get_tk_widget()
+        self.lines = {}
+        self.markers = {}
+        self.images = {}
+        self.labels = {}
+        self._ylims = {}
+        self._limits = None
+        self._background = None
+        self._visible = False
+        self.on_view_change = on_view_change
+        self._pan = None
+        self._view_job = None
+        self._cids = [
+            self.canvas.mpl_connect('draw_event', self._on_draw),
+            self.canvas.mpl_connect('scroll_event', self._on_scroll),
+            self.canvas.mpl_connect('button_press_event', self._on_press),
+            self.canvas.mpl_connect('motion_notify_event', self._on_motion),
+            self.canvas.mpl_connect('button_release_event', self._on_release),
+        ]
+        self._style_axes()
+
+    def _style_axes(self):
+        self.ax.grid(True, alpha=0.3)
+        self.ax.set_xlabel("x", fontweight='bold')
+        self.ax.set_ylabel("f(x)", fontweight='bold')
+
+    def plot(self, key, x, y, ylim=None, replace=True):
+        """Show the curve y(x) under key, updating it in place if it exists
+
+        With replace=True every other curve is removed first; otherwise the
+        curve is overlaid on the ones already shown.
+        """
+        self.plot_many([(key, x, y, ylim)], replace)
+
+    def plot_many(self, curves, replace=True):
+        """Show several (key, x, y, ylim) curves with a single redraw
+
+        With replace=True the lines of curves that go away are reused for
+        the new keys, so editing a function updates its line in place.
+        """
+        if replace:
+            self._reuse_lines([key for key, _, _, _ in curves])
+        structure_changed = replace and self._remove_others({key for key, _, _, _ in curves})
+        columns = self.pixel_width()
+        for key, x, y, ylim in curves:
+            # Drawing more than a few points per pixel column only costs time
+            x, y = minmax_downsample(x, y, columns)
+            structure_changed |= self._set_line(key, x, y, f'f(x) = {key}')
+            self._ylims[key] = ylim
+        self._update(structure_changed)
+
+    def plot_path(self, key, x, y, label, replace=True):
+        """Show a curve that is not a function of x (parametric, polar, implicit)
+
+        The points are drawn in order, NaN breaking the path, so they are
+        not downsampled per pixel column.
+        """
+        structure_changed = replace and self._remove_others({key})
+        structure_changed |= self._set_line(key, x, y, label)
+        self._ylims[key] = None
+        self._update(structure_changed)
+
+    def show_image(self, key, image, extent, label, replace=True):
+        """Show a heatmap image covering extent (x_low, x_high, y_low, y_high)"""
+        if replace:
+            self._remove_others({key})
+        old = self.images.pop(key, None)
+        if old is not None:
+            old.remove()
+        # Row 0 of the image is y_low
+        self.images[key] = self.ax.imshow(image, extent=extent, origin='lower', aspect='auto',
+                                          cmap='viridis', interpolation='nearest')
+        self.labels[key] = label
+        self._update(True)
+
+    def _reuse_lines(self, keys):
+        """Hand the lines of keys that are not in keys to new keys"""
+        spare = [key for key in self.lines if key not in keys]
+        for key in keys:
+            if key in self.lines or not spare:
+                continue
+            old = spare.pop(0)
+            line = self.lines[key] = self.lines.pop(old)
+            line.set_visible(True)
+            self.labels.pop(old, None)
+            self._ylims.pop(old, None)
+            self._remove_markers(old)
+
+    def _set_line(self, key, x, y, label):
+        """Create or update the line for key; True when the legend changed"""
+        self.labels[key] = label
+        line = self.lines.get(key)
+        if line is not None:
+            line.set_data(x, y)
+            if line.get_label() == label:
+                return False
+            line.set_label(label)
+            return True
+        color = self.COLORS[len(self.lines) % len(self.COLORS)]
+        self.lines[key], = self.ax.plot(x, y, '-', color=color, linewidth=2,
+                                        label=label, animated=True)
+        return True
+
+    def _remove_others(self, keys):
+        """Remove every curve and image not in keys; True if any was removed"""
+        others = [key for key in list(self.lines) + list(self.images) if key not in keys]
+        for key in others:
+            self._remove_artists(key)
+        return bool(others)
+
+    def _remove_artists(self, key):
+        for artists in (self.lines, self.images):
+            artist = artists.pop(key, None)
+            if artist is not None:
+                artist.remove()
+        self.labels.pop(key, None)
+        self._ylims.pop(key, None)
+        self._remove_markers(key)
+
+    def _update(self, structure_changed):
+        """Redraw when the axes change, otherwise blit the curves"""
+        limits = self._data_limits()
+        if structure_changed or limits != self._limits or not self._visible:
+            self._limits = limits
+            self._redraw()
+        else:
+            self.blit()
+
+    def set_visible(self, key, visible):
+        """Show or hide one curve and its markers without touching its data"""
+        for artist in (self.lines.get(key), self.markers.get(key)):
+            if artist is not None:
+                artist.set_visible(visible)
+        self.blit()
+
+    def is_visible(self, key):
+        line = self.lines.get(key)
+        return line is not None and line.get_visible()
+
+    def show_view(self, curves):
+        """Replace curve data after the view was re-sampled
+
+        curves maps keys to (x, y, ylim); the x range chosen by zooming or
+        panning is kept and the y range follows the visible data.
+        """
+        for key, (x, y, ylim) in curves.items():
+            line = self.lines.get(key)
+            if line is None:
+                continue
+            line.set_data(x, y)
+            self._ylims[key] = ylim
+        limits = self._data_limits()
+        if limits is None:
+            return
+        x_low, x_high = self.ax.get_xlim()
+        self._limits = (x_low, x_high, limits[2], limits[3])
+        self._redraw()
+
+    def mark(self, key, x, y):
+        """Mark points (roots, extrema) on the curve shown under key"""
+        line = self.lines.get(key)
+        if line is None:
+            return
+        self._remove_markers(key)
+        self.markers[key], = self.ax.plot(x, y, 'o', color=line.get_color(), markersize=6,
+                                          markeredgecolor='white', animated=True)
+        self.blit()
+
+    def _remove_markers(self, key):
+        marker = self.markers.pop(key, None)
+        if marker is not None:
+            marker.remove()
+
+    def pixel_width(self):
+        """Width of the plotting area in pixels"""
+        return max(int(self.ax.bbox.width), 1)
+
+    def pixel_height(self):
+        """Height of the plotting area in pixels"""
+        return max(int(self.ax.bbox.height), 1)
+
+    def set_view(self, x_low, x_high):
+        """Show [x_low, x_high] and ask the owner to re-sample it"""
+        self.ax.set_xlim(x_low, x_high)
+        self.canvas.draw_idle()
+        if self.on_view_change is None:
+            return
+        # Wait for the wheel or drag to settle before re-sampling
+        if self._view_job is not None:
+            self.widget.after_cancel(self._view_job)
+        self._view_job = self.widget.after(self.VIEW_DELAY_MS, self._emit_view_change)
+
+    def _emit_view_change(self):
+        self._view_job = None
+        x_low, x_high = self.ax.get_xlim()
+        self.on_view_change(x_low, x_high, self.pixel_width())
+
+    def _on_scroll(self, event):
+        """Zoom around the pointer"""
+        if event.inaxes is not self.ax or not self.lines:
+            return
+        factor = 1 / self.ZOOM_STEP if event.button == 'up' else self.ZOOM_STEP
+        x_low, x_high = self.ax.get_xlim()
+        center = event.xdata
+        self.set_view(center - (center - x_low) * factor, center + (x_high - center) * factor)
+
+    def _on_press(self, event):
+        if event.button == 1 and event.inaxes is self.ax and self.lines:
+            self._pan = (event.x, self.ax.get_xlim())
+
+    def _on_motion(self, event):
+        """Pan by the distance dragged, measured in pixels"""
+        if self._pan is None:
+            return
+        start, (x_low, x_high) = self._pan
+        shift = (start - event.x) / self.pixel_width() * (x_high - x_low)
+        self.set_view(x_low + shift, x_high + shift)
+
+    def _on_release(self, event):
+        self._pan = None
+
+    def remove(self, key):
+        """Remove a single curve or image"""
+        if key in self.lines or key in self.images:
+            self._remove_artists(key)
+            self._limits = self._data_limits()
+            self._redraw()
+
+    def clear(self):
+        """Remove every curve and hide the canvas"""
+        for artist in (list(self.lines.values()) + list(self.markers.values())
+                       + list(self.images.values())):
+            artist.remove()
+        self.lines.clear()
+        self.markers.clear()
+        self.images.clear()
+        self.labels.clear()
+        self._ylims.clear()
+        self._limits = None
+        self._background = None
+        if self._visible:
+            self.widget.pack_forget()
+            self._visible = False
+
+    def destroy(self):
+        """Release the figure and its Tk widget"""
+        self.clear()
+        if self._view_job is not None:
+            self.widget.after_cancel(self._view_job)
+        for cid in self._cids:
+            self.canvas.mpl_disconnect(cid)
+        self.figure.clear()
+        self.widget.destroy()
+
+    def _data_limits(self):
+        """Combined x and y limits of every curve and image"""
+        if not self.lines and not self.images:
+            return None
+        x_low, x_high, y_low, y_high = np.inf, -np.inf, np.inf, -np.inf
+        for image in self.images.values():
+            left, right, bottom, top = image.get_extent()
+            x_low, x_high = min(x_low, left, right), max(x_high, left, right)
+            y_low, y_high = min(y_low, bottom, top), max(y_high, bottom, top)
+        for key, line in self.lines.items():
+            x = np.asarray(line.get_xdata(), dtype=np.float64)
+            y = np.asarray(line.get_ydata(), dtype=np.float64)
+            finite_x = x[np.isfinite(x)]
+            if finite_x.size:
+                x_low, x_high = min(x_low, finite_x.min()), max(x_high, finite_x.max())
+            if self._ylims.get(key) is not None:
+                low, high = self._ylims[key]
+            else:
+                finite_y = y[np.isfinite(y)]
+                if not finite_y.size:
+                    continue
+                low, high = finite_y.min(), finite_y.max()
+                pad = (high - low) * 0.05 or max(abs(high), 1.0) * 0.05
+                low, high = low - pad, high + pad
+            y_low, y_high = min(y_low, low), max(y_high, high)
+        if not np.isfinite([x_low, x_high, y_low, y_high]).all():
+            return None
+        if x_low == x_high:
+            x_low, x_high = x_low - 1, x_high + 1
+        return float(x_low), float(x_high), float(y_low), float(y_high)
+
+    def _redraw(self):
+        """Full redraw after the axes, legend or title changed"""
+        if self._limits is not None:
+            x_low, x_high, y_low, y_high = self._limits
+            self.ax.set_xlim(x_low, x_high)
+            self.ax.set_ylim(y_low, y_high)
+        if len(self.labels) == 1:
+            title = f"Graph of {next(iter(self.labels.values()))}"
+        else:
+            title = f"Graph of {len(self.labels)} functions"
+        self.ax.set_title(title, fontsize=12, fontweight='bold')
+        legend = self.ax.get_legend()
+        if legend is not None:
+            legend.remove()
+        if self.lines:
+            self.ax.legend(handles=list(self.lines.values()))
+        if not self._visible:
+            self.widget.pack(fill=tk.BOTH, expand=True)
+            self._visible = True
+        self.canvas.draw()
+
+    def _on_draw(self, event):
+        """Cache the static background and paint the curves on top of it"""
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_curves()
+
+    def _draw_curves(self):
+        for line in list(self.lines.values()) + list(self.markers.values()):
+            self.ax.draw_artist(line)
+
+    def blit(self):
+        """Redraw only the curves on top of the cached background"""
+        if self._background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_curves()
+        self.canvas.blit(self.figure.bbox)
@@ -0,0 +1,205 @@
+"""
+HistoryExport - Structured, streaming history export for MathMaster
+
+Writes the calculation history as text, CSV, JSON lines or a compact NumPy
+.npz archive of numeric columns. Entries are read in batches and every
+batch is written with one bulk write, optionally through gzip or lzma
+(chosen by a .gz / .xz suffix). A progress callback is called after each
+batch and may raise to cancel; the output is written to a temporary file
+and only renamed into place when the export completes.
+"""
+
+import csv
+import gzip
+import io
+import json
+import lzma
+import math
+import os
+
+from history_store import EXPORT_HEADER, HistoryEntry, _text
+
+
+FORMATS = ("txt", "csv", "jsonl", "npz")
+COMPRESSION = {".gz": "gzip", ".xz": "lzma"}
+FIELDS = HistoryEntry._fields
+
+
+def detect_format(path):
+    """(format, compression) from a file name such as history.jsonl.gz"""
+    base, extension = os.path.splitext(path.lower())
+    compression = COMPRESSION.get(extension)
+    if compression is not None:
+        base, extension = os.path.splitext(base)
+    format = extension.lstrip(".")
+    if format == "json":
+        format = "jsonl"
+    return (format if format in FORMATS else "txt"), compression
+
+
+def iter_batches(history, batch_size=10000):
+    """Yield lists of HistoryEntry from a HistoryStore or CalculationHistory
+
+    The in-memory history only keeps formatted text, so its entries carry
+    just a number and the text.
+    """
+    if hasattr(history, "iter_batches"):
+        yield from history.iter_batches(batch_size=batch_size)
+        return
+    entries = history.entries
+    for start in range(0, len(entries), batch_size):
+        yield [HistoryEntry(start + i + 1, None, None, None, None, None, None, text)
+               for i, text in enumerate(entries[start:start + batch_size])]
+
+
+def _open(path, compression):
+    """Binary output stream; every batch arrives as one large write"""
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=6)
+    if compression == "lzma":
+        # Preset 1 compresses text nearly as well as the default at several times the speed
+        return lzma.open(path, "wb", preset=1)
+    return open(path, "wb", buffering=1 << 20)
+
+
+class TextWriter:
+    """Numbered lines, the format of the original text export"""
+
+    def header(self):
+        return EXPORT_HEADER
+
+    def format(self, batch):
+        return "".join(f"{entry.id}. {entry.text}\n" for entry in batch)
+
+
+class CSVWriter:
+    """One row per entry with every structured column"""
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator="\n")
+
+    def header(self):
+        return ",".join(FIELDS) + "\n"
+
+    def format(self, batch):
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.writer.writerows(batch)
+        return self.buffer.getvalue()
+
+
+class JSONLWriter:
+    """One JSON object per entry"""
+
+    def __init__(self):
+        # A reused encoder avoids json.dumps building one per call
+        self.encode = json.JSONEncoder(ensure_ascii=False).encode
+
+    def header(self):
+        return ""
+
+    def format(self, batch):
+        encode = self.encode
+        lines = []
+        for entry in batch:
+            record = entry._asdict()
+            # Operands beyond 2**53 are stored as text already; keep results exact too
+            for field in ("operand1", "operand2"):
+                value = record[field]
+                if isinstance(value, int) and abs(value) > 2 ** 53:
+                    record[field] = _text(value)
+            lines.append(encode(record))
+        return "\n".join(lines) + "\n"
+
+
+class NumpyWriter:
+    """Numeric columns collected batch by batch and saved as one .npz
+
+    Columns: id (int64), timestamp, operand1, operand2 and value (float64,
+    NaN where not numeric) and operation as int16 codes into the
+    operations array. Formatted text is left to the text formats.
+    NumPy is only imported once an .npz export starts, so importing this
+    module (and the GUI) does not load it.
+    """
+
+    def __init__(self):
+        import numpy
+        self.np = numpy
+        self.columns = {name: [] for name in ("id", "timestamp", "operand1", "operand2", "value")}
+        self.operation_codes = []
+        self.operations = {}
+
+    def header(self):
+        return ""
+
+    @staticmethod
+    def _float(value):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            try:
+                return float(value)
+            except OverflowError:
+                return math.inf if value > 0 else -math.inf
+        return math.nan
+
+    def format(self, batch):
+        np = self.np
+        self.columns["id"].append(np.fromiter((entry.id for entry in batch), np.int64, len(batch)))
+        for name in ("timestamp", "operand1", "operand2", "value"):
+            self.columns[name].append(np.fromiter(
+                (self._float(getattr(entry, name)) for entry in batch), np.float64, len(batch)))
+        codes = self.operations
+        self.operation_codes.append(np.fromiter(
+            (codes.setdefault(entry.operation, len(codes)) if entry.operation else -1
+             for entry in batch), np.int16, len(batch)))
+        return ""
+
+    def save(self, stream, compress):
+        np = self.np
+        arrays = {name: np.concatenate(parts) if parts else np.zeros(0)
+                  for name, parts in self.columns.items()}
+        arrays["operation"] = (np.concatenate(self.operation_codes) if self.operation_codes
+                               else np.zeros(0, dtype=np.int16))
+        arrays["operations"] = np.array(list(self.operations), dtype=str)
+        save = np.savez_compressed if compress else np.savez
+        save(stream, **arrays)
+
+
+WRITERS = {"txt": TextWriter, "csv": CSVWriter, "jsonl": JSONLWriter, "npz": NumpyWriter}
+
+
+def export_history(history, path, format=None, compression=None, progress=None,
+                   batch_size=10000):
+    """Export a history to path, returns the number of entries written
+
+    format and compression default to what the file name says. progress,
+    if given, is called with the completed fraction after every batch and
+    may raise to abandon the export, leaving any previous file untouched.
+    The npz format is already compressed with zlib when compression is set.
+    """
+    detected_format, detected_compression = detect_format(path)
+    format = format or detected_format
+    compression = compression if compression is not None else detected_compression
+    if format not in WRITERS:
+        raise ValueError(f"Unknown export format '{format}'!")
+    total = max(len(history), 1)
+    temporary = path + ".part"
+    written = 0
+    writer = WRITERS[format]()
+    try:
+        # npz compresses its members itself
+        with _open(temporary, None if format == "npz" else compression) as stream:
+            stream.write(writer.header().encode("utf-8"))
+            for batch in iter_batches(history, batch_size):
+                stream.write(writer.format(batch).encode("utf-8"))
+                written += len(batch)
+                if progress is not None:
+                    progress(min(written / total, 1.0))
+            if format == "npz":
+                writer.save(stream, compress=compression is not None)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return written
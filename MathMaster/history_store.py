@@ -0,0 +1,220 @@
+"""
+HistoryStore - Persistent, append-only calculation history for MathMaster
+
+Calculations are stored as structured rows (operation, operands, result,
+timestamp) in an SQLite database running in WAL mode. Appends are a single
+indexed insert, queries by operation, time or value range use indexes, and
+exports only stream the rows added since the previous export, so neither
+memory use nor export cost grows with the length of a session.
+"""
+
+import decimal
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from fractions import Fraction
+
+
+HistoryEntry = namedtuple(
+    "HistoryEntry", ["id", "timestamp", "operation", "operand1", "operand2", "result", "value", "text"]
+)
+
+EXPORT_HEADER = "MathMaster Calculation History\n" + "=" * 50 + "\n"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    operation TEXT,
+    operand1,
+    operand2,
+    result TEXT,
+    value REAL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_operation ON history (operation, id);
+CREATE INDEX IF NOT EXISTS history_timestamp ON history (timestamp);
+CREATE INDEX IF NOT EXISTS history_value ON history (value);
+CREATE TABLE IF NOT EXISTS exports (
+    path TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+"""
+
+_INT64_MAX = 2 ** 63 - 1
+
+
+def _text(value):
+    """str() that is not bound by the int-to-str digit limit"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(decimal.Decimal(value))
+    return str(value)
+
+
+def _sql_operand(value):
+    """Store operands natively, keeping integers beyond 64 bits exact as text"""
+    if value is None or isinstance(value, float):
+        return value
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if -_INT64_MAX <= value <= _INT64_MAX else _text(value)
+    return str(value)
+
+
+def _numeric_value(result):
+    """The result as a float for range queries, or None"""
+    if isinstance(result, bool) or not isinstance(result, (int, float, Fraction, decimal.Decimal)):
+        return None
+    try:
+        return float(result)
+    except OverflowError:
+        return None
+
+
+class HistoryStore:
+    """SQLite-backed calculation history
+
+    Implements the same interface as CalculationHistory (add, append,
+    recent, page, clear, export, iteration and len) so CalculatorCore can use
+    either one.
+    """
+
+    def __init__(self, path="math_calculations_history.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._count = self._connection.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def add(self, operation, operands, result, text):
+        """Record a structured calculation"""
+        operand1 = operands[0] if len(operands) > 0 else None
+        operand2 = operands[1] if len(operands) > 1 else None
+        return self._insert(operation, _sql_operand(operand1), _sql_operand(operand2),
+                            _text(result), _numeric_value(result), text)
+
+    def append(self, text):
+        """Record a free-form history line"""
+        return self._insert(None, None, None, None, None, text)
+
+    def _insert(self, operation, operand1, operand2, result, value, text):
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO history (timestamp, operation, operand1, operand2, result, value, text) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), operation, operand1, operand2, result, value, text))
+            self._count += 1
+            return cursor.lastrowid
+
+    def recent(self, count=20):
+        """Return up to count history lines, newest first"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT text FROM history ORDER BY id DESC LIMIT ?", (count,)).fetchall()
+        return [row[0] for row in rows]
+
+    def page(self, before=None, count=20):
+        """Return up to count (id, text) pairs with ids below before, newest first"""
+        with self._lock:
+            if before is None:
+                rows = self._connection.execute(
+                    "SELECT id, text FROM history ORDER BY id DESC LIMIT ?", (count,)).fetchall()
+            else:
+                rows = self._connection.execute(
+                    "SELECT id, text FROM history WHERE id < ? ORDER BY id DESC LIMIT ?",
+                    (before, count)).fetchall()
+        return rows
+
+    def query(self, operation=None, since=None, until=None, min_value=None,
+              max_value=None, after_id=None, limit=None, newest_first=False):
+        """Return matching entries as a list of HistoryEntry
+
+        Every filter is optional and uses an index: operation, a timestamp
+        range, a numeric result range and an id cursor for paging.
+        """
+        clauses, params = [], []
+        for column, op, value in (("operation", "=", operation),
+                                  ("timestamp", ">=", since),
+                                  ("timestamp", "<", until),
+                                  ("value", ">=", min_value),
+                                  ("value", "<=", max_value),
+                                  ("id", ">", after_id)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        sql = "SELECT * FROM history"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC" if newest_first else " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [HistoryEntry(*row) for row in rows]
+
+    def iter_batches(self, after_id=0, batch_size=1000):
+        """Yield lists of up to batch_size entries after after_id, in id order"""
+        while True:
+            batch = self.query(after_id=after_id, limit=batch_size)
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1].id
+
+    def iter_entries(self, after_id=0, batch_size=1000):
+        """Stream every entry after after_id in id order, batch by batch"""
+        for batch in self.iter_batches(after_id, batch_size):
+            yield from batch
+
+    def clear(self):
+        """Remove every entry and forget previous exports"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM history")
+            self._connection.execute("DELETE FROM exports")
+            self._count = 0
+
+    def export(self, path="math_calculations_history.txt"):
+        """Append the entries added since the last export to a text file
+
+        The file is rewritten from scratch only when it has never been
+        exported, was changed outside MathMaster or the history was cleared.
+        Returns the number of entries written.
+        """
+        key = os.path.abspath(path)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT last_id, size FROM exports WHERE path = ?", (key,)).fetchone()
+        last_id = 0
+        mode = "w"
+        if row is not None and os.path.exists(path) and os.path.getsize(path) == row[1]:
+            last_id, mode = row[0], "a"
+
+        written = 0
+        with open(path, mode, encoding="utf-8") as f:
+            if mode == "w":
+                f.write(EXPORT_HEADER)
+            for entry in self.iter_entries(after_id=last_id):
+                f.write(f"{entry.id}. {entry.text}\n")
+                last_id = entry.id
+                written += 1
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO exports (path, last_id, size) VALUES (?, ?, ?)",
+                (key, last_id, os.path.getsize(path)))
+        return written
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._connection.close()
+
+    def __iter__(self):
+        return (entry.text for entry in self.iter_entries())
+
+    def __len__(self):
+        return self._count
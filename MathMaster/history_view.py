@@ -0,0 +1,81 @@
+"""
+HistoryView - Incremental, paged rendering of the calculation history
+"""
+
+import tkinter as tk
+
+
+class HistoryView:
+    """Shows the history in a Text widget without redrawing it on every change
+
+    In live mode the newest entry is inserted at the top and the line that
+    falls off the bottom is removed, so each calculation costs the same
+    amount of UI work regardless of the session length. Older entries are
+    browsed one page at a time by keyset paging over the history, so the
+    widget never holds more than a single page.
+    """
+
+    def __init__(self, text_widget, history, page_size=20, on_page_change=None):
+        self.text = text_widget
+        self.history = history
+        self.page_size = page_size
+        self.on_page_change = on_page_change
+        # "before" cursor of every older page shown so far; empty means live
+        self._page_starts = []
+        self._oldest_shown = None
+
+    @property
+    def is_live(self):
+        """True when the newest page is shown and follows new calculations"""
+        return not self._page_starts
+
+    @property
+    def page_number(self):
+        """1-based index of the displayed page"""
+        return len(self._page_starts) + 1
+
+    def add(self, number, entry):
+        """Show a newly recorded entry"""
+        if not self.is_live:
+            return
+        self.text.config(state=tk.NORMAL)
+        self.text.insert("1.0", f"{number}. {entry}\n")
+        self.text.delete(f"{self.page_size + 1}.0", tk.END)
+        self.text.config(state=tk.DISABLED)
+
+    def show_latest(self):
+        """Return to live mode and render the newest page"""
+        self._page_starts = []
+        self._render(self.history.page(None, self.page_size))
+
+    def older(self):
+        """Show the next page of older entries, if any"""
+        if self.is_live:
+            # The live page was built incrementally, so look its end up once
+            latest = self.history.page(None, self.page_size)
+            before = latest[-1][0] if latest else None
+        else:
+            before = self._oldest_shown
+        if before is None:
+            return
+        rows = self.history.page(before, self.page_size)
+        if rows:
+            self._page_starts.append(before)
+            self._render(rows)
+
+    def newer(self):
+        """Show the previous page of newer entries"""
+        if not self._page_starts:
+            return
+        self._page_starts.pop()
+        before = self._page_starts[-1] if self._page_starts else None
+        self._render(self.history.page(before, self.page_size))
+
+    def _render(self, rows):
+        self._oldest_shown = rows[-1][0] if rows else None
+        self.text.config(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, "".join(f"{number}. {entry}\n" for number, entry in rows))
+        self.text.config(state=tk.DISABLED)
+        if self.on_page_change is not None:
+            self.on_page_change(self)
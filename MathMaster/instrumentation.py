@@ -0,0 +1,256 @@
+"""
+Instrumentation - Opt-in latency metrics and profiling for MathMaster
+
+Metrics records per-operation call counts, error counts and latency
+histograms plus named phase timings (e.g. the steps of plotting a graph),
+and exports them as Prometheus text or JSON. ProfileSession wraps a session
+in cProfile, including jobs that run on worker threads, and dumps the
+merged statistics. Nothing is recorded unless a Metrics object or a
+ProfileSession is attached, so the disabled cost is a single None check.
+"""
+
+import bisect
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Upper bounds in seconds, from 10 µs (scalar arithmetic) to 10 s (huge factorials)
+DEFAULT_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q):
+        """Approximate quantile, the upper bound of the bucket holding it"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float("inf")
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _json_bound(bound):
+    # JSON has no infinity
+    return "+Inf" if bound == float("inf") else bound
+
+
+class Metrics:
+    """Thread-safe registry of counters and latency histograms
+
+    Metric names follow Prometheus conventions; labels are keyword
+    arguments, e.g. metrics.observe("mathmaster_operation_seconds", 0.002,
+    operation="factorial", mode="exact").
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, text):
+        """Set the HELP text of a metric"""
+        self._help[name] = text
+
+    def observe(self, name, seconds, **labels):
+        """Add one latency observation to a histogram"""
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def increment(self, name, amount=1, **labels):
+        """Increase a counter"""
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time the enclosed block into a histogram, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def histogram(self, name, **labels):
+        """Return the histogram for a metric and labels, or None"""
+        return self._histograms.get((name, _labels(labels)))
+
+    def counter(self, name, **labels):
+        """Return a counter value (0 if never incremented)"""
+        return self._counters.get((name, _labels(labels)), 0)
+
+    def reset(self):
+        """Forget every observation"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def to_prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines = []
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+            for bound, total in histogram.cumulative():
+                extra = (("le", _format_bound(bound)),)
+                lines.append(f"{name}_bucket{_format_labels(labels, extra)} {total}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum!r}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """Every metric as plain data, for JSON export"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        return {
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in counters],
+            "histograms": [{"name": name, "labels": dict(labels),
+                            "count": histogram.count, "sum": histogram.sum,
+                            "p50": _json_bound(histogram.quantile(0.5)),
+                            "p99": _json_bound(histogram.quantile(0.99)),
+                            "buckets": [[_format_bound(bound), total]
+                                        for bound, total in histogram.cumulative()]}
+                           for (name, labels), histogram in histograms],
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def export(self, path):
+        """Write the metrics to path, as JSON for *.json and Prometheus text otherwise"""
+        text = self.to_json() + "\n" if path.lower().endswith(".json") else self.to_prometheus()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+
+class ProfileSession:
+    """cProfile over an interactive session, merged across threads
+
+    start() profiles the calling (Tk) thread; jobs handed to call() on
+    worker threads get their own profiler. On interpreters where one
+    profiler already sees every thread, call() simply runs the job.
+    """
+
+    def __init__(self):
+        self._main = cProfile.Profile()
+        self._profiles = [self._main]
+        self._lock = threading.Lock()
+        self.active = False
+
+    def start(self):
+        self._main.enable()
+        self.active = True
+
+    def stop(self):
+        self._main.disable()
+        self.active = False
+
+    def call(self, function, *args):
+        """Run function(*args) under a profiler on the current thread"""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active for the whole process
+            return function(*args)
+        try:
+            return function(*args)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.append(profile)
+
+    def stats(self):
+        """Merged pstats.Stats of the session so far"""
+        with self._lock:
+            profiles = list(self._profiles)
+        stats = pstats.Stats(stream=io.StringIO())
+        for profile in profiles:
+            profile.create_stats()
+            # pstats rejects profilers that never recorded a call
+            if profile.stats:
+                stats.add(profile)
+        return stats
+
+    def dump(self, path):
+        """Stop profiling and write the merged stats (load with pstats or snakeviz)"""
+        if self.active:
+            self.stop()
+        self.stats().dump_stats(path)
+        return path
+
+    def summary(self, limit=25, sort="cumulative"):
+        """Text table of the most expensive functions"""
+        stream = io.StringIO()
+        stats = self.stats()
+        stats.stream = stream
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
@@ -0,0 +1,122 @@
+"""
+LevelOfDetail - Screen-resolution sampling for zooming and panning graphs
+
+A view only ever needs as many samples as it has pixel columns. Functions
+are sampled in tiles whose width is a power of two chosen from the visible
+span, so panning reuses neighbouring tiles and zooming by a factor of two
+moves to the next level. Tiles are kept in an OperationCache, so revisited
+regions are not evaluated again. Dense data is reduced to the first, last,
+minimum and maximum point of every pixel column before it is drawn, which
+renders the same image as the full data at a fraction of the cost.
+"""
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from adaptive_sampler import adaptive_sample, robust_scale
+from operation_cache import OperationCache
+
+
+ViewSamples = namedtuple("ViewSamples", ["x", "y", "ylim", "tiles", "computed"])
+
+
+def minmax_downsample(x, y, columns, x_low=None, x_high=None):
+    """Reduce samples sorted by x to at most four points per pixel column
+
+    For every column the first, last, lowest and highest finite points are
+    kept (the M4 method), so the line drawn at that width looks the same as
+    the full data. Non-finite points are kept as well, so breaks at poles
+    survive. Points outside [x_low, x_high] are grouped into one column per
+    side.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    columns = max(int(columns), 1)
+    if x.size <= 4 * columns:
+        return x, y
+    x_low = x[0] if x_low is None else x_low
+    x_high = x[-1] if x_high is None else x_high
+    width = (x_high - x_low) or 1.0
+    column = np.floor((x - x_low) / width * columns)
+    column = np.clip(column, -1, columns).astype(np.int64)
+
+    finite = np.nonzero(np.isfinite(y))[0]
+    keep = [np.nonzero(~np.isfinite(y))[0]]
+    if finite.size:
+        groups = column[finite]
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        ends = np.r_[starts[1:], groups.size] - 1
+        # Sorting by (column, y) puts each column's minimum first and maximum last
+        order = np.lexsort((y[finite], groups))
+        keep += [finite[starts], finite[ends], finite[order[starts]], finite[order[ends]]]
+    indices = np.unique(np.concatenate(keep))
+    return x[indices], y[indices]
+
+
+class LevelOfDetailSampler:
+    """Samples one function for arbitrary views at screen resolution
+
+    function is a vectorized callable such as a CompiledExpression; key
+    identifies it in the shared tile cache (its expression by default).
+    Sampling a view costs O(columns) evaluations at most, independent of
+    how wide the visible range is.
+    """
+
+    def __init__(self, function, key=None, cache=None, tiles_per_view=4, oversample=2):
+        self.function = function
+        self.key = key if key is not None else getattr(function, "expression", id(function))
+        self.cache = cache if cache is not None else OperationCache(max_entries=512)
+        self.tiles_per_view = tiles_per_view
+        self.oversample = oversample
+
+    def tile_width(self, span):
+        """Power-of-two tile width giving about tiles_per_view tiles per view"""
+        return 2.0 ** math.ceil(math.log2(span / self.tiles_per_view))
+
+    def sample(self, x_low, x_high, columns):
+        """Samples covering [x_low, x_high] for a view columns pixels wide"""
+        if not x_high > x_low:
+            raise ValueError("Range end must be greater than range start!")
+        columns = max(int(columns), 16)
+        width = self.tile_width(x_high - x_low)
+        points = max(16, columns * self.oversample // self.tiles_per_view)
+        first = math.floor(x_low / width)
+        last = math.ceil(x_high / width) - 1
+        computed = []
+        x_parts, y_parts = [], []
+        for index in range(first, last + 1):
+            key = ("tile", self.key, width, index, points)
+            x, y = self.cache.call(key, self._sample_tile, index * width, (index + 1) * width,
+                                   points, computed)
+            # Neighbouring tiles share their boundary sample
+            skip = 1 if x_parts else 0
+            x_parts.append(x[skip:])
+            y_parts.append(y[skip:])
+        x = np.concatenate(x_parts)
+        y = np.concatenate(y_parts)
+
+        # Keep one sample beyond each edge so the line reaches the border
+        start = max(np.searchsorted(x, x_low, side="left") - 1, 0)
+        stop = min(np.searchsorted(x, x_high, side="right") + 1, x.size)
+        x, y = minmax_downsample(x[start:stop], y[start:stop], columns, x_low, x_high)
+        return ViewSamples(x, y, self._ylim(x, y), last - first + 1, len(computed))
+
+    def _sample_tile(self, start, end, points, computed):
+        computed.append(start)
+        curve = adaptive_sample(self.function, start, end, initial_points=points,
+                                max_evaluations=4 * points)
+        return curve.x, curve.y
+
+    @staticmethod
+    def _ylim(x, y):
+        """Clip the view like adaptive_sample does when poles dominate the range"""
+        finite = y[np.isfinite(y)]
+        if not finite.size:
+            return None
+        low, high = robust_scale(y, x)
+        if np.ptp(finite) > 20 * (high - low):
+            pad = (high - low) * 0.1
+            return (low - pad, high + pad)
+        return None
@@ -4,14 +4,103 @@ MathMaster - Advanced Mathematical Application
 Main entry point for the application
 """
 
-import tkinter as tk
-from calculator_gui import MathCalculatorApp
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import sys
+
+def report_startup_time():
+    """Print the cold-start time once the window is ready for input"""
+    elapsed_ms = (time.perf_counter() - _START) * 1000
+    print(f"MathMaster cold start: {elapsed_ms:.1f} ms", file=sys.stderr)
+
+def non_negative_int(text):
+    """argparse type for counts where 0 has a meaning of its own"""
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {value}")
+    return value
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="MathMaster - Advanced Mathematical Application")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="run the session under cProfile and write the stats to FILE")
+    batch = parser.add_argument_group("batch mode (no display required)")
+    batch.add_argument("--batch", metavar="FILE",
+                       help="evaluate (op, a, b) records from FILE, or '-' for stdin")
+    batch.add_argument("--output", metavar="FILE", default="-",
+                       help="where to write results (default: stdout)")
+    batch.add_argument("--input-format", choices=("csv", "jsonl"),
+                       help="input format (default: from the file name, else csv)")
+    batch.add_argument("--output-format", choices=("csv", "jsonl"),
+                       help="output format (default: same as the input)")
+    batch.add_argument("--chunk-size", type=int, default=65536,
+                       help="records evaluated per vectorized chunk")
+    batch.add_argument("--workers", type=non_negative_int, default=1, metavar="N",
+                       help="worker processes for batch chunks (0 = one per CPU)")
+    service = parser.add_argument_group("service mode (no display required)")
+    service.add_argument("--serve", action="store_true",
+                         help="run the HTTP/JSON calculation service")
+    service.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    service.add_argument("--port", type=int, default=8765, help="TCP port to listen on")
+    service.add_argument("--socket", metavar="PATH",
+                         help="listen on a Unix socket instead of TCP")
+    service.add_argument("--max-pending", type=int, default=65536,
+                         help="queued calculations before requests are refused with 503")
+    service.add_argument("--request-timeout", type=float, default=5.0,
+                         help="seconds before a request is answered with 504")
+    stats = parser.add_argument_group("statistics mode (no display required; uses --workers)")
+    stats.add_argument("--stats", metavar="FILE",
+                       help="summarize the numbers in a CSV/text or .npy FILE in one pass")
+    stats.add_argument("--column", metavar="COL",
+                       help="column index or header name (default: every value)")
+    stats.add_argument("--quantiles", default="0.01,0.05,0.25,0.5,0.75,0.95,0.99",
+                       help="comma-separated quantiles to report")
+    stats.add_argument("--bins", type=int, default=20, help="histogram bins")
+    stats.add_argument("--range", type=float, nargs=2, metavar=("LOW", "HIGH"),
+                       help="histogram range; gives exact counts instead of estimates")
+    return parser.parse_args(argv)
+
+def launch_gui():
+    """Launch the Tk application"""
+    import tkinter as tk
+    from calculator_gui import MathCalculatorApp
 
-def main():
-    """Main function to launch the MathMaster application"""
     root = tk.Tk()
     app = MathCalculatorApp(root)
+    root.after_idle(report_startup_time)
     root.mainloop()
 
+def main(argv=None):
+    """Main function to launch the MathMaster application"""
+    args = parse_args(argv)
+    if args.profile:
+        from instrumentation import ProfileSession
+        profiler = ProfileSession()
+        profiler.start()
+        try:
+            return run(args)
+        finally:
+            profiler.dump(args.profile)
+            print(f"MathMaster profile written to {args.profile}", file=sys.stderr)
+    return run(args)
+
+def run(args):
+    """Run batch mode, statistics mode, the service or the GUI"""
+    if args.serve:
+        from calculation_service import main as run_service
+        return run_service(args)
+    if args.batch:
+        from batch_cli import main as run_batch
+        return run_batch(args)
+    if args.stats:
+        from data_statistics import main as run_statistics
+        return run_statistics(args)
+    launch_gui()
+    return 0
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
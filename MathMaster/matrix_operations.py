@@ -0,0 +1,312 @@
+"""
+MatrixOperations - NumPy linear algebra for MathMaster
+
+Matrix sums and products, determinants, inverses, linear systems,
+eigenvalues, LU and QR decompositions and rank, all delegated to NumPy's
+BLAS and LAPACK routines. Matrices come from grid text ("1 2; 3 4"), from
+.npy files opened as read-only memory maps or from CSV files, which are
+memory-mapped and parsed a block of rows at a time straight into the
+result array. Float64 inputs are never converted again, so a matrix of
+several thousand rows is copied at most once, by the routine that needs a
+writable array.
+"""
+
+import mmap
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+
+# Bytes of CSV text parsed per np.loadtxt call
+TEXT_BLOCK_BYTES = 8 * 1024 * 1024
+# Columns of the panel factorized before each BLAS update in the LU
+LU_BLOCK = 64
+
+_ROW_SEPARATOR = re.compile(r"[;\n]")
+_ENTRY_SEPARATOR = re.compile(r"[,\s]+")
+
+
+class LUDecomposition(namedtuple("LUDecomposition", ["lu", "permutation"])):
+    """Packed LU factors with partial pivoting: A[permutation] = lower @ upper
+
+    lu holds the unit lower triangular factor below the diagonal and the
+    upper triangular factor on and above it, as LAPACK stores them.
+    """
+
+    __slots__ = ()
+
+    @property
+    def lower(self):
+        k = min(self.lu.shape)
+        lower = np.tril(self.lu[:, :k], -1)
+        np.fill_diagonal(lower, 1.0)
+        return lower
+
+    @property
+    def upper(self):
+        return np.triu(self.lu[:min(self.lu.shape)])
+
+
+QRDecomposition = namedtuple("QRDecomposition", ["q", "r"])
+
+
+def as_matrix(data, name="A"):
+    """data as a 2-D float64 array; float64 arrays and memory maps are not copied"""
+    matrix = np.asarray(data, dtype=np.float64)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if matrix.ndim != 2 or matrix.size == 0:
+        raise ValueError(f"Matrix {name} must be a non-empty 2-D array!")
+    if not np.isfinite(matrix).all():
+        raise ValueError(f"Matrix {name} contains non-finite values!")
+    return matrix
+
+
+def _square(matrix, name="A"):
+    if matrix.shape[0] != matrix.shape[1]:
+        rows, columns = matrix.shape
+        raise ValueError(f"Matrix {name} must be square, not {rows}×{columns}!")
+    return matrix
+
+
+def parse_matrix(text):
+    """Matrix from grid text such as "1 2; 3 4" or "1, 2" / "3, 4" on two lines"""
+    rows = []
+    for line in _ROW_SEPARATOR.split(text):
+        entries = [entry for entry in _ENTRY_SEPARATOR.split(line.strip()) if entry]
+        if entries:
+            rows.append(entries)
+    if not rows:
+        raise ValueError("Please enter a matrix!")
+    if len({len(row) for row in rows}) != 1:
+        raise ValueError("Every row of a matrix needs the same number of entries!")
+    try:
+        return np.array(rows, dtype=np.float64)
+    except ValueError:
+        raise ValueError("Matrix entries must be numbers!") from None
+
+
+def _count_lines(view, chunk=1 << 24):
+    """Newlines in a memory-mapped file, read a chunk at a time"""
+    count = sum(view[start:start + chunk].count(b"\n") for start in range(0, len(view), chunk))
+    # A last line without a newline
+    return count + (len(view) > 0 and view[-1:] != b"\n")
+
+
+def _blocks(view, size):
+    """Lists of decoded lines holding about size bytes each"""
+    block, used = [], 0
+    for line in iter(view.readline, b""):
+        block.append(line.decode("utf-8"))
+        used += len(line)
+        if used >= size:
+            yield block
+            block, used = [], 0
+    if block:
+        yield block
+
+
+def _load_text(path):
+    """Parse a CSV or whitespace-separated file block by block into one array
+
+    Blank lines and '#' comments are skipped. The file is memory-mapped, so
+    only one block of rows exists as text at a time.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"'{path}' is empty!")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            capacity = _count_lines(view)
+            matrix = None
+            filled = 0
+            delimiter = None
+            for block in _blocks(view, TEXT_BLOCK_BYTES):
+                if delimiter is None:
+                    sample = next((line for line in block
+                                   if line.strip() and not line.lstrip().startswith("#")), "")
+                    delimiter = "," if "," in sample else ";" if ";" in sample else ""
+                try:
+                    values = np.loadtxt(block, delimiter=delimiter or None, ndmin=2)
+                except ValueError as e:
+                    raise ValueError(f"'{path}' is not a numeric matrix: {e}") from None
+                if values.size == 0:
+                    continue
+                if matrix is None:
+                    matrix = np.empty((capacity, values.shape[1]), dtype=np.float64)
+                elif values.shape[1] != matrix.shape[1]:
+                    raise ValueError(f"Every row of '{path}' needs {matrix.shape[1]} entries!")
+                matrix[filled:filled + len(values)] = values
+                filled += len(values)
+    if matrix is None:
+        raise ValueError(f"'{path}' holds no numbers!")
+    return matrix[:filled]
+
+
+def load_matrix(path):
+    """Matrix from a .npy file (memory-mapped, read-only) or a CSV/text file"""
+    if path.lower().endswith(".npy"):
+        matrix = np.load(path, mmap_mode="r")
+        if matrix.dtype != np.float64:
+            # The one copy: LAPACK needs float64
+            matrix = matrix.astype(np.float64)
+        return as_matrix(matrix, os.path.basename(path))
+    return as_matrix(_load_text(path), os.path.basename(path))
+
+
+def save_matrix(path, matrix):
+    """Write a result as .npy (loadable with memory mapping) or CSV"""
+    matrix = np.asarray(matrix)
+    if path.lower().endswith(".npy"):
+        np.save(path, matrix)
+    else:
+        np.savetxt(path, np.atleast_2d(matrix), delimiter=",", fmt="%.17g")
+
+
+def format_matrix(matrix, precision=6):
+    """Printable matrix; large ones show only their corners"""
+    return np.array2string(np.asarray(matrix), precision=precision, suppress_small=True,
+                           threshold=200, edgeitems=4, max_line_width=100)
+
+
+def _lu_in_place(a, permutation, block):
+    """Blocked right-looking LU with partial pivoting, overwriting a
+
+    Each panel of block columns is factorized column by column; the rest
+    of the matrix is then updated with one matrix product, which is where
+    BLAS does nearly all the work.
+    """
+    rows, columns = a.shape
+    steps = min(rows, columns)
+    for start in range(0, steps, block):
+        end = min(start + block, steps)
+        for j in range(start, end):
+            pivot = j + int(np.argmax(np.abs(a[j:, j])))
+            if pivot != j:
+                a[[j, pivot]] = a[[pivot, j]]
+                permutation[[j, pivot]] = permutation[[pivot, j]]
+            if a[j, j] == 0:
+                # Singular column: nothing to eliminate
+                continue
+            a[j + 1:, j] /= a[j, j]
+            a[j + 1:, j + 1:end] -= np.outer(a[j + 1:, j], a[j, j + 1:end])
+        if end < columns:
+            lower = np.tril(a[start:end, start:end], -1)
+            np.fill_diagonal(lower, 1.0)
+            a[start:end, end:] = np.linalg.solve(lower, a[start:end, end:])
+            a[end:, end:] -= a[end:, start:end] @ a[start:end, end:]
+
+
+class MatrixOperations:
+    """Linear algebra on matrices given as arrays, memory maps or grid text"""
+
+    # name: (label, number of matrices)
+    OPERATIONS = {
+        "add": ("A + B", 2),
+        "multiply": ("A × B", 2),
+        "determinant": ("det(A)", 1),
+        "inverse": ("A⁻¹", 1),
+        "solve": ("Solve Ax = b", 2),
+        "eigenvalues": ("Eigenvalues of A", 1),
+        "lu": ("LU decomposition of A", 1),
+        "qr": ("QR decomposition of A", 1),
+        "rank": ("rank(A)", 1),
+    }
+
+    @staticmethod
+    def add(a, b):
+        """Element-wise sum of two matrices of the same shape"""
+        a, b = as_matrix(a, "A"), as_matrix(b, "B")
+        if a.shape != b.shape:
+            raise ValueError(f"Cannot add a {a.shape[0]}×{a.shape[1]} and a "
+                             f"{b.shape[0]}×{b.shape[1]} matrix!")
+        return a + b
+
+    @staticmethod
+    def multiply(a, b):
+        """Matrix product A @ B"""
+        a, b = as_matrix(a, "A"), as_matrix(b, "B")
+        if a.shape[1] != b.shape[0]:
+            raise ValueError(f"Cannot multiply a {a.shape[0]}×{a.shape[1]} by a "
+                             f"{b.shape[0]}×{b.shape[1]} matrix!")
+        return a @ b
+
+    @staticmethod
+    def determinant(a):
+        """Determinant, from the log-determinant so large matrices do not overflow early"""
+        sign, log_determinant = np.linalg.slogdet(_square(as_matrix(a)))
+        with np.errstate(over="ignore"):
+            return float(sign * np.exp(log_determinant))
+
+    @staticmethod
+    def inverse(a):
+        """Inverse of a square, non-singular matrix"""
+        a = _square(as_matrix(a))
+        try:
+            return np.linalg.inv(a)
+        except np.linalg.LinAlgError:
+            raise ValueError("Matrix is singular and has no inverse!") from None
+
+    @staticmethod
+    def solve(a, b):
+        """x with A x = b; b (matrix B) may hold several right-hand sides as columns
+
+        A non-square A gives the least-squares solution.
+        """
+        a = as_matrix(a)
+        b = np.asarray(b, dtype=np.float64)
+        if b.ndim == 2 and b.shape[0] == 1 and a.shape[0] != 1:
+            # B entered as one row
+            b = b.ravel()
+        if b.shape[0] != a.shape[0]:
+            raise ValueError(f"B needs {a.shape[0]} rows to match A!")
+        if not np.isfinite(b).all():
+            raise ValueError("Matrix B contains non-finite values!")
+        if a.shape[0] != a.shape[1]:
+            return np.linalg.lstsq(a, b, rcond=None)[0]
+        try:
+            return np.linalg.solve(a, b)
+        except np.linalg.LinAlgError:
+            raise ValueError("Matrix is singular; the system has no unique solution!") from None
+
+    @staticmethod
+    def eigenvalues(a):
+        """Eigenvalues; symmetric matrices use the faster, real-valued solver"""
+        a = _square(as_matrix(a))
+        if np.allclose(a, a.T):
+            return np.linalg.eigvalsh(a)
+        values = np.linalg.eigvals(a)
+        return values.real if not np.iscomplex(values).any() else values
+
+    @staticmethod
+    def lu(a, block=LU_BLOCK):
+        """LU decomposition with partial pivoting as an LUDecomposition"""
+        # The only copy: the factors overwrite it
+        lu = np.array(as_matrix(a), dtype=np.float64, order="C")
+        permutation = np.arange(lu.shape[0])
+        _lu_in_place(lu, permutation, block)
+        return LUDecomposition(lu, permutation)
+
+    @staticmethod
+    def qr(a):
+        """Reduced QR decomposition A = Q R"""
+        q, r = np.linalg.qr(as_matrix(a))
+        return QRDecomposition(q, r)
+
+    @staticmethod
+    def rank(a):
+        """Numerical rank from the singular values"""
+        return int(np.linalg.matrix_rank(as_matrix(a)))
+
+    @staticmethod
+    def format(name, result):
+        """Text for the results panel"""
+        if isinstance(result, LUDecomposition):
+            return (f"P = {format_matrix(result.permutation)}\n\n"
+                    f"L =\n{format_matrix(result.lower)}\n\nU =\n{format_matrix(result.upper)}")
+        if isinstance(result, QRDecomposition):
+            return f"Q =\n{format_matrix(result.q)}\n\nR =\n{format_matrix(result.r)}"
+        if isinstance(result, np.ndarray):
+            return format_matrix(result)
+        return f"{result:.10g}" if isinstance(result, float) else str(result)
@@ -0,0 +1,439 @@
+"""
+NumberTheory - Sieve-backed number theory for MathMaster
+
+Prime tests, factorization, Euler's totient, divisor functions and modular
+exponentiation. Small values are answered from tables that are built lazily
+and reused: an odd-only sieve of Eratosthenes stored in a bytearray (one
+byte per two integers, grown a segment at a time) and a smallest-prime-
+factor table used to factor whole arrays at once. Values beyond the tables
+use Miller-Rabin and Pollard's rho. Batch variants return BatchResult
+objects like BatchOperations does.
+"""
+
+import math
+import random
+import threading
+
+import numpy as np
+
+from batch_operations import BatchResult
+
+
+# Miller-Rabin with these bases is exact below _DETERMINISTIC_LIMIT
+SMALL_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+_DETERMINISTIC_LIMIT = 3317044064679887385961981
+_INT64_MAX = int(np.iinfo(np.int64).max)
+
+
+def _simple_sieve(limit):
+    """Odd-only bytearray sieve for [0, limit), used for the base primes"""
+    bits = bytearray([1]) * ((limit + 1) // 2)
+    if bits:
+        bits[0] = 0
+    for i in range(1, (math.isqrt(max(limit - 1, 0)) + 1) // 2):
+        if bits[i]:
+            p = 2 * i + 1
+            start = p * p // 2
+            bits[start::p] = bytes(len(range(start, len(bits), p)))
+    return bits
+
+
+class PrimeSieve:
+    """Segmented odd-only sieve of Eratosthenes, extended on demand
+
+    Byte i of the table stands for the odd number 2*i + 1 and is 1 when
+    it is prime. ensure(limit) sieves new segments of segment_size numbers
+    until the table covers [0, limit); the table at least doubles each
+    time it grows, so repeated queries cost amortized O(1) sieving.
+    """
+
+    def __init__(self, segment_size=1 << 20):
+        self.segment_size = segment_size
+        self.limit = 0
+        self._bits = bytearray()
+        self._lock = threading.Lock()
+
+    def ensure(self, limit):
+        """Make sure every integer below limit is in the table"""
+        if limit <= self.limit:
+            return
+        with self._lock:
+            if limit <= self.limit:
+                return
+            target = max(limit, 2 * self.limit, self.segment_size)
+            target += target & 1
+            base = _simple_sieve(math.isqrt(target) + 1)
+            base_primes = [2 * i + 1 for i in range(1, len(base)) if base[i]]
+            start = self.limit
+            while start < target:
+                stop = min(start + self.segment_size, target)
+                self._bits += self._segment(start, stop, base_primes)
+                start = stop
+            self.limit = target
+
+    @staticmethod
+    def _segment(start, stop, base_primes):
+        """Sieve the odd numbers in [start, stop); start and stop are even"""
+        segment = bytearray([1]) * ((stop - start) // 2)
+        if start == 0:
+            segment[0] = 0
+        for p in base_primes:
+            if p * p >= stop:
+                break
+            first = max(p * p, (start + p - 1) // p * p)
+            if not first & 1:
+                first += p
+            index = (first - start) // 2
+            if index < len(segment):
+                segment[index::p] = bytes(len(range(index, len(segment), p)))
+        return segment
+
+    def is_prime(self, n):
+        """Table lookup, extending the table to n if needed"""
+        if n < 3:
+            return n == 2
+        if not n & 1:
+            return False
+        self.ensure(n + 1)
+        return self._bits[n >> 1] == 1
+
+    def table(self):
+        """The sieve as a read-only NumPy uint8 view"""
+        return np.frombuffer(bytes(self._bits), dtype=np.uint8)
+
+    def primes(self, limit):
+        """All primes below limit as an int64 array"""
+        if limit <= 2:
+            return np.zeros(0, dtype=np.int64)
+        self.ensure(limit)
+        odd = np.flatnonzero(self.table()[:limit // 2 + (limit & 1)]).astype(np.int64) * 2 + 1
+        odd = odd[odd < limit]
+        return np.concatenate(([2], odd)).astype(np.int64)
+
+    def primes_between(self, low, high):
+        """Primes in [low, high) by a segmented sieve over just that window
+
+        The table is only extended to sqrt(high), so windows far beyond it
+        (e.g. around 10**15) cost time proportional to their width.
+        """
+        low = max(low, 2)
+        if high <= low:
+            return np.zeros(0, dtype=np.int64)
+        if high <= self.limit:
+            primes = self.primes(high)
+            return primes[primes >= low]
+        base = self.primes(math.isqrt(high - 1) + 1)
+        window = np.ones(high - low, dtype=bool)
+        for p in base.tolist():
+            first = max(p * p, (low + p - 1) // p * p)
+            window[first - low::p] = False
+        return np.flatnonzero(window).astype(np.int64) + low
+
+
+class NumberTheory:
+    """Number-theoretic functions over a shared, lazily built sieve
+
+    Integers below table_limit are tested from the sieve; arrays whose
+    largest value is below factor_table_limit are factored with a
+    smallest-prime-factor table (4 bytes per integer) in a few vectorized
+    passes instead of per-value trial division.
+    """
+
+    def __init__(self, table_limit=1 << 24, factor_table_limit=1 << 24, sieve=None):
+        self.sieve = sieve if sieve is not None else PrimeSieve()
+        self.table_limit = table_limit
+        self.factor_table_limit = factor_table_limit
+        self._smallest_factors = np.zeros(0, dtype=np.uint32)
+        self._lock = threading.Lock()
+
+    # Tables
+
+    def smallest_factors(self, limit):
+        """Smallest prime factor of every integer below limit (0 and 1 map to 0 and 1)"""
+        if limit <= self._smallest_factors.size:
+            return self._smallest_factors
+        with self._lock:
+            if limit <= self._smallest_factors.size:
+                return self._smallest_factors
+            size = max(limit, 2 * self._smallest_factors.size, 1 << 16)
+            spf = np.zeros(size, dtype=np.uint32)
+            for p in self.sieve.primes(math.isqrt(size - 1) + 1).tolist():
+                multiples = spf[p * p::p]
+                multiples[multiples == 0] = p
+            unset = np.flatnonzero(spf == 0)
+            spf[unset] = unset
+            self._smallest_factors = spf
+            return spf
+
+    # Single values
+
+    @staticmethod
+    def _require_positive(n, what):
+        if isinstance(n, float) and n.is_integer():
+            n = int(n)
+        if isinstance(n, bool) or not isinstance(n, (int, np.integer)):
+            raise ValueError(f"{what} requires an integer!")
+        n = int(n)
+        if n < 1:
+            raise ValueError(f"{what} requires a positive integer!")
+        return n
+
+    @staticmethod
+    def miller_rabin(n, bases=SMALL_PRIMES):
+        """Miller-Rabin strong probable-prime test for odd n > 41"""
+        d = n - 1
+        shift = (d & -d).bit_length() - 1
+        d >>= shift
+        for a in bases:
+            x = pow(a, d, n)
+            if x == 1 or x == n - 1:
+                continue
+            for _ in range(shift - 1):
+                x = x * x % n
+                if x == n - 1:
+                    break
+            else:
+                return False
+        return True
+
+    def is_prime(self, n):
+        """Primality: sieve lookup for small n, Miller-Rabin beyond
+
+        Exact below 3.3 * 10**24; larger values additionally pass 16
+        random bases, so a composite slips through with probability
+        below 4**-16.
+        """
+        n = int(n)
+        if n < self.table_limit:
+            return self.sieve.is_prime(n)
+        for p in SMALL_PRIMES:
+            if n % p == 0:
+                return False
+        if not self.miller_rabin(n):
+            return False
+        if n < _DETERMINISTIC_LIMIT:
+            return True
+        rng = random.Random(n)
+        return self.miller_rabin(n, [rng.randrange(2, n - 1) for _ in range(16)])
+
+    @staticmethod
+    def pollard_rho(n):
+        """A non-trivial factor of an odd composite n (Brent's variant)"""
+        if n % 2 == 0:
+            return 2
+        rng = random.Random(n)
+        while True:
+            y, c, m = rng.randrange(1, n), rng.randrange(1, n), 128
+            g = r = q = 1
+            while g == 1:
+                x = y
+                for _ in range(r):
+                    y = (y * y + c) % n
+                k = 0
+                while k < r and g == 1:
+                    saved = y
+                    for _ in range(min(m, r - k)):
+                        y = (y * y + c) % n
+                        q = q * abs(x - y) % n
+                    g = math.gcd(q, n)
+                    k += m
+                r *= 2
+            if g == n:
+                # Products collapsed to n: redo the last block one step at a time
+                g = 1
+                while g == 1:
+                    saved = (saved * saved + c) % n
+                    g = math.gcd(abs(x - saved), n)
+            if g != n:
+                return g
+
+    def factorize(self, n):
+        """Prime factorization as a {prime: exponent} dict in ascending order"""
+        n = self._require_positive(n, "Factorization")
+        factors = {}
+        if n < self._smallest_factors.size:
+            spf = self._smallest_factors
+            while n > 1:
+                p = int(spf[n])
+                factors[p] = factors.get(p, 0) + 1
+                n //= p
+            return factors
+        # Trial division by the tabled primes removes all small factors cheaply
+        for p in self.sieve.primes(min(math.isqrt(n), 1 << 12) + 1).tolist():
+            if p * p > n:
+                break
+            while n % p == 0:
+                factors[p] = factors.get(p, 0) + 1
+                n //= p
+        pending = [n] if n > 1 else []
+        while pending:
+            m = pending.pop()
+            if self.is_prime(m):
+                factors[m] = factors.get(m, 0) + 1
+                continue
+            root = math.isqrt(m)
+            if root * root == m:
+                pending += [root, root]
+                continue
+            d = self.pollard_rho(m)
+            pending += [d, m // d]
+        return dict(sorted(factors.items()))
+
+    def totient(self, n):
+        """Euler's phi: how many of 1..n are coprime to n"""
+        result = self._require_positive(n, "Totient")
+        for p in self.factorize(result):
+            result -= result // p
+        return result
+
+    def divisor_count(self, n):
+        """Number of positive divisors of n"""
+        return math.prod(e + 1 for e in self.factorize(n).values())
+
+    def divisor_sum(self, n):
+        """Sum of the positive divisors of n"""
+        return math.prod((p ** (e + 1) - 1) // (p - 1) for p, e in self.factorize(n).items())
+
+    def next_prime(self, n):
+        """Smallest prime greater than n"""
+        candidate = max(int(n) + 1, 2)
+        if candidate > 2 and not candidate & 1:
+            candidate += 1
+        while not self.is_prime(candidate):
+            candidate += 1 if candidate == 2 else 2
+        return candidate
+
+    @staticmethod
+    def mod_pow(base, exponent, modulus):
+        """base ** exponent mod modulus; negative exponents use the modular inverse"""
+        if modulus < 1:
+            raise ValueError("Modulus must be a positive integer!")
+        try:
+            return pow(int(base), int(exponent), int(modulus))
+        except ValueError:
+            raise ValueError(f"{base} has no inverse modulo {modulus}!") from None
+
+    # Arrays
+
+    def _batch_operands(self, values):
+        """Integer array plus a mask of entries that are not positive integers"""
+        values = np.asarray(values)
+        if values.dtype.kind == 'f':
+            invalid = ~np.isfinite(values) | (values != np.floor(values)) | (values < 1)
+            values = np.where(invalid, 1, values)
+            if values.size and int(values.max()) > _INT64_MAX:
+                # Casting would wrap; every float this large is an integer
+                return np.array([int(v) for v in values.ravel()],
+                                dtype=object).reshape(values.shape), invalid
+            values = values.astype(np.int64)
+        elif values.dtype.kind in 'iu':
+            invalid = values < 1
+            values = np.where(invalid, 1, values)
+            if values.size and int(values.max()) > _INT64_MAX:
+                return values.astype(object), invalid
+            values = values.astype(np.int64)
+        else:
+            values = values.astype(object)
+            invalid = np.array([not isinstance(v, (int, np.integer)) or isinstance(v, bool)
+                                or v < 1 for v in values.ravel()]).reshape(values.shape)
+            values = np.where(invalid, 1, values)
+        return values, invalid
+
+    def is_prime_batch(self, values):
+        """Vectorized primality; entries that are not positive integers are flagged
+
+        >>> NumberTheory().is_prime_batch([7, 2.5, float("nan"), 0, 1]).errors.tolist()
+        [False, True, True, True, False]
+        """
+        values, invalid = self._batch_operands(values)
+        result = np.zeros(values.shape, dtype=bool)
+        if values.dtype == np.int64 and values.size and values.max() < self.table_limit:
+            self.sieve.ensure(int(values.max()) + 1)
+            table = self.sieve.table()
+            odd = (values & 1) == 1
+            result = (values == 2) | (odd & (table[values >> 1] == 1))
+        else:
+            for index, value in np.ndenumerate(values):
+                result[index] = self.is_prime(int(value))
+        result[invalid] = False
+        return BatchResult(result, invalid)
+
+    def _peel(self, values):
+        """Totients and divisor counts of an int64 array via the factor table"""
+        spf = self.smallest_factors(int(values.max()) + 1)
+        rest = values.copy()
+        phi = values.copy()
+        divisors = np.ones_like(values)
+        exponent = np.zeros_like(values)
+        last = np.zeros_like(values)
+        # Each pass removes one prime factor, so at most log2(max) passes
+        active = np.flatnonzero(rest > 1)
+        while active.size:
+            p = spf[rest[active]].astype(np.int64)
+            new = p != last[active]
+            fresh = active[new]
+            divisors[fresh] *= exponent[fresh] + 1
+            exponent[fresh] = 0
+            phi[fresh] = phi[fresh] // p[new] * (p[new] - 1)
+            exponent[active] += 1
+            last[active] = p
+            rest[active] //= p
+            active = active[rest[active] > 1]
+        return phi, divisors * (exponent + 1)
+
+    def _arithmetic_batch(self, values, which, function):
+        values, invalid = self._batch_operands(values)
+        if values.dtype == np.int64 and values.size and values.max() < self.factor_table_limit:
+            result = self._peel(values)[which]
+        else:
+            result = np.empty(values.shape, dtype=object)
+            for index, value in np.ndenumerate(values):
+                result[index] = function(int(value))
+        result[invalid] = 0
+        return BatchResult(result, invalid)
+
+    def totient_batch(self, values):
+        """Euler's phi of every element"""
+        return self._arithmetic_batch(values, 0, self.totient)
+
+    def divisor_count_batch(self, values):
+        """Divisor count of every element"""
+        return self._arithmetic_batch(values, 1, self.divisor_count)
+
+    def factorize_batch(self, values):
+        """List of {prime: exponent} dicts (None for invalid entries)"""
+        values, invalid = self._batch_operands(values)
+        values, invalid = values.ravel(), invalid.ravel()
+        if values.dtype == np.int64 and values.size and values.max() < self.factor_table_limit:
+            self.smallest_factors(int(values.max()) + 1)
+        return [None if bad else self.factorize(int(value))
+                for value, bad in zip(values.tolist(), invalid.tolist())]
+
+    @staticmethod
+    def mod_pow_batch(bases, exponents, modulus):
+        """Elementwise base ** exponent mod modulus for non-negative exponents
+
+        Moduli below 2**31 are computed with vectorized square-and-multiply
+        in int64 (products stay below 2**62); larger ones fall back to pow.
+        """
+        if modulus < 1:
+            raise ValueError("Modulus must be a positive integer!")
+        bases, exponents = np.broadcast_arrays(np.asarray(bases), np.asarray(exponents))
+        integral = bases.dtype.kind in 'iu' and exponents.dtype.kind in 'iu'
+        errors = (exponents < 0) if integral else np.ones(bases.shape, dtype=bool)
+        if integral and modulus < 1 << 31:
+            base = np.mod(bases.astype(np.int64), modulus)
+            exponent = np.where(errors, 0, exponents).astype(np.int64)
+            result = np.full(base.shape, 1 % modulus, dtype=np.int64)
+            while exponent.any():
+                odd = (exponent & 1) == 1
+                result = np.where(odd, result * base % modulus, result)
+                base = base * base % modulus
+                exponent >>= 1
+        else:
+            result = np.zeros(bases.shape, dtype=object)
+            for index in np.ndindex(bases.shape):
+                if not errors[index]:
+                    result[index] = pow(int(bases[index]), int(exponents[index]), modulus)
+        result[errors] = 0
+        return BatchResult(result, errors)
@@ -0,0 +1,110 @@
+"""
+OperationCache - Size-bounded, thread-safe memoization for MathMaster
+
+Results of expensive calls (factorials, big-integer GCD/LCM, trig tables,
+sampled graph curves) are kept in an LRU cache that is bounded both by the
+number of entries and by the estimated number of bytes the results occupy,
+so a handful of huge factorials cannot push memory past the budget.
+"""
+
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+
+CacheStats = namedtuple(
+    "CacheStats", ["hits", "misses", "evictions", "entries", "bytes", "max_entries", "max_bytes"]
+)
+
+
+def estimate_size(value):
+    """Approximate memory footprint of a cached result in bytes"""
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        # NumPy arrays: getsizeof only covers the header for views
+        return max(nbytes, sys.getsizeof(value))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v)
+                                          for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+def typed_key(*parts):
+    """Build a cache key that keeps 5, 5.0 and True apart"""
+    return tuple((type(part).__name__, part) for part in parts)
+
+
+class OperationCache:
+    """LRU cache with entry and byte limits and hit/miss/eviction statistics"""
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return a cached value and mark it as recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Store a value, evicting least recently used entries to fit"""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def call(self, key, function, *args):
+        """Return function(*args), computing it only on a cache miss
+
+        The computation runs outside the lock so a slow call does not block
+        other threads; exceptions are not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value = function(*args)
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drop every entry, keeping the statistics"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return a CacheStats snapshot"""
+        with self._lock:
+            return CacheStats(self.hits, self.misses, self.evictions, len(self._entries),
+                              self._bytes, self.max_entries, self.max_bytes)
+
+    def __len__(self):
+        return len(self._entries)
+
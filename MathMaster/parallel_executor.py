@@ -0,0 +1,155 @@
+"""
+ParallelExecutor - Multi-core batch evaluation for MathMaster
+
+Shards batch jobs (batch CLI chunks, lists of factorial or GCD operands,
+dense function sampling) across a process pool. Shards are sized so each
+worker receives a few large pieces, which amortizes pickling, results come
+back in input order, and inputs too small to benefit run serially in the
+calling process.
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+
+import numpy as np
+
+
+def _apply_each(function, items, return_exceptions):
+    """Worker: apply function to every item of a shard"""
+    if not return_exceptions:
+        return [function(*item) if isinstance(item, tuple) else function(item) for item in items]
+    results = []
+    for item in items:
+        try:
+            results.append(function(*item) if isinstance(item, tuple) else function(item))
+        except (ValueError, ArithmeticError) as e:
+            results.append(e)
+    return results
+
+
+# Below this many items (operands, sample points or batch records) starting
+# worker processes and pickling shards costs more than it saves
+SERIAL_THRESHOLD = 65536
+
+_engine = None
+
+
+def _evaluate_expression(expression, variables, values):
+    """Worker: compile (once per process) and evaluate an expression shard"""
+    global _engine
+    if _engine is None:
+        from expression_engine import ExpressionEngine
+        _engine = ExpressionEngine()
+    return _engine.compile(expression, variables)(*values)
+
+
+class ParallelExecutor:
+    """Process pool that shards work and keeps results in input order
+
+    workers defaults to the number of CPUs and is capped there, since extra
+    processes on the same cores only add pickling. Inputs with fewer than
+    serial_threshold items are processed in the calling process, and every
+    shard holds at least min_chunk items.
+    """
+
+    def __init__(self, workers=None, min_chunk=256, chunks_per_worker=4,
+                 serial_threshold=SERIAL_THRESHOLD):
+        cpus = os.cpu_count() or 1
+        self.workers = min(workers, cpus) if workers else cpus
+        self.min_chunk = min_chunk
+        self.chunks_per_worker = chunks_per_worker
+        self.serial_threshold = serial_threshold
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def is_serial(self, count):
+        """True when count items are better processed without the pool"""
+        return self.workers <= 1 or count < self.serial_threshold
+
+    def chunk_size(self, count):
+        """Items per shard for an input of count items"""
+        shards = self.workers * self.chunks_per_worker
+        return max(self.min_chunk, math.ceil(count / shards))
+
+    def shards(self, items):
+        """Split a sequence into consecutive shards"""
+        size = self.chunk_size(len(items))
+        return [items[start:start + size] for start in range(0, len(items), size)]
+
+    def map(self, function, items, return_exceptions=False):
+        """Apply a picklable function to every item, preserving order
+
+        Tuple items are unpacked into positional arguments. With
+        return_exceptions=True a ValueError or ArithmeticError raised for
+        an item is returned in its place instead of aborting the batch.
+        """
+        items = list(items)
+        if self.is_serial(len(items)):
+            return _apply_each(function, items, return_exceptions)
+        pool = self._get_pool()
+        futures = [pool.submit(_apply_each, function, shard, return_exceptions)
+                   for shard in self.shards(items)]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def map_batches(self, function, batches, max_pending=None):
+        """Yield (batch, function(batch)) for every batch in order, as a stream
+
+        At most max_pending batches (default two per worker) are in flight,
+        so memory stays bounded while reading from an unbounded iterator.
+        Each batch is pickled to a worker and its result pickled back; the
+        batch yielded alongside the result is this process's own copy, so
+        callers do not need the worker to return its input. Batches are
+        evaluated in this process until serial_threshold items have gone by,
+        so short streams never start the pool.
+        """
+        batches = iter(batches)
+        seen = 0
+        for batch in batches:
+            yield batch, function(batch)
+            seen += len(batch)
+            if not self.is_serial(seen):
+                break
+        else:
+            return
+        pool = self._get_pool()
+        limit = max_pending or 2 * self.workers
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, pool.submit(function, batch)))
+            if len(pending) >= limit:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        while pending:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+
+    def evaluate_expression(self, expression, x, variables=('x',)):
+        """Evaluate an ExpressionEngine expression over a large array in parallel"""
+        x = np.asarray(x, dtype=np.float64)
+        if self.is_serial(x.size):
+            return _evaluate_expression(expression, variables, (x,))
+        pool = self._get_pool()
+        futures = [pool.submit(_evaluate_expression, expression, variables, (shard,))
+                   for shard in self.shards(x)]
+        return np.concatenate([future.result() for future in futures])
+
+    def close(self):
+        """Shut the worker processes down"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
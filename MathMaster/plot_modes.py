@@ -0,0 +1,219 @@
+"""
+PlotModes - Parametric, polar, implicit and heatmap plots for MathMaster
+
+Parametric curves (x(t), y(t)) and polar curves r(θ) are sampled adaptively
+in their parameter. Implicit curves F(x, y) = 0 and heatmaps of f(x, y) are
+evaluated on np.meshgrid grids sized to the plotting area, one band of rows
+at a time, so the temporaries of a 2000 x 2000 evaluation stay within a
+fixed memory budget. Implicit curves are traced per band with a vectorized
+marching squares pass; only the resulting segments are kept.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from adaptive_sampler import adaptive_sample
+
+
+Path = namedtuple("Path", ["x", "y", "evaluations"])
+Heatmap = namedtuple("Heatmap", ["image", "extent", "evaluations"])
+
+MODES = ("Function", "Parametric", "Polar", "Implicit", "Heatmap")
+
+# Bytes of temporaries allowed per band; each grid point of an expression
+# costs a few float64 intermediates
+MESH_MEMORY_BUDGET = 32 * 1024 * 1024
+BYTES_PER_POINT = 96
+MAX_MESH_SIZE = 4096
+
+# Marching squares: corners a (top left), b (top right), c (bottom right)
+# and d (bottom left) set bit 1, 2, 4, 8 when positive. Edges are numbered
+# 0 top, 1 right, 2 bottom, 3 left. Saddles 5 and 10 list the segments for
+# a negative centre first and use the second pair when it is positive.
+_SEGMENTS = {
+    1: ((3, 0),), 2: ((0, 1),), 3: ((3, 1),), 4: ((1, 2),),
+    5: ((3, 0), (1, 2)), 6: ((0, 2),), 7: ((3, 2),), 8: ((2, 3),),
+    9: ((0, 2),), 10: ((0, 1), (2, 3)), 11: ((1, 2),), 12: ((1, 3),),
+    13: ((0, 1),), 14: ((0, 3),),
+}
+_SADDLE_POSITIVE = {5: ((0, 1), (2, 3)), 10: ((3, 0), (1, 2))}
+
+
+def _table(saddle):
+    first = np.full((16, 2), -1, dtype=np.int8)
+    second = np.full((16, 2), -1, dtype=np.int8)
+    for case, segments in _SEGMENTS.items():
+        if saddle and case in _SADDLE_POSITIVE:
+            segments = _SADDLE_POSITIVE[case]
+        first[case] = segments[0]
+        if len(segments) > 1:
+            second[case] = segments[1]
+    return first, second
+
+
+_NEGATIVE_CENTRE = _table(False)
+_POSITIVE_CENTRE = _table(True)
+
+
+def label(mode, text):
+    """Legend and title text for an entry plotted in mode"""
+    if mode == "Parametric":
+        return f"(x, y) = ({', '.join(part.strip() for part in text.split(';'))})"
+    if mode == "Polar":
+        return f"r(θ) = {text}"
+    if mode == "Implicit":
+        return text if "=" in text else f"{text} = 0"
+    if mode == "Heatmap":
+        return f"f(x, y) = {text}"
+    return f"f(x) = {text}"
+
+
+def parse_equation(text):
+    """'x^2 + y^2 = 25' -> 'x^2 + y^2 - (25)'; text without '=' is F itself"""
+    left, equals, right = text.partition("=")
+    if not equals:
+        return text
+    if "=" in right or not left.strip() or not right.strip():
+        raise ValueError("An implicit curve needs the form F(x, y) = G(x, y)!")
+    return f"({left}) - ({right})"
+
+
+def mesh_size(width, height, limit=MAX_MESH_SIZE):
+    """Grid columns and rows for a plotting area of width x height pixels"""
+    return (max(2, min(int(width), limit)), max(2, min(int(height), limit)))
+
+
+def band_rows(columns, budget=MESH_MEMORY_BUDGET):
+    """Rows of a columns-wide grid that fit in the memory budget"""
+    return max(2, int(budget // (columns * BYTES_PER_POINT)))
+
+
+def parametric(engine, text, t_range, progress=None):
+    """Curve 'x(t); y(t)' sampled where either coordinate bends"""
+    parts = [part for part in text.split(";") if part.strip()]
+    if len(parts) != 2:
+        raise ValueError("A parametric curve needs 'x(t); y(t)'!")
+    group = engine.compile_many(parts, variables=("t",))
+    curve = adaptive_sample(group, t_range[0], t_range[1], progress=progress)
+    return Path(curve.y[0], curve.y[1], curve.evaluations)
+
+
+def polar(engine, text, theta_range, progress=None):
+    """Curve r(θ) (written with theta or θ) in Cartesian coordinates"""
+    function = engine.compile(text.replace("θ", "theta"), variables=("theta",))
+    curve = adaptive_sample(function, theta_range[0], theta_range[1], progress=progress)
+    return Path(curve.y * np.cos(curve.x), curve.y * np.sin(curve.x), curve.evaluations)
+
+
+def _bands(x_range, y_range, size, budget, overlap):
+    """Grid axes and (first row, y values) of every band of rows"""
+    columns, rows = size
+    x = np.linspace(x_range[0], x_range[1], columns)
+    y = np.linspace(y_range[0], y_range[1], rows)
+    step = max(band_rows(columns, budget) - overlap, 1)
+    return x, y, [(first, y[first:first + step + overlap]) for first in range(0, rows, step)]
+
+
+def evaluate_mesh(function, x_range, y_range, size, budget=MESH_MEMORY_BUDGET,
+                  dtype=np.float32, progress=None):
+    """f(x, y) on a columns x rows grid, computed band by band
+
+    Returns an array of shape (rows, columns) with row 0 at y_range[0].
+    """
+    columns, rows = size
+    x, y, bands = _bands(x_range, y_range, size, budget, overlap=0)
+    image = np.empty((rows, columns), dtype=dtype)
+    for done, (first, y_band) in enumerate(bands, 1):
+        X, Y = np.meshgrid(x, y_band, sparse=True)
+        image[first:first + y_band.size] = function(X, Y)
+        if progress is not None:
+            progress(done / len(bands))
+    return image
+
+
+def marching_squares(values, x, y, function=None):
+    """Segments of the zero contour of values sampled at (y[i], x[j])
+
+    Returns an (n, 2, 2) array of segment end points ((x0, y0), (x1, y1)).
+    Cells with a non-finite corner are skipped. With function (the F that
+    produced values), segments whose midpoint value exceeds every corner
+    of their cell are dropped: the sign changed through a pole, as for
+    1/x, not through zero.
+    """
+    a, b = values[:-1, :-1], values[:-1, 1:]
+    c, d = values[1:, 1:], values[1:, :-1]
+    case = ((a > 0) * 1 + (b > 0) * 2 + (c > 0) * 4 + (d > 0) * 8).astype(np.int8)
+    finite = np.isfinite(a) & np.isfinite(b) & np.isfinite(c) & np.isfinite(d)
+    rows, cols = np.nonzero(finite & (case != 0) & (case != 15))
+    if rows.size == 0:
+        return np.zeros((0, 2, 2))
+    a, b, c, d = (corner[rows, cols].astype(np.float64) for corner in (a, b, c, d))
+    case = case[rows, cols]
+    x0, x1 = x[cols], x[cols + 1]
+    y0, y1 = y[rows], y[rows + 1]
+
+    with np.errstate(all="ignore"):
+        # Where each edge crosses zero, by linear interpolation
+        points = np.stack([
+            np.stack([x0 + (x1 - x0) * a / (a - b), y0], axis=-1),
+            np.stack([x1, y0 + (y1 - y0) * b / (b - c)], axis=-1),
+            np.stack([x0 + (x1 - x0) * d / (d - c), y1], axis=-1),
+            np.stack([x0, y0 + (y1 - y0) * a / (a - d)], axis=-1),
+        ])
+    centre = (a + b + c + d) > 0
+    index = np.arange(case.size)
+    segments, owners = [], []
+    for table in (0, 1):
+        edges = np.where(centre[:, None], _POSITIVE_CENTRE[table][case],
+                         _NEGATIVE_CENTRE[table][case])
+        present = edges[:, 0] >= 0
+        edges, cells = edges[present], index[present]
+        segments.append(np.stack([points[edges[:, 0], cells], points[edges[:, 1], cells]], axis=1))
+        owners.append(cells)
+    segments = np.concatenate(segments)
+    if function is not None and segments.size:
+        cells = np.concatenate(owners)
+        corners = np.max(np.abs([a, b, c, d]), axis=0)[cells]
+        middle = segments.mean(axis=1)
+        keep = np.abs(function(middle[:, 0], middle[:, 1])) <= corners
+        segments = segments[keep]
+    return segments
+
+
+def implicit(engine, text, x_range, y_range, size, budget=MESH_MEMORY_BUDGET, progress=None):
+    """Curve F(x, y) = 0 traced on a grid of size (columns, rows)
+
+    Bands share their boundary row so no cell is lost between them. The
+    result is one polyline with NaN between segments, ready to draw as a
+    single line. Sign changes across poles (F = 1/x) are dropped.
+    """
+    function = engine.compile(parse_equation(text), variables=("x", "y"))
+    x, y, bands = _bands(x_range, y_range, size, budget, overlap=1)
+    pieces = []
+    evaluations = 0
+    for done, (first, y_band) in enumerate(bands, 1):
+        if y_band.size < 2:
+            continue
+        X, Y = np.meshgrid(x, y_band, sparse=True)
+        values = function(X, Y)
+        evaluations += values.size
+        segments = marching_squares(values, x, y_band, function)
+        if segments.size:
+            pieces.append(segments)
+        if progress is not None:
+            progress(done / len(bands))
+    if not pieces:
+        return Path(np.zeros(0), np.zeros(0), evaluations)
+    segments = np.concatenate(pieces)
+    # (x0, y0), (x1, y1), (nan, nan) per segment
+    polyline = np.concatenate([segments, np.full((segments.shape[0], 1, 2), np.nan)], axis=1)
+    polyline = polyline.reshape(-1, 2)
+    return Path(polyline[:, 0], polyline[:, 1], evaluations)
+
+
+def heatmap(engine, text, x_range, y_range, size, budget=MESH_MEMORY_BUDGET, progress=None):
+    """Image of f(x, y) over the window, one value per pixel"""
+    function = engine.compile(text, variables=("x", "y"))
+    image = evaluate_mesh(function, x_range, y_range, size, budget, progress=progress)
+    return Heatmap(image, (x_range[0], x_range[1], y_range[0], y_range[1]), image.size)